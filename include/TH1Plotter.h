@@ -18,10 +18,25 @@ namespace plotIt {
                 plotter(plotIt) {
                 }
 
-            virtual boost::optional<Summary> plot(TCanvas& c, Plot& plot);
+            virtual boost::optional<Summary> plot(CanvasLayout& layout, Plot& plot);
+            virtual boost::optional<PreviewPlot> preview(Plot& plot);
             virtual bool supports(TObject& object);
 
         private:
+            // Histograms of a plot, rescaled, stacked and with their systematics, ready to be drawn
+            struct Prepared {
+                std::shared_ptr<TH1> h_data;
+                std::string data_drawing_options;
+                std::vector<File> signal_files;
+                Stacks mc_stacks;
+
+                bool has_data = false;
+                bool has_mc = false;
+                bool no_systematics = false;
+            };
+
+            void prepare(Plot& plot, Prepared& prepared, Summary& summary);
+
             void setHistogramStyle(const File& file);
             void addOverflow(TH1* h, Type type, const Plot& plot);
 
@@ -30,5 +45,8 @@ namespace plotIt {
 
             void computeSystematics(int64_t index, Stack& stack, Summary& summary);
             void computeSystematics(Stacks& stacks, Summary& summary);
+
+            template <class T>
+            bool fit(T& object, TF1& fct, const std::string& function, float xMin, float xMax, uint16_t n_points, TH1& errors);
     };
 }
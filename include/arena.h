@@ -0,0 +1,88 @@
+#pragma once
+
+#include <cstddef>
+#include <unordered_map>
+#include <vector>
+
+class TH1;
+
+namespace plotIt {
+    /**
+     * Read-only shared memory holding the bin contents and sum of weights
+     * squared of the histograms loaded for a chunk of plots.
+     *
+     * Once adopted, a histogram keeps its axes and attributes but its storage
+     * is released: it must be materialized (a private copy of its contents is
+     * made) before being used, and can be released again when done. Processes
+     * forked after `adopt` share the arena pages instead of each one ending up
+     * with its own copy of every histogram.
+     **/
+    class HistogramArena {
+        public:
+            HistogramArena() = default;
+
+            /**
+             * Restore all the adopted histograms, and unmap the arena
+             **/
+            ~HistogramArena();
+
+            /**
+             * Copy the storage of the histograms into the arena, and release
+             * it from the histograms. Histograms adopted by a previous call
+             * are restored first. Histograms whose storage is not only made
+             * of bin contents and sumw2 (profiles, TH2Poly) are ignored.
+             *
+             * Return false if the arena cannot be allocated; histograms are
+             * then left untouched.
+             **/
+            bool adopt(const std::vector<TH1*>& histograms);
+
+            /**
+             * Give back its contents to an adopted histogram. Do nothing if
+             * the histogram was not adopted or is already materialized.
+             **/
+            void materialize(TH1* h);
+
+            /**
+             * Release again the storage of a materialized histogram
+             **/
+            void release(TH1* h);
+
+            /**
+             * Materialize all the adopted histograms and forget about them
+             **/
+            void restore();
+
+            /**
+             * Size of the arena, in bytes
+             **/
+            size_t size() const {
+                return m_size;
+            }
+
+            HistogramArena(HistogramArena const&) = delete;
+            HistogramArena(HistogramArena&&) = delete;
+            HistogramArena& operator=(HistogramArena const&) = delete;
+            HistogramArena& operator=(HistogramArena &&) = delete;
+
+        private:
+            struct Entry {
+                // Offsets in the arena, in number of doubles
+                size_t contents;
+                size_t n_cells;
+                size_t sumw2;
+                size_t n_sumw2;
+                size_t stats;
+
+                double entries;
+                bool materialized;
+            };
+
+            void hollow(TH1* h);
+
+            std::unordered_map<TH1*, Entry> m_entries;
+
+            double* m_data = nullptr;
+            size_t m_size = 0;
+    };
+}
@@ -0,0 +1,90 @@
+#pragma once
+
+#include <boost/filesystem.hpp>
+
+#include <cstdint>
+#include <fstream>
+#include <map>
+#include <string>
+#include <vector>
+
+class TCanvas;
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+    /**
+     * Write the plots in a few large files instead of one file per plot and
+     * extension:
+     *  - with `multipage_pdf`, the PDF outputs of all the plots of a folder are
+     *    pages of a single `plots.pdf` in this folder. Only one PDF can be
+     *    written at a time, so plots should be saved folder by folder: going
+     *    back to a folder starts a new file (`plots-2.pdf`, ...).
+     *  - with an `archive` path, everything is written in a single tar
+     *    archive, followed by a manifest (`plotIt-manifest.tsv`) giving the
+     *    offset and size of each member in the archive.
+     **/
+    class OutputBundle {
+        public:
+            OutputBundle(const fs::path& output, bool multipage_pdf, const fs::path& archive);
+            ~OutputBundle();
+
+            /**
+             * Save the canvas as `path`, relative to the output folder. The
+             * format is deduced from the extension.
+             **/
+            bool save(TCanvas& canvas, const fs::path& path);
+
+            /**
+             * Close the current multi-page PDF and the archive. Return false
+             * if anything could not be written.
+             **/
+            bool finish();
+
+            OutputBundle(OutputBundle const&) = delete;
+            OutputBundle(OutputBundle&&) = delete;
+            OutputBundle& operator=(OutputBundle const&) = delete;
+            OutputBundle& operator=(OutputBundle &&) = delete;
+
+        private:
+            struct Member {
+                std::string name;
+                // Offset of the content in the archive
+                uint64_t offset;
+                uint64_t size;
+            };
+
+            bool closePDF();
+
+            /**
+             * Append the content of `file` to the archive, as `name`
+             **/
+            bool addToArchive(const fs::path& file, const std::string& name);
+            bool addToArchive(const std::string& content, const std::string& name);
+            void writeHeader(const std::string& name, uint64_t size, char type);
+            void pad(uint64_t size);
+
+            fs::path m_output;
+            bool m_multipage_pdf;
+            bool m_finished = false;
+            bool m_failed = false;
+
+            // Multi-page PDF being written, relative to the output folder
+            bool m_pdf_open = false;
+            fs::path m_pdf;
+            fs::path m_pdf_file;
+            TCanvas* m_pdf_canvas = nullptr;
+            // Folder -> number of PDF files started in it
+            std::map<fs::path, size_t> m_pdf_parts;
+
+            fs::path m_archive_path;
+            std::vector<char> m_buffer;
+            std::ofstream m_archive;
+            uint64_t m_archive_size = 0;
+            std::vector<Member> m_members;
+
+            // Local folder where the plots are written before being archived
+            fs::path m_scratch;
+    };
+}
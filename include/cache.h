@@ -0,0 +1,125 @@
+#pragma once
+
+#include <map>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <utility>
+#include <vector>
+
+class TFile;
+class TObject;
+
+namespace plotIt {
+    /**
+     * Input files and objects shared by all the configurations rendered in
+     * the same process.
+     *
+     * When enabled, files are opened only once, and each object is read from
+     * disk only once: callers get the pristine copy and must clone it before
+     * modifying it. When disabled, every call goes to the file, as if there
+     * was no cache.
+     **/
+    class InputCache {
+        public:
+            static InputCache& get() {
+                static InputCache s_instance;
+
+                return s_instance;
+            }
+
+            void setEnabled(bool enabled) {
+                m_enabled = enabled;
+            }
+
+            bool enabled() const {
+                return m_enabled;
+            }
+
+            /**
+             * Open a file for reading. Return nullptr if the file cannot be opened
+             **/
+            std::shared_ptr<TFile> open(const std::string& path);
+
+            /**
+             * While an instance exists, files opened by the current thread
+             * get their own handle instead of the one shared through the
+             * cache, since a TFile cannot be read by several threads at once.
+             * Objects read from them are still cached.
+             **/
+            class ThreadHandles {
+                public:
+                    ThreadHandles() {
+                        s_thread_handles = true;
+                    }
+
+                    ~ThreadHandles() {
+                        s_thread_handles = false;
+                    }
+            };
+
+            /**
+             * Read an object from a file opened with `open`, or return
+             * nullptr if it does not exist. When enabled, the object is owned
+             * by the cache and must not be modified.
+             **/
+            TObject* getObject(TFile& file, const std::string& name);
+
+            /**
+             * Directory listing of a file, as computed by the caller. Return
+             * nullptr if not known yet.
+             **/
+            const std::vector<std::string>* getContent(const std::string& path) const;
+            void setContent(const std::string& path, const std::vector<std::string>& content);
+
+            /**
+             * In-memory files, whose objects are provided by the caller (see
+             * addObject) instead of being read from disk. Their path starts
+             * with `memory://`.
+             **/
+            static bool isMemoryPath(const std::string& path) {
+                return path.compare(0, 9, "memory://") == 0;
+            }
+
+            bool hasFile(const std::string& path) const {
+                return m_files.count(path) > 0;
+            }
+
+            /**
+             * Add an object to an in-memory file, creating the file if needed.
+             * The cache must be enabled.
+             **/
+            void addObject(const std::string& path, const std::string& name, const std::shared_ptr<TObject>& object);
+
+            /**
+             * Forget a file which changed on disk: it is opened again, and its
+             * objects read again, the next time they are requested
+             **/
+            void invalidate(const std::string& path);
+
+            /**
+             * Release all objects and close all files
+             **/
+            void clear();
+
+            InputCache(InputCache const&) = delete;
+            InputCache(InputCache&&) = delete;
+            InputCache& operator=(InputCache const&) = delete;
+            InputCache& operator=(InputCache &&) = delete;
+
+        protected:
+            InputCache() = default;
+
+        private:
+            static thread_local bool s_thread_handles;
+
+            bool m_enabled = false;
+
+            // Guards the maps below, files and objects are read without holding it
+            mutable std::mutex m_mutex;
+
+            std::map<std::string, std::shared_ptr<TFile>> m_files;
+            std::map<std::pair<std::string, std::string>, std::shared_ptr<TObject>> m_objects;
+            std::map<std::string, std::vector<std::string>> m_contents;
+    };
+}
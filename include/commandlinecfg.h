@@ -1,5 +1,8 @@
 #pragma once
+#include <cstddef>
+#include <cstdint>
 #include <string>
+#include <vector>
 
 class CommandLineCfg {
 
@@ -15,7 +18,34 @@ class CommandLineCfg {
         bool do_yields = false;
         bool unblind = false;
         bool systematicsBreakdown = false;
+        bool timing = false;
+        bool fit_cache = false;
+        // Keep the entries passing each selection, in tree mode
+        bool selection_cache = false;
+        // Number of processes rendering the plots; 0 if -j is not given
+        size_t jobs = 0;
+        // Number of threads loading the objects of the input files
+        size_t io_threads = 1;
+        // Only write low resolution thumbnails and an HTML gallery
+        bool preview = false;
+        // One multi-page PDF per output folder instead of one PDF per plot
+        bool multipage_pdf = false;
+        // Tar archive holding all the outputs, relative to the output folder; not used if empty
+        std::string archive;
+        // --select expressions, see PlotSelector
+        std::vector<std::string> select;
+        // Render only shard `shard_index` (1-based) out of `shard_count`; no sharding if 0
+        size_t shard_index = 0;
+        size_t shard_count = 0;
         std::string era = "";
+        // Binary cache of the parsed configurations; not used if empty
+        std::string config_cache;
+        // Local copies of the input files; not used if empty
+        std::string stage_dir;
+        // Disk space the local copies may use, in bytes
+        uint64_t stage_budget = 0;
+        // Keep running, and render again what depends on the files which change
+        bool watch = false;
 
     private:
         CommandLineCfg() = default;
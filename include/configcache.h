@@ -0,0 +1,77 @@
+#pragma once
+
+#include <boost/filesystem.hpp>
+
+#include <cstdint>
+#include <map>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+    class plotIt;
+
+    /**
+     * Binary cache of fully parsed configurations (files, groups,
+     * systematics, plots, ...), so that unchanged configurations are loaded
+     * without parsing any YAML.
+     *
+     * An entry is used only if the configuration file and all the files it
+     * includes still have the same size and modification time, if it was
+     * parsed in the same context (era, histograms and output folders), and
+     * if the file patterns still match the same input files.
+     **/
+    class ConfigCache {
+        public:
+            /**
+             * Load the cache from `path`, if it exists and is valid
+             **/
+            ConfigCache(const fs::path& path);
+
+            /**
+             * Number of documents of `file`, if cached and up-to-date, 0 otherwise
+             **/
+            size_t documents(const std::string& file) const;
+
+            /**
+             * Restore the configuration of document `index` of `file` into a
+             * newly created plotIt instance. Return false if the cache cannot
+             * be used, in which case the configuration must be parsed.
+             **/
+            bool restore(plotIt& p, const std::string& file, size_t index, const std::string& context) const;
+
+            /**
+             * Add the configuration of document `index` (out of `count`) of
+             * `file`, as parsed by `p`
+             **/
+            void store(const plotIt& p, const std::string& file, size_t index, size_t count, const std::string& context);
+
+            /**
+             * Write the cache back to disk, if modified
+             **/
+            bool save() const;
+
+        private:
+            struct Dependency {
+                std::string path;
+                uint64_t size;
+                int64_t mtime;
+            };
+
+            struct Entry {
+                std::string context;
+                size_t count;
+                std::vector<Dependency> dependencies;
+                std::string data;
+            };
+
+            static bool makeDependency(const std::string& path, Dependency& dependency);
+            const Entry* find(const std::string& file, size_t index) const;
+
+            fs::path m_path;
+            std::map<std::pair<std::string, size_t>, Entry> m_entries;
+            bool m_modified = false;
+    };
+}
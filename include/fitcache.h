@@ -0,0 +1,50 @@
+#pragma once
+
+#include <boost/filesystem.hpp>
+
+#include <cstdint>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+class TGraph;
+class TH1;
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+  /**
+   * Everything needed to draw a fit without running it again: the fitted
+   * parameters, and the confidence interval band
+   **/
+  struct FitResult {
+    bool valid = false;
+
+    std::vector<double> parameters;
+    std::vector<double> parameter_errors;
+
+    std::vector<double> band_contents;
+    std::vector<double> band_errors;
+  };
+
+  /**
+   * Memoization of fit results, keyed by a hash of the fitted histogram and
+   * of the fit definition. Optionally persisted to disk, so that later runs
+   * over the same inputs do not fit again.
+   **/
+  class FitCache {
+    public:
+      static uint64_t key(const TH1& h, const std::string& function, double xMin, double xMax, uint16_t n_points);
+      static uint64_t key(const TGraph& g, const std::string& function, double xMin, double xMax, uint16_t n_points);
+
+      const FitResult* find(uint64_t key) const;
+      void insert(uint64_t key, const FitResult& result);
+
+      bool load(const fs::path& path);
+      bool save(const fs::path& path) const;
+
+    private:
+      std::unordered_map<uint64_t, FitResult> m_results;
+      bool m_modified = false;
+  };
+}
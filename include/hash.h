@@ -0,0 +1,54 @@
+#pragma once
+
+#include <TH1.h>
+
+#include <cstdint>
+#include <string>
+
+namespace plotIt {
+  /**
+   * 64 bits FNV-1a hash, to detect changes in the inputs without keeping a
+   * copy of them
+   **/
+  class Hasher {
+    public:
+      void update(const void* data, size_t size) {
+        const unsigned char* bytes = static_cast<const unsigned char*>(data);
+        for (size_t i = 0; i < size; i++) {
+          m_hash ^= bytes[i];
+          m_hash *= 1099511628211ULL;
+        }
+      }
+
+      void update(double value) {
+        update(&value, sizeof(value));
+      }
+
+      void update(const std::string& value) {
+        uint64_t size = value.size();
+        update(&size, sizeof(size));
+        update(value.data(), value.size());
+      }
+
+      /**
+       * Binning, then contents and errors including under- and overflow
+       **/
+      void update(const TH1& h) {
+        const TAxis* axis = h.GetXaxis();
+        for (int i = 1; i <= axis->GetNbins() + 1; i++)
+          update(axis->GetBinLowEdge(i));
+
+        for (int i = 0; i < h.GetNcells(); i++) {
+          update(h.GetBinContent(i));
+          update(h.GetBinError(i));
+        }
+      }
+
+      uint64_t digest() const {
+        return m_hash;
+      }
+
+    private:
+      uint64_t m_hash = 14695981039346656037ULL;
+  };
+}
@@ -0,0 +1,75 @@
+#pragma once
+
+#include <types.h>
+
+#include <cstdint>
+#include <map>
+#include <memory>
+#include <string>
+#include <tuple>
+#include <utility>
+#include <vector>
+
+class TCanvas;
+class TLatex;
+class TPad;
+class TPaveText;
+
+namespace plotIt {
+
+    /**
+     * Canvas, ratio pads and static decorations (luminosity, experiment and
+     * labels) shared by all the plots of a configuration. They only depend on
+     * the configuration (size and margins), on whether a ratio is shown and on
+     * the labels, so they are built once and only cleared between two plots;
+     * plots only add their own histograms and legend.
+     **/
+    class CanvasLayout {
+        public:
+            CanvasLayout(const Configuration& config);
+            ~CanvasLayout();
+
+            /**
+             * Canvas of the next plot, cleared and renamed, and made the current pad
+             **/
+            TCanvas& prepare(const std::string& name);
+
+            TCanvas& canvas() {
+                return *m_canvas;
+            }
+
+            /**
+             * Main and ratio pads, drawn on the canvas. The main pad is made
+             * the current pad.
+             **/
+            std::pair<TPad*, TPad*> ratioPads(const Plot& plot);
+
+            /**
+             * Draw the luminosity and experiment on the current pad, and the
+             * labels on the canvas
+             **/
+            void decorate(const Plot& plot, const std::vector<Label>& labels);
+
+            /**
+             * Remove everything drawn for the last plot from the canvas and the pads
+             **/
+            void clear();
+
+            CanvasLayout(CanvasLayout const&) = delete;
+            CanvasLayout(CanvasLayout&&) = delete;
+            CanvasLayout& operator=(CanvasLayout const&) = delete;
+            CanvasLayout& operator=(CanvasLayout &&) = delete;
+
+        private:
+            const Configuration& m_config;
+
+            std::shared_ptr<TCanvas> m_canvas;
+            std::shared_ptr<TPad> m_hi_pad;
+            std::shared_ptr<TPad> m_low_pad;
+
+            // (show ratio, extra label) -> luminosity and experiment
+            std::map<std::pair<bool, std::string>, std::vector<std::shared_ptr<TPaveText>>> m_headers;
+            // (text, size, x, y) -> label
+            std::map<std::tuple<std::string, uint32_t, float, float>, std::shared_ptr<TLatex>> m_labels;
+    };
+}
@@ -2,6 +2,7 @@
 
 #include <boost/filesystem.hpp>
 #include <boost/iterator/iterator_adaptor.hpp>
+#include <atomic>
 #include <memory>
 #include <iomanip>
 #include <iostream>
@@ -13,6 +14,8 @@
 #include <TStyle.h>
 #include <TChain.h>
 
+#include <map>
+#include <set>
 #include <vector>
 #include <string>
 #include <glob.h>
@@ -20,7 +23,10 @@
 
 #include <types.h>
 #include <defines.h>
-#include <uuid.h>
+#include <fitcache.h>
+#include <selectioncache.h>
+#include <summary.h>
+#include <yields.h>
 
 namespace YAML {
   class Node;
@@ -34,12 +40,32 @@ class TLegend;
 namespace fs = boost::filesystem;
 
 namespace plotIt {
-  
+  class CanvasLayout;
+  class OutputBundle;
+  class PlotSelector;
+  class PreviewWriter;
+
   class plotIt {
     public:
       plotIt(const fs::path& outputPath);
       bool parseConfigurationFile(const std::string& file, const fs::path& histogramsPath);
-      void plotAll();
+      bool parseConfiguration(YAML::Node node, const fs::path& base, const fs::path& histogramsPath);
+      /**
+       * Render all the plots, or only the ones whose name matches the glob
+       * pattern `filter` if not empty
+       **/
+      void plotAll(const std::string& filter = "");
+
+      /**
+       * Keep the summary of each rendered plot, see getSummaries
+       **/
+      void setKeepSummaries(bool keep) {
+        m_keep_summaries = keep;
+      }
+
+      const std::vector<std::pair<std::string, Summary>>& getSummaries() const {
+        return m_summaries;
+      }
 
       // a bit of infrastructure to retrieve selected file lists
       // stored as vector<const*> but behaving as reference vectors
@@ -62,40 +88,121 @@ namespace plotIt {
       private:
         std::vector<const File*> m_sFiles;
       };
-      template<typename Predicate>
-      file_list getFiles(Predicate pred) const {
-        file_list result;
-        std::copy_if(std::begin(m_files), std::end(m_files), std::back_inserter(result), pred);
-        return result;
-      }
       bool filter_eras(const File& file) const {
         return m_config.eras.empty() || file.era.empty() || ( std::end(m_config.eras) != std::find(std::begin(m_config.eras), std::end(m_config.eras), file.era) );
       }
-      file_list getFiles() const { return getFiles(std::bind(&plotIt::filter_eras, this, std::placeholders::_1)); }
+
+      // Files partitioned once, instead of being filtered each time they are needed
+      struct FileIndex {
+        file_list all;
+        std::map<Type, file_list> by_type;
+        // MC files of each stack
+        std::map<int64_t, file_list> mc_by_stack;
+        // MC files of each stack and all the signal files, in their order
+        std::map<int64_t, file_list> mc_and_signal_by_stack;
+      };
+
+      /**
+       * Build the file index. Must be called again if the list of files changes.
+       **/
+      void buildFileIndex();
+
+      /**
+       * Find which systematics apply to each file, from the file paths
+       **/
+      void matchSystematics();
+
+      const file_list& getFiles() const { return m_file_index.all; }
+      const file_list& getFiles(Type type) const { return get(m_file_index.by_type, type); }
+      const file_list& getMCFiles(int64_t stack_index) const { return get(m_file_index.mc_by_stack, stack_index); }
+      const file_list& getMCAndSignalFiles(int64_t stack_index) const { return get(m_file_index.mc_and_signal_by_stack, stack_index); }
+
+      /**
+       * Stack indices of the MC files, in increasing order
+       **/
+      std::vector<int64_t> getStackIndices() const {
+        std::vector<int64_t> indices;
+        for (const auto& it: m_file_index.mc_by_stack)
+          indices.push_back(it.first);
+
+        return indices;
+      }
 
       const Configuration& getConfiguration() const {
         return m_config;
       }
 
+      FitCache& getFitCache() {
+        return m_fit_cache;
+      }
+
       std::shared_ptr<PlotStyle> getPlotStyle(const File& file);
 
+      /**
+       * Files included by the configuration, recursively
+       **/
+      const std::vector<std::string>& getIncludedFiles() const {
+        return m_included_files;
+      }
+
+      /**
+       * Input files read by the last call to plotAll: the ROOT files of the
+       * configuration, and the files of the systematic variations
+       **/
+      const std::set<std::string>& getInputFiles() const {
+        return m_input_files;
+      }
+
+      /**
+       * Only render the plots whose objects changed since this instance last
+       * rendered them, e.g. after some input files changed (see --watch)
+       **/
+      void setIncremental(bool incremental) {
+        m_incremental = incremental;
+      }
+
+      /**
+       * Read these files again on the next call to plotAll. They must also be
+       * invalidated in the input cache.
+       **/
+      void reloadFiles(const std::set<std::string>& paths);
+
       friend PlotStyle;
+      friend class ConfigCache;
 
     private:
+      template <typename Key>
+      static const file_list& get(const std::map<Key, file_list>& index, const Key& key) {
+        static const file_list empty;
+        auto it = index.find(key);
+        return (it == index.end()) ? empty : it->second;
+      }
+
       void checkOrThrow(YAML::Node& node, const std::string& name, const std::string& file);
       void parseIncludes(YAML::Node& node, const fs::path& base);
       void parseSystematicsNode(const YAML::Node& node);
       void parseFileNode(File& file, const YAML::Node& key, const YAML::Node& value);
       void parseFileNode(File& file, const YAML::Node& node);
 
+      // Rendering (render.cc), style and plotters are only created when the first plot is rendered
+      void initRendering();
+      void renderPlots(std::vector<Plot>::iterator plots_begin, std::vector<Plot>::iterator plots_end, size_t jobs);
+      void plotInWorkers(std::vector<Plot>::iterator plots_begin, std::vector<Plot>::iterator plots_end, size_t jobs);
+      // Once all the chunks are rendered
+      void finishRendering();
+
       // Plot method
       bool plot(Plot& plot);
       bool yields(std::vector<Plot>::iterator plots_begin, std::vector<Plot>::iterator plots_end);
 
       bool expandFiles();
-      bool expandObjects(File& file, std::vector<Plot>& plots);
-      bool loadAllObjects(File& file, std::vector<Plot>::const_iterator plots_begin, std::vector<Plot>::const_iterator plots_end);
+      bool expandObjects(File& file, std::vector<Plot>& plots, const PlotSelector& selector);
+      bool loadAllFiles(std::vector<Plot>::const_iterator plots_begin, std::vector<Plot>::const_iterator plots_end);
+      bool loadAllObjects(File& file, std::vector<Plot>::const_iterator plots_begin, std::vector<Plot>::const_iterator plots_end, std::ostream& log = std::cout);
       bool loadObject(File& file, const Plot& plot);
+      std::vector<TH1*> getLoadedHistograms(const Plot& plot);
+      // Whether the objects of the plot changed since it was last rendered
+      bool hasChanged(const Plot& plot);
 
       void fillLegend(TLegend& legend, const Plot& plot, bool with_uncertainties);
 
@@ -113,9 +220,46 @@ namespace plotIt {
 
       std::unordered_map<std::string, TDirectory*> m_book_keeping_folders;
 
+      // What the configuration was parsed from, to cache the result (see ConfigCache)
+      std::vector<std::string> m_included_files;
+      std::vector<std::string> m_file_patterns;
+      std::vector<std::string> m_systematics_nodes;
+      std::vector<CustomColor> m_custom_colors;
+
       // Current style
       std::shared_ptr<TStyle> m_style;
 
+      FileIndex m_file_index;
+
+      // Canvas reused from one plot to the next
+      std::shared_ptr<CanvasLayout> m_layout;
+
+      // Thumbnails written instead of the plots in preview mode
+      std::shared_ptr<PreviewWriter> m_preview;
+      // Multi-page PDF and archive outputs, if enabled
+      std::shared_ptr<OutputBundle> m_bundle;
+
+      FitCache m_fit_cache;
+      // Entries passing each selection, in tree mode
+      SelectionCache m_selection_cache;
+
+      // Yields of all the chunks of plots
+      YieldsTable m_yields;
+
+      // Objects not read again from the input files because an identical one was already loaded for another plot
+      std::atomic<size_t> m_saved_reads{0};
+
+      // Input files read by the last call to plotAll
+      std::set<std::string> m_input_files;
+
+      // Only render the plots whose objects changed, see setIncremental
+      bool m_incremental = false;
+      // Output path of each rendered plot -> hash of its objects
+      std::unordered_map<std::string, uint64_t> m_rendered_inputs;
+
+      bool m_keep_summaries = false;
+      std::vector<std::pair<std::string, Summary>> m_summaries;
+
       Legend m_legend;
       Configuration m_config;
   };
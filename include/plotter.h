@@ -1,14 +1,16 @@
 #pragma once
 
 #include <plotIt.h>
+#include <preview.h>
 #include <summary.h>
 
 #include <boost/optional.hpp>
 
-class TCanvas;
 class TObject;
 
 namespace plotIt {
+  class CanvasLayout;
+
   class plotter {
 
     public:
@@ -18,7 +20,16 @@ namespace plotIt {
         }
 
 
-      virtual boost::optional<Summary> plot(TCanvas& c, Plot& plot) = 0;
+      virtual boost::optional<Summary> plot(CanvasLayout& layout, Plot& plot) = 0;
+
+      /**
+       * Bin contents of what `plot` would draw, for the preview thumbnails.
+       * Return none if previews are not supported.
+       **/
+      virtual boost::optional<PreviewPlot> preview(Plot& plot) {
+        return boost::none;
+      }
+
       virtual bool supports(TObject& object) = 0;
 
     protected:
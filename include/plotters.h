@@ -8,13 +8,24 @@
 namespace plotIt {
   static std::vector<std::shared_ptr<plotter>> s_plotters;
   void createPlotters(plotIt& plotIt) {
+    // Plotters are bound to a plotIt instance, and several may be created in the same process
+    s_plotters.clear();
     s_plotters.push_back(std::make_shared<TH1Plotter>(plotIt));
   }
 
-  boost::optional<Summary> plot(const File& file, TCanvas& c, Plot& plot) {
+  boost::optional<Summary> plot(const File& file, CanvasLayout& layout, Plot& plot) {
     for (auto& plotter: s_plotters) {
       if (plotter->supports(*file.object))
-        return plotter->plot(c, plot);
+        return plotter->plot(layout, plot);
+    }
+
+    return boost::none;
+  }
+
+  boost::optional<PreviewPlot> preview(const File& file, Plot& plot) {
+    for (auto& plotter: s_plotters) {
+      if (plotter->supports(*file.object))
+        return plotter->preview(plot);
     }
 
     return boost::none;
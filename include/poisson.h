@@ -0,0 +1,67 @@
+#pragma once
+
+#include <types.h>
+
+#include <cstdint>
+#include <vector>
+
+class TH1;
+
+namespace plotIt {
+
+    /**
+     * Lower and upper errors of each bin of a histogram, indexed by bin
+     * number (under- and overflow included)
+     **/
+    struct BinErrors {
+        std::vector<double> low;
+        std::vector<double> up;
+    };
+
+    /**
+     * Poisson (Garwood) intervals, exactly as computed by TH1::GetBinErrorLow
+     * and TH1::GetBinErrorUp with the kPoisson and kPoisson2 options.
+     *
+     * The interval bounds only depend on the integer part of the bin content,
+     * so they are computed once for each count up to CACHED_COUNTS and kept.
+     * Larger counts are computed each time.
+     **/
+    class PoissonIntervals {
+        public:
+            static PoissonIntervals& get() {
+                static PoissonIntervals s_instance;
+
+                return s_instance;
+            }
+
+            /**
+             * Errors of all the bins of `h`, in one pass. Same values as
+             * GetBinErrorLow and GetBinErrorUp.
+             **/
+            BinErrors errors(const TH1& h);
+
+            PoissonIntervals(PoissonIntervals const&) = delete;
+            PoissonIntervals(PoissonIntervals&&) = delete;
+            PoissonIntervals& operator=(PoissonIntervals const&) = delete;
+            PoissonIntervals& operator=(PoissonIntervals &&) = delete;
+
+        protected:
+            PoissonIntervals() = default;
+
+        private:
+            static const size_t CACHED_COUNTS = 1024;
+
+            struct Bounds {
+                double lower;
+                double upper;
+            };
+
+            const Bounds& bounds(int64_t count, ErrorsType type);
+            static Bounds compute(int64_t count, ErrorsType type);
+
+            // For Poisson and Poisson2, indexed by count; filled when first needed
+            std::vector<Bounds> m_bounds[2];
+            std::vector<bool> m_known[2];
+            Bounds m_uncached;
+    };
+}
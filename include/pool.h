@@ -1,6 +1,7 @@
 #pragma once
 
 #include <memory>
+#include <mutex>
 #include <vector>
 
 #include <TObject.h>
@@ -15,17 +16,25 @@ namespace plotIt {
             }
 
             void add(const std::shared_ptr<TObject>& object) {
+                std::lock_guard<std::mutex> lock(m_mutex);
                 m_temporaryObjects.push_back(object);
             }
 
             void addRuntime(const std::shared_ptr<TObject>& object) {
+                std::lock_guard<std::mutex> lock(m_mutex);
                 m_temporaryObjectsRuntime.push_back(object);
             }
 
             void clear() {
+                std::lock_guard<std::mutex> lock(m_mutex);
                 m_temporaryObjects.clear();
             }
 
+            void clearRuntime() {
+                std::lock_guard<std::mutex> lock(m_mutex);
+                m_temporaryObjectsRuntime.clear();
+            }
+
             TemporaryPool(TemporaryPool const&) = delete;             // Copy construct
             TemporaryPool(TemporaryPool&&) = delete;                  // Move construct
             TemporaryPool& operator=(TemporaryPool const&) = delete;  // Copy assign
@@ -35,6 +44,8 @@ namespace plotIt {
             TemporaryPool() = default;
 
         private:
+            // Objects are added by the threads loading the input files
+            std::mutex m_mutex;
             std::vector<std::shared_ptr<TObject>> m_temporaryObjects;
             std::vector<std::shared_ptr<TObject>> m_temporaryObjectsRuntime;
     };
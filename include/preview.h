@@ -0,0 +1,129 @@
+#pragma once
+
+#include <types.h>
+
+#include <boost/filesystem.hpp>
+
+#include <condition_variable>
+#include <cstdint>
+#include <deque>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <utility>
+#include <vector>
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+    /**
+     * Bin contents of one histogram of a preview, and its color (0xRRGGBB)
+     **/
+    struct PreviewSeries {
+        std::vector<double> values;
+        uint32_t color = 0;
+    };
+
+    /**
+     * What a plot shows, as plain bin arrays: enough to draw a thumbnail
+     * without ROOT
+     **/
+    struct PreviewPlot {
+        // Output path, relative to the output folder and without extension
+        std::string path;
+
+        // Low edges of the bins, and upper edge of the last one
+        std::vector<double> edges;
+
+        // Contributions of the MC stack, bottom first
+        std::vector<PreviewSeries> stack;
+        // MC uncertainty band, empty if not shown
+        std::vector<double> band_low;
+        std::vector<double> band_high;
+
+        // Empty if there is no data
+        std::vector<double> data;
+        std::vector<double> data_error_low;
+        std::vector<double> data_error_high;
+
+        std::vector<PreviewSeries> signals;
+
+        bool log_y = false;
+        bool show_ratio = false;
+        Range ratio_range = {0.5, 1.5};
+    };
+
+    /**
+     * RGB image, with just enough primitives to draw a preview
+     **/
+    class PreviewImage {
+        public:
+            PreviewImage(size_t width, size_t height);
+
+            size_t width() const {
+                return m_width;
+            }
+
+            size_t height() const {
+                return m_height;
+            }
+
+            /**
+             * Fill the rectangle [x1, x2] x [y1, y2] (pixels, clipped to the
+             * image), blending `color` with an opacity `alpha`
+             **/
+            void fill(int x1, int y1, int x2, int y2, uint32_t color, float alpha = 1);
+
+            bool writePNG(const fs::path& path) const;
+
+        private:
+            size_t m_width;
+            size_t m_height;
+            std::vector<uint8_t> m_pixels;
+    };
+
+    /**
+     * Draw a preview thumbnail
+     **/
+    void rasterizePreview(const PreviewPlot& plot, PreviewImage& image);
+
+    /**
+     * Rasterize previews in background threads as they are added, and write
+     * an HTML gallery of all of them once finished
+     **/
+    class PreviewWriter {
+        public:
+            PreviewWriter(const fs::path& output, size_t threads);
+            ~PreviewWriter();
+
+            void add(PreviewPlot&& plot);
+
+            /**
+             * Wait for all the previews, and write the gallery (index.html).
+             * Return false if any preview could not be written.
+             **/
+            bool finish();
+
+            PreviewWriter(PreviewWriter const&) = delete;
+            PreviewWriter(PreviewWriter&&) = delete;
+            PreviewWriter& operator=(PreviewWriter const&) = delete;
+            PreviewWriter& operator=(PreviewWriter &&) = delete;
+
+        private:
+            void work();
+
+            fs::path m_output;
+
+            std::mutex m_mutex;
+            std::condition_variable m_condition;
+            std::deque<PreviewPlot> m_queue;
+            bool m_done = false;
+            size_t m_failures = 0;
+
+            // Path of every preview, in the order the plots were added
+            std::vector<std::string> m_paths;
+
+            std::vector<std::thread> m_threads;
+    };
+}
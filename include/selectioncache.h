@@ -0,0 +1,52 @@
+#pragma once
+
+#include <boost/filesystem.hpp>
+
+#include <cstdint>
+#include <map>
+#include <memory>
+#include <string>
+
+class TChain;
+class TEntryList;
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+  /**
+   * Entries of the input trees passing each selection, so that a selection
+   * shared by several plots is evaluated over all the entries only once per
+   * file. Entries are keyed by the tree name, the selection and the file
+   * path, size and modification time. Optionally persisted to disk, as a ROOT
+   * file of TEntryList.
+   **/
+  class SelectionCache {
+    public:
+      /**
+       * Entries of `chain`, made of the single file `path`, passing
+       * `selection`; computed if not known yet. Return nullptr if they
+       * cannot be computed.
+       **/
+      TEntryList* get(TChain& chain, const std::string& path, const std::string& selection);
+
+      /**
+       * Load the entries saved by a previous run, dropping those of files
+       * which changed since
+       **/
+      bool load(const fs::path& path);
+      bool save(const fs::path& path) const;
+
+    private:
+      struct Entry {
+        std::string path;
+        uint64_t size = 0;
+        int64_t mtime = 0;
+
+        std::shared_ptr<TEntryList> list;
+      };
+
+      // Name of the entry list -> entry
+      std::map<std::string, Entry> m_entries;
+      bool m_modified = false;
+  };
+}
@@ -0,0 +1,59 @@
+#pragma once
+
+#include <regex>
+#include <string>
+#include <vector>
+
+namespace plotIt {
+
+    /**
+     * Plots to render, from `--select` expressions `[field](=|~)pattern`:
+     * `field` is `name` (the default), `dir` (folder of the plot) or
+     * `category` (yields category), and the pattern is a glob pattern after
+     * `=` or a regular expression after `~`. A plot is selected if it matches
+     * at least one expression of each field used. An empty selector selects
+     * everything.
+     **/
+    class PlotSelector {
+        public:
+            PlotSelector() = default;
+
+            /**
+             * Throw std::invalid_argument if an expression is invalid
+             **/
+            explicit PlotSelector(const std::vector<std::string>& expressions);
+
+            bool empty() const {
+                return m_names.empty() && m_folders.empty() && m_categories.empty();
+            }
+
+            /**
+             * Whether plots of this yields category may be selected, before
+             * their name is known
+             **/
+            bool matchesCategory(const std::string& category) const;
+
+            bool matches(const std::string& name, const std::string& category) const;
+
+            /**
+             * False if no plot inside `folder`, or its sub-folders, can be
+             * selected: its content does not need to be listed
+             **/
+            bool mayMatchFolder(const std::string& folder) const;
+
+        private:
+            struct Pattern {
+                bool is_regex = false;
+                std::string glob;
+                std::regex regex;
+                // Part of the glob pattern before the first wildcard
+                std::string prefix;
+            };
+
+            static bool matches(const std::vector<Pattern>& patterns, const std::string& value);
+
+            std::vector<Pattern> m_names;
+            std::vector<Pattern> m_folders;
+            std::vector<Pattern> m_categories;
+    };
+}
@@ -0,0 +1,66 @@
+#pragma once
+
+#include <types.h>
+#include <yields.h>
+
+#include <boost/filesystem.hpp>
+
+#include <string>
+#include <vector>
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+    /**
+     * Relative cost of rendering a plot, used to balance the shards
+     **/
+    double estimatePlotCost(const Plot& plot);
+
+    /**
+     * Split plots of the given costs in `count` shards of about the same total
+     * cost. Deterministic: the same costs always give the same shards. Return
+     * the (0-based) shard of each plot.
+     **/
+    std::vector<size_t> assignShards(const std::vector<double>& costs, size_t count);
+
+    /**
+     * Name of the manifest written by shard `index` (1-based) in the output folder
+     **/
+    std::string shardManifestName(size_t index, size_t count);
+
+    /**
+     * Name of a file written by shard `index`, from the name of the file
+     * written when not sharding
+     **/
+    std::string shardFileName(const std::string& name, size_t index, size_t count);
+
+    /**
+     * What a shard produced, and what is needed to merge it with the other
+     * shards without the configuration
+     **/
+    struct ShardManifest {
+        size_t index = 0;
+        size_t count = 0;
+        size_t plots = 0;
+
+        // Relative to the folder of the manifest
+        std::string book_keeping_file;
+        std::string book_keeping_shard_file;
+
+        bool has_yields = false;
+        YieldsTable yields;
+        // Only the yields table settings are kept
+        Configuration config;
+
+        bool save(const fs::path& path) const;
+        bool load(const fs::path& path);
+    };
+
+    /**
+     * Merge the output of all the shards of a job: yields table and
+     * book-keeping file. If `manifests` is empty, all the manifests found in
+     * the output folder are used.
+     **/
+    bool mergeShards(const fs::path& output, std::vector<fs::path> manifests);
+}
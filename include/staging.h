@@ -0,0 +1,155 @@
+#pragma once
+
+#include <boost/filesystem.hpp>
+
+#include <atomic>
+#include <condition_variable>
+#include <cstdint>
+#include <deque>
+#include <map>
+#include <mutex>
+#include <set>
+#include <string>
+#include <thread>
+#include <vector>
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+    /**
+     * Local copies of the input files, for inputs on slow (network)
+     * filesystems: files are copied with large sequential reads by
+     * background threads, ahead of the time they are opened, and then read
+     * from the local disk.
+     *
+     * The staging folder is bounded by a budget, the least recently used
+     * files being removed first. Staged files are kept from one run to the
+     * next, and reused as long as the size and modification time of the
+     * original file are unchanged.
+     **/
+    class StagingArea {
+        public:
+            static StagingArea& get() {
+                static StagingArea s_instance;
+
+                return s_instance;
+            }
+
+            /**
+             * Stage files in `folder`, using at most `budget` bytes
+             **/
+            void enable(const fs::path& folder, uint64_t budget);
+
+            bool enabled() const {
+                return ! m_folder.empty();
+            }
+
+            /**
+             * Start copying these files in the background, in this order.
+             * Files already staged are not copied again. Until they are
+             * opened, or `prefetch` is called again, they are not evicted:
+             * files past the budget are not staged. Files of `optional`,
+             * which may not be read at all, can be evicted.
+             **/
+            void prefetch(const std::vector<std::string>& paths, const std::set<std::string>& optional = {});
+
+            /**
+             * Path to open to read `path`: its staged copy, waiting for it if
+             * it is being copied, or `path` itself if it is not staged
+             **/
+            std::string localPath(const std::string& path);
+
+            /**
+             * Path of the staged copy of `path`, whether it exists or not
+             **/
+            std::string stagedPath(const std::string& path) const;
+
+            /**
+             * Write the list of the staged files, for the next runs
+             **/
+            bool save();
+
+            /**
+             * Stop copying, and save the list of the staged files
+             **/
+            void finish();
+
+            StagingArea(StagingArea const&) = delete;
+            StagingArea(StagingArea&&) = delete;
+            StagingArea& operator=(StagingArea const&) = delete;
+            StagingArea& operator=(StagingArea &&) = delete;
+
+        protected:
+            StagingArea() = default;
+            ~StagingArea();
+
+        private:
+            enum State {
+                QUEUED,
+                COPYING,
+                READY,
+                FAILED
+            };
+
+            struct Entry {
+                State state = QUEUED;
+
+                // Size and modification time of the original file
+                uint64_t size = 0;
+                int64_t mtime = 0;
+
+                // Last time the staged copy was used, for the eviction
+                int64_t last_used = 0;
+                // Prefetched and not opened yet: not evicted
+                bool wanted = false;
+            };
+
+            void work();
+
+            /**
+             * Queue `path` for staging, if it is not staged already.
+             * Must be called with the lock held.
+             **/
+            void enqueue(const std::string& path, bool wanted);
+
+            /**
+             * Remove the staged copy of `path`. Must be called with the lock held.
+             **/
+            void remove(const std::string& path);
+
+            /**
+             * Remove the least recently used staged copies until `size` more
+             * bytes fit in the budget. Must be called with the lock held.
+             **/
+            bool reserve(uint64_t size);
+
+            /**
+             * Read the list of the staged files, and remove the copies which
+             * are not in it
+             **/
+            void load();
+
+            fs::path m_folder;
+            uint64_t m_budget = 0;
+            // Bytes used by the staged copies, including the ones being copied
+            uint64_t m_used = 0;
+
+            std::mutex m_mutex;
+            std::condition_variable m_condition;
+            // Also read by the copies in progress, without the lock
+            std::atomic<bool> m_done{false};
+
+            // Original path -> staged copy
+            std::map<std::string, Entry> m_entries;
+            std::deque<std::string> m_queue;
+
+            std::vector<std::thread> m_threads;
+
+            size_t m_copied_files = 0;
+            uint64_t m_copied_bytes = 0;
+            // Files opened from their staged copy, or from the original
+            size_t m_hits = 0;
+            size_t m_misses = 0;
+    };
+}
@@ -3,6 +3,7 @@
 #include <string>
 #include <memory>
 #include <regex>
+#include <vector>
 
 namespace YAML {
     class Node;
@@ -71,6 +72,12 @@ namespace plotIt {
          * apply is called.
          */
         virtual SystematicSet newSet(TObject* nominal, File& file, const Plot& plot);
+
+        /**
+         * Files other than `file` that newSet may read the variations of
+         * `file` from
+         **/
+        virtual std::vector<std::string> friendFiles(const File& file) const;
     };
 
     struct ConstantSystematic: public Systematic {
@@ -101,6 +108,7 @@ namespace plotIt {
     struct ShapeSystematic: public Systematic {
         ShapeSystematic(const YAML::Node& node);
         virtual SystematicSet newSet(TObject* nominal, File& file, const Plot& plot) override;
+        virtual std::vector<std::string> friendFiles(const File& file) const override;
     };
 
     class SystematicFactory {
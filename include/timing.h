@@ -0,0 +1,87 @@
+#pragma once
+
+#include <chrono>
+#include <iomanip>
+#include <iostream>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace plotIt {
+    /**
+     * Accumulate the wall time spent in each phase of a run ("parse", "load",
+     * "plot", ...). The report is printed at the end of the run when timing is
+     * requested on the command line, and is meant to be parsed by the benchmark
+     * suite (see test/benchmarks).
+     **/
+    class PhaseTimings {
+        public:
+            static PhaseTimings& get() {
+                static PhaseTimings s_instance;
+
+                return s_instance;
+            }
+
+            void add(const std::string& phase, double seconds) {
+                for (auto& timing: m_timings) {
+                    if (timing.first == phase) {
+                        timing.second += seconds;
+                        return;
+                    }
+                }
+
+                m_timings.push_back(std::make_pair(phase, seconds));
+            }
+
+            void count(const std::string& counter, size_t value = 1) {
+                for (auto& c: m_counters) {
+                    if (c.first == counter) {
+                        c.second += value;
+                        return;
+                    }
+                }
+
+                m_counters.push_back(std::make_pair(counter, value));
+            }
+
+            void print(std::ostream& out) const {
+                for (const auto& timing: m_timings)
+                    out << "plotIt timing: " << timing.first << " " << std::fixed << std::setprecision(6) << timing.second << std::endl;
+
+                for (const auto& c: m_counters)
+                    out << "plotIt count: " << c.first << " " << c.second << std::endl;
+            }
+
+            PhaseTimings(PhaseTimings const&) = delete;
+            PhaseTimings(PhaseTimings&&) = delete;
+            PhaseTimings& operator=(PhaseTimings const&) = delete;
+            PhaseTimings& operator=(PhaseTimings &&) = delete;
+
+        protected:
+            PhaseTimings() = default;
+
+        private:
+            std::vector<std::pair<std::string, double>> m_timings;
+            std::vector<std::pair<std::string, size_t>> m_counters;
+    };
+
+    /**
+     * Add the time elapsed between construction and destruction to a phase
+     **/
+    class ScopedTimer {
+        public:
+            ScopedTimer(const std::string& phase):
+                m_phase(phase), m_start(std::chrono::steady_clock::now()) {
+                // Empty
+            }
+
+            ~ScopedTimer() {
+                std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - m_start;
+                PhaseTimings::get().add(m_phase, elapsed.count());
+            }
+
+        private:
+            std::string m_phase;
+            std::chrono::steady_clock::time_point m_start;
+    };
+}
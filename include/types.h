@@ -5,9 +5,9 @@
 #include <boost/optional.hpp>
 
 #include <iostream>
+#include <memory>
 
 #include <defines.h>
-#include <uuid.h>
 #include <systematics.h>
 
 #include <cmath>
@@ -126,6 +126,18 @@ namespace plotIt {
   struct RenameOp {
       std::regex from;
       std::string to;
+      // Source of `from`
+      std::string pattern;
+  };
+
+  // Color created from its RGB value in the configuration, see loadColor
+  struct CustomColor {
+      int16_t index;
+      float r;
+      float g;
+      float b;
+      float a;
+      std::string name;
   };
 
   struct File {
@@ -152,10 +164,17 @@ namespace plotIt {
     Type type = MC;
 
     TObject* object = nullptr;
-    std::map<std::string, TObject*> objects;
+
+    // Objects and systematics of the plots of the current chunk, indexed by plot.id - objects_offset
+    size_t objects_offset = 0;
+    std::vector<TObject*> objects;
+    // Objects loaded once and shared by several plots, not yet copied for the plot of the slot
+    std::vector<bool> shared_objects;
 
     std::vector<SystematicSet>* systematics;
-    std::map<std::string, std::vector<SystematicSet>> systematics_cache;
+    std::vector<std::vector<SystematicSet>> systematics_cache;
+    // Indices of the systematics applying to this file, matched once against its path
+    std::vector<size_t> applicable_systematics;
 
     int16_t order = std::numeric_limits<int16_t>::min();
 
@@ -273,10 +292,11 @@ namespace plotIt {
     Line(const YAML::Node& node, Orientation);
   };
 
-  struct Plot {
-    std::string name;
-    std::string output_suffix;
-    std::string uid = get_uuid();
+  /**
+   * Settings of a plot entry of the configuration. Shared by all the plots
+   * expanded from this entry, and never modified once parsed.
+   **/
+  struct PlotTemplate {
     std::string exclude;
     std::string book_keeping_folder;
     std::vector<RenameOp> renaming_ops;
@@ -285,8 +305,6 @@ namespace plotIt {
     bool override = false; // flag to plot only those which have it true (if at least one plot has it true)
     bool normalized = false;
     bool normalizedByBinWidth = false;
-    bool log_y = false;
-    bool log_x = false;
 
     std::string x_axis;
     std::string y_axis = "Events";
@@ -312,8 +330,6 @@ namespace plotIt {
 
     std::vector<std::string> save_extensions = {"pdf"};
 
-    bool show_ratio = false;
-
     bool fit = false;
     std::string fit_function = "gaus";
     std::string fit_legend = "#scale[1.6]{#splitline{#mu = %2$.3f}{#sigma = %3$.3f}}";
@@ -342,12 +358,9 @@ namespace plotIt {
 
     ErrorsType errors_type = Poisson;
 
-    bool use_for_yields = false;
     std::string yields_title;
     int yields_table_order = 0;
 
-    bool is_rescaled = false;
-
     bool sort_by_yields = true;
 
     std::vector<Line> lines;
@@ -359,20 +372,48 @@ namespace plotIt {
     // Show or hide ticks for each axis
     bool x_axis_hide_ticks = false;
     bool y_axis_hide_ticks = false;
-    
+  };
+
+  /**
+   * A plot to draw: the few fields which differ between the plots expanded
+   * from the same configuration entry, and the settings of this entry,
+   * accessed with '->'
+   **/
+  struct Plot {
+    std::string name;
+    std::string output_suffix;
+    // Dense index of the plot in the list of expanded plots, see plotIt::plotAll
+    size_t id = 0;
+    // Index of the plot in the full list of expanded plots, when only a shard is rendered
+    size_t global_id = 0;
+
+    bool log_y = false;
+    bool log_x = false;
+
+    bool show_ratio = false;
+
+    bool use_for_yields = false;
+
+    bool is_rescaled = false;
+
+    std::shared_ptr<const PlotTemplate> settings = std::make_shared<PlotTemplate>();
+
+    const PlotTemplate* operator->() const {
+      return settings.get();
+    }
+
     void print() {
       std::cout << "Plot '" << name << "'" << std::endl;
-      std::cout << "\tx_axis: " << x_axis << std::endl;
-      std::cout << "\ty_axis: " << y_axis << std::endl;
+      std::cout << "\tx_axis: " << settings->x_axis << std::endl;
+      std::cout << "\ty_axis: " << settings->y_axis << std::endl;
       std::cout << "\tshow_ratio: " << show_ratio << std::endl;
-      std::cout << "\tinherits_from: " << inherits_from << std::endl;
-      std::cout << "\tsave_extensions: " << boost::algorithm::join(save_extensions, ", ") << std::endl;
+      std::cout << "\tinherits_from: " << settings->inherits_from << std::endl;
+      std::cout << "\tsave_extensions: " << boost::algorithm::join(settings->save_extensions, ", ") << std::endl;
     }
 
     Plot Clone(const std::string& new_name) {
       Plot clone = *this;
       clone.name = new_name;
-      clone.uid = get_uuid();
 
       return clone;
     }
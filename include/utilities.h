@@ -42,13 +42,13 @@ namespace plotIt {
 
   template<class T>
     void setAxisTitles(T* object, Plot& plot) {
-      if (plot.x_axis.length() > 0 && object->GetXaxis()) {
-        object->GetXaxis()->SetTitle(plot.x_axis.c_str());
+      if (plot->x_axis.length() > 0 && object->GetXaxis()) {
+        object->GetXaxis()->SetTitle(plot->x_axis.c_str());
       }
 
-      if (plot.y_axis.length() > 0 && object->GetYaxis()) {
+      if (plot->y_axis.length() > 0 && object->GetYaxis()) {
         float binSize = object->GetXaxis()->GetBinWidth(1);
-        std::string title = plot.y_axis;
+        std::string title = plot->y_axis;
 
         bool isEquidistantBinning = true;
         for(int i = 2; i <= object->GetXaxis()->GetNbins(); ++i) {
@@ -57,16 +57,16 @@ namespace plotIt {
         }
 
         if(isEquidistantBinning){
-          boost::format formatter = get_formatter(plot.y_axis_format);
+          boost::format formatter = get_formatter(plot->y_axis_format);
           object->GetYaxis()->SetTitle((formatter % title % binSize).str().c_str());
         }
-        else if(plot.normalizedByBinWidth){
+        else if(plot->normalizedByBinWidth){
           std::string format_string = "%1%/%2%";
           boost::format formatter = get_formatter(format_string);
           object->GetYaxis()->SetTitle((formatter % title % "Bin width").str().c_str());
         }
         else{
-          boost::format formatter = get_formatter(plot.y_axis_format);
+          boost::format formatter = get_formatter(plot->y_axis_format);
           object->GetYaxis()->SetTitle((formatter % title % binSize).str().c_str());
         }
       }
@@ -91,12 +91,12 @@ namespace plotIt {
       object->GetYaxis()->SetTitleOffset(1.5);
       object->GetYaxis()->SetLabelOffset(0.01);
       object->GetYaxis()->SetTickLength(0.03);
-      object->GetYaxis()->SetLabelSize(plot.y_axis_label_size);
+      object->GetYaxis()->SetLabelSize(plot->y_axis_label_size);
 
       object->GetXaxis()->SetTitleOffset(1.5 * topBottomScaleFactor);
       object->GetXaxis()->SetLabelOffset(0.012 * topBottomScaleFactor);
       object->GetXaxis()->SetTickLength(0.03);
-      object->GetXaxis()->SetLabelSize(plot.x_axis_label_size);
+      object->GetXaxis()->SetLabelSize(plot->x_axis_label_size);
 
       // No stats box
       object->SetStats(false);
@@ -186,6 +186,17 @@ namespace plotIt {
 
   int16_t loadColor(const YAML::Node& node);
 
+  /**
+   * Colors created by loadColor, in order, by all the configurations
+   **/
+  std::vector<CustomColor>& createdColors();
+
+  /**
+   * Create again a color created by loadColor, with the same index. Return
+   * false if a different color already uses this index.
+   **/
+  bool restoreColor(const CustomColor& color);
+
   inline std::vector<std::string> glob(const std::string& pat) {
       glob_t glob_result;
       glob(pat.c_str(), GLOB_TILDE, NULL, &glob_result);
@@ -1,5 +0,0 @@
-#pragma once
-
-#include <string>
-
-std::string get_uuid();
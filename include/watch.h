@@ -0,0 +1,66 @@
+#pragma once
+
+#include <boost/filesystem.hpp>
+
+#include <map>
+#include <set>
+#include <string>
+#include <vector>
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+    /**
+     * Wait for changes of a set of files, with inotify (Linux only). The
+     * folders holding the files are watched rather than the files themselves,
+     * so that files replaced by a new one (written elsewhere, then moved, as
+     * many tools do) are still seen.
+     **/
+    class FileWatcher {
+        public:
+            FileWatcher();
+            ~FileWatcher();
+
+            /**
+             * False if inotify is not available
+             **/
+            bool valid() const {
+                return m_fd >= 0;
+            }
+
+            /**
+             * Watch these files too. Paths are reported by `wait` as given here.
+             **/
+            void watch(const std::set<std::string>& paths);
+
+            /**
+             * Block until at least one watched file is written or replaced,
+             * then return every file changed until nothing happens for
+             * `quiet_ms` milliseconds: writing a file often takes several
+             * steps, which should not trigger several updates.
+             **/
+            std::set<std::string> wait(int quiet_ms = 500);
+
+            FileWatcher(FileWatcher const&) = delete;
+            FileWatcher(FileWatcher&&) = delete;
+            FileWatcher& operator=(FileWatcher const&) = delete;
+            FileWatcher& operator=(FileWatcher &&) = delete;
+
+        private:
+            /**
+             * Read the pending events, and add the watched files they concern
+             * to `changed`
+             **/
+            void read(std::set<std::string>& changed);
+
+            int m_fd = -1;
+
+            // Watch descriptor -> watched folder, possibly written in several ways
+            std::map<int, std::vector<fs::path>> m_folders;
+            std::set<fs::path> m_watched_folders;
+
+            // Absolute path -> path as given to `watch`
+            std::map<fs::path, std::string> m_files;
+    };
+}
@@ -0,0 +1,75 @@
+#pragma once
+
+#include <types.h>
+
+#include <boost/filesystem.hpp>
+
+#include <map>
+#include <set>
+#include <string>
+#include <utility>
+
+namespace YAML {
+    class Node;
+}
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+    /**
+     * Yields of one category of the yields table. Only raw sums and squared
+     * errors are kept, so that partial tables can be merged.
+     **/
+    struct YieldsCategory {
+        // Index, in the full list of plots, of the plot the yields come from
+        size_t plot = 0;
+        int order = 0;
+
+        double data = 0;
+
+        // Process name -> (yield, squared statistical error)
+        std::map<std::string, std::pair<double, double>> mc;
+        std::map<std::string, std::pair<double, double>> signal;
+
+        double mc_total = 0;
+        double mc_total_sqerr = 0;
+
+        // (Type, process name) -> sum of the quadratic sums of the systematics of each file
+        std::map<std::pair<Type, std::string>, double> process_systematics;
+        // Type -> squared total systematics
+        std::map<Type, double> total_systematics_squared;
+    };
+
+    /**
+     * Content of the yields table, filled chunk by chunk, and possibly shard
+     * by shard.
+     **/
+    struct YieldsTable {
+        std::map<std::string, YieldsCategory> categories;
+        std::set<std::string> mc_processes;
+        std::set<std::string> signal_processes;
+        bool has_data = false;
+
+        /**
+         * Create the category `title`, filled from the plot of index `plot`.
+         * Return nullptr if the category is already filled from a plot coming
+         * before.
+         **/
+        YieldsCategory* add(const std::string& title, size_t plot, int order);
+
+        /**
+         * Merge a partial table. When both define the same category, the one
+         * coming from the first plot is kept, like when filling a single table.
+         **/
+        void merge(const YieldsTable& other);
+
+        YAML::Node toYAML() const;
+        static YieldsTable fromYAML(const YAML::Node& node);
+    };
+
+    /**
+     * Write the yields table as LaTeX
+     **/
+    bool writeYieldsTable(const YieldsTable& table, const Configuration& config, const fs::path& output);
+}
@@ -0,0 +1,235 @@
+/**
+ * Python bindings for plotIt
+ *
+ * Configurations are given as Python dicts (with the same structure as the
+ * YAML files), and histograms can be given as NumPy arrays, registered as
+ * objects of in-memory files (memory://...), without writing any ROOT file.
+ *
+ *   import numpy as np
+ *   import plotit
+ *
+ *   plotit.add_histogram('memory://data.root', 'histo1', contents, edges)
+ *   p = plotit.PlotIt('plots/')
+ *   p.parse({'configuration': {...}, 'files': {'memory://data.root': {...}}, 'plots': {...}})
+ *   p.plot_all()
+ */
+
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <pybind11/stl.h>
+
+#include <algorithm>
+#include <cmath>
+#include <memory>
+#include <string>
+
+#include <TH1D.h>
+
+#include "yaml-cpp/yaml.h"
+
+#include <cache.h>
+#include <commandlinecfg.h>
+#include <plotIt.h>
+#include <pool.h>
+#include <summary.h>
+
+namespace py = pybind11;
+
+namespace {
+
+  /**
+   * Convert a Python object (dict, list, tuple, scalars) to a YAML node
+   */
+  YAML::Node toYAML(const py::handle& object) {
+    if (object.is_none())
+      return YAML::Node(YAML::NodeType::Null);
+
+    if (py::isinstance<py::dict>(object)) {
+      YAML::Node node(YAML::NodeType::Map);
+      for (const auto& item: py::reinterpret_borrow<py::dict>(object))
+        node[py::str(item.first).cast<std::string>()] = toYAML(item.second);
+
+      return node;
+    }
+
+    if (py::isinstance<py::list>(object) || py::isinstance<py::tuple>(object)) {
+      YAML::Node node(YAML::NodeType::Sequence);
+      for (const auto& item: object)
+        node.push_back(toYAML(item));
+
+      return node;
+    }
+
+    if (py::isinstance<py::str>(object))
+      return YAML::Node(object.cast<std::string>());
+
+    // bool must be checked before int, it's a subclass
+    if (py::isinstance<py::bool_>(object))
+      return YAML::Node(object.cast<bool>() ? "true" : "false");
+
+    // Python and NumPy integers
+    if (py::hasattr(object, "__index__"))
+      return YAML::Node(py::str(py::reinterpret_borrow<py::object>(object).attr("__index__")()).cast<std::string>());
+
+    if (py::hasattr(object, "__float__")) {
+      double value = object.cast<double>();
+      if (std::isnan(value))
+        return YAML::Node(".nan");
+      if (std::isinf(value))
+        return YAML::Node(value > 0 ? ".inf" : "-.inf");
+
+      // repr gives the shortest string representing exactly the value
+      return YAML::Node(py::repr(py::float_(value)).cast<std::string>());
+    }
+
+    throw py::type_error("Cannot convert object of type " + py::str(py::type::of(object)).cast<std::string>() + " to a configuration value");
+  }
+
+  using Array = py::array_t<double, py::array::c_style | py::array::forcecast>;
+
+  /**
+   * Copy a 1D array of either n (without under- and overflow) or n + 2 values
+   * into the storage of a histogram of n bins
+   */
+  void copyToStorage(const Array& values, size_t n_bins, double* storage, const std::string& what) {
+    if (values.ndim() != 1)
+      throw py::value_error(what + " must be a 1D array");
+
+    size_t size = values.shape(0);
+    if (size == n_bins)
+      std::copy(values.data(), values.data() + size, storage + 1);
+    else if (size == n_bins + 2)
+      std::copy(values.data(), values.data() + size, storage);
+    else
+      throw py::value_error(what + " must have either " + std::to_string(n_bins) + " or " + std::to_string(n_bins + 2) + " (with under- and overflow) values");
+  }
+
+  /**
+   * Register a histogram, built from NumPy arrays, as object `name` of the
+   * in-memory file `path`.
+   *
+   * TH1 owns its storage, so the buffers are copied once, straight into the
+   * histogram arrays; no intermediate object or file is created.
+   */
+  void addHistogram(const std::string& path, const std::string& name, const Array& contents, const Array& edges,
+      const py::object& sumw2, const py::object& entries) {
+
+    if (edges.ndim() != 1 || edges.shape(0) < 2)
+      throw py::value_error("edges must be a 1D array with at least two values");
+
+    size_t n_bins = edges.shape(0) - 1;
+
+    std::shared_ptr<TH1D> h(new TH1D(name.c_str(), name.c_str(), n_bins, edges.data()));
+    h->SetDirectory(nullptr);
+
+    double* storage = static_cast<TArrayD*>(h.get())->GetArray();
+    copyToStorage(contents, n_bins, storage, "contents");
+
+    if (! sumw2.is_none()) {
+      h->Sumw2(true);
+      copyToStorage(sumw2.cast<Array>(), n_bins, h->GetSumw2()->GetArray(), "sumw2");
+    }
+
+    double n_entries = 0;
+    if (! entries.is_none()) {
+      n_entries = entries.cast<double>();
+    } else {
+      for (size_t i = 0; i < n_bins + 2; i++)
+        n_entries += storage[i];
+    }
+    h->SetEntries(n_entries);
+
+    plotIt::InputCache::get().addObject(path, name, h);
+  }
+
+  fs::path createOutputFolder(const std::string& output) {
+    fs::path path = fs::absolute(output);
+    if (! fs::exists(path))
+      fs::create_directories(path);
+
+    return path;
+  }
+
+  class PyPlotIt {
+    public:
+      PyPlotIt(const std::string& output):
+        m_plotIt(createOutputFolder(output)) {
+          m_plotIt.setKeepSummaries(true);
+        }
+
+      bool parse(const py::dict& configuration, const std::string& base, const std::string& histograms_folder) {
+        YAML::Node node = toYAML(configuration);
+        return m_plotIt.parseConfiguration(node, fs::absolute(base), fs::absolute(histograms_folder));
+      }
+
+      bool parseFile(const std::string& file, const std::string& histograms_folder) {
+        return m_plotIt.parseConfigurationFile(file, fs::absolute(histograms_folder));
+      }
+
+      void plotAll(const std::string& filter) {
+        {
+          py::gil_scoped_release release;
+          m_plotIt.plotAll(filter);
+        }
+
+        plotIt::TemporaryPool::get().clearRuntime();
+      }
+
+      const std::vector<std::pair<std::string, plotIt::Summary>>& summaries() const {
+        return m_plotIt.getSummaries();
+      }
+
+    private:
+      plotIt::plotIt m_plotIt;
+  };
+}
+
+PYBIND11_MODULE(plotit, m) {
+  m.doc() = "Python bindings for plotIt";
+
+  // Objects are shared between configurations, and in-memory files live in the cache
+  plotIt::InputCache::get().setEnabled(true);
+
+  py::enum_<plotIt::Type>(m, "Type")
+    .value("MC", plotIt::MC)
+    .value("SIGNAL", plotIt::SIGNAL)
+    .value("DATA", plotIt::DATA);
+
+  py::class_<plotIt::SummaryItem>(m, "SummaryItem")
+    .def_readonly("name", &plotIt::SummaryItem::name)
+    .def_readonly("process_id", &plotIt::SummaryItem::process_id)
+    .def_readonly("events", &plotIt::SummaryItem::events)
+    .def_readonly("events_uncertainty", &plotIt::SummaryItem::events_uncertainty)
+    .def_readonly("efficiency", &plotIt::SummaryItem::efficiency)
+    .def_readonly("efficiency_uncertainty", &plotIt::SummaryItem::efficiency_uncertainty);
+
+  py::class_<plotIt::Summary>(m, "Summary")
+    .def("get", &plotIt::Summary::get, py::arg("type"))
+    .def("get_systematics", &plotIt::Summary::getSystematics, py::arg("type"), py::arg("process_id"));
+
+  py::class_<PyPlotIt>(m, "PlotIt")
+    .def(py::init<const std::string&>(), py::arg("output_folder"))
+    .def("parse", &PyPlotIt::parse, "Parse a configuration given as a dict",
+        py::arg("configuration"), py::arg("base") = ".", py::arg("histograms_folder") = ".")
+    .def("parse_file", &PyPlotIt::parseFile, "Parse a YAML configuration file",
+        py::arg("file"), py::arg("histograms_folder") = ".")
+    .def("plot_all", &PyPlotIt::plotAll, "Render all the plots, or only the ones matching the glob pattern `filter`",
+        py::arg("filter") = "")
+    .def_property_readonly("summaries", &PyPlotIt::summaries, "List of (plot name, Summary) of the rendered plots");
+
+  m.def("add_histogram", &addHistogram, "Register a histogram built from NumPy arrays in an in-memory file",
+      py::arg("path"), py::arg("name"), py::arg("contents"), py::arg("edges"),
+      py::arg("sumw2") = py::none(), py::arg("entries") = py::none());
+
+  m.def("clear_cache", []() { plotIt::InputCache::get().clear(); },
+      "Close all the input files and forget all the histograms, including the in-memory ones");
+
+  m.def("configure", [](bool verbose, bool plots, bool yields, bool unblind, const std::string& era) {
+        CommandLineCfg::get().verbose = verbose;
+        CommandLineCfg::get().do_plots = plots;
+        CommandLineCfg::get().do_yields = yields;
+        CommandLineCfg::get().unblind = unblind;
+        CommandLineCfg::get().era = era;
+      }, "Global options, equivalent to the command line switches",
+      py::arg("verbose") = false, py::arg("plots") = true, py::arg("yields") = false, py::arg("unblind") = false, py::arg("era") = "");
+}
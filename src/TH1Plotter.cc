@@ -1,18 +1,25 @@
 #include <TH1Plotter.h>
 
 #include <TCanvas.h>
+#include <TColor.h>
 #include <TEfficiency.h>
 #include <TF1.h>
 #include <TFitResult.h>
 #include <TLatex.h>
 #include <TLine.h>
 #include <TObject.h>
+#include <TPad.h>
+#include <TROOT.h>
 #include <TPave.h>
 #include <TVirtualFitter.h>
 #include <TGraphAsymmErrors.h>
 
 #include <commandlinecfg.h>
+#include <fitcache.h>
+#include <layout.h>
+#include <poisson.h>
 #include <pool.h>
+#include <timing.h>
 #include <utilities.h>
 
 namespace plotIt {
@@ -23,6 +30,9 @@ namespace plotIt {
     std::shared_ptr<TGraphAsymmErrors> getRatio(TH1* a, TH1* b) {
         std::shared_ptr<TGraphAsymmErrors> g(new TGraphAsymmErrors(a));
 
+        BinErrors a_errors = PoissonIntervals::get().errors(*a);
+        BinErrors b_errors = PoissonIntervals::get().errors(*b);
+
         size_t npoint = 0;
         for (size_t i = 1; i <= (size_t) a->GetNbinsX(); i++) {
             float b1 = a->GetBinContent(i);
@@ -36,11 +46,11 @@ namespace plotIt {
             float b1sq = b1 * b1;
             float b2sq = b2 * b2;
 
-            float e1sq_up = a->GetBinErrorUp(i) * a->GetBinErrorUp(i);
-            float e2sq_up = b->GetBinErrorUp(i) * b->GetBinErrorUp(i);
+            float e1sq_up = a_errors.up[i] * a_errors.up[i];
+            float e2sq_up = b_errors.up[i] * b_errors.up[i];
 
-            float e1sq_low = a->GetBinErrorLow(i) * a->GetBinErrorLow(i);
-            float e2sq_low = b->GetBinErrorLow(i) * b->GetBinErrorLow(i);
+            float e1sq_low = a_errors.low[i] * a_errors.low[i];
+            float e2sq_low = b_errors.low[i] * b_errors.low[i];
 
             float error_up = sqrt((e1sq_up * b2sq + e2sq_up * b1sq) / (b2sq * b2sq));
             float error_low = sqrt((e1sq_low * b2sq + e2sq_low * b1sq) / (b2sq * b2sq));
@@ -59,20 +69,28 @@ namespace plotIt {
         return g;
     }
 
+    /*!
+     * RGB value (0xRRGGBB) of a ROOT color
+     */
+    uint32_t getRGB(Color_t index) {
+        TColor* color = gROOT->GetColor(index);
+        if (! color)
+            return 0x808080;
+
+        auto channel = [](float value) -> uint32_t {
+            return static_cast<uint32_t>(std::lround(255 * value)) & 0xff;
+        };
+
+        return (channel(color->GetRed()) << 16) | (channel(color->GetGreen()) << 8) | channel(color->GetBlue());
+    }
+
   bool TH1Plotter::supports(TObject& object) {
     return object.InheritsFrom("TH1");
   }
 
   TH1Plotter::Stacks TH1Plotter::buildStacks(bool sortByYields) {
-      std::set<int64_t> indices;
-
-      for (auto& file: m_plotIt.getFiles()) {
-          if (file.type == MC)
-              indices.emplace(file.stack_index);
-      }
-
       Stacks stacks;
-      for (auto index: indices) {
+      for (auto index: m_plotIt.getStackIndices()) {
           auto stack = buildStack(index, sortByYields);
           if (stack.stack)
               stacks.push_back(std::make_pair(index, stack));
@@ -92,10 +110,10 @@ namespace plotIt {
       // histogram.
       // Key is group name, value is group histogram
       std::vector<std::pair<std::string, std::shared_ptr<TH1>>> group_histograms;
-      for ( auto& file: m_plotIt.getFiles([this,index] ( const File& f ) {
-            return ( f.type == MC ) && ( f.stack_index == index )
-                && ( ! f.legend_group.empty() ) && ( dynamic_cast<TH1*>(f.object)->GetEntries() != 0 );
-            } ) ) {
+      for (auto& file: m_plotIt.getMCFiles(index)) {
+          if (file.legend_group.empty() || (dynamic_cast<TH1*>(file.object)->GetEntries() == 0))
+              continue;
+
           TH1* nominal = dynamic_cast<TH1*>(file.object);
           auto it = std::find_if(group_histograms.begin(), group_histograms.end(), [&file](const std::pair<std::string, std::shared_ptr<TH1>>& item) {
                   return item.first == file.legend_group;
@@ -112,10 +130,9 @@ namespace plotIt {
 
       std::vector<std::tuple<TH1*, std::string>> histograms_in_stack;
 
-      for ( auto& file: m_plotIt.getFiles([this,index] ( const File& f ) {
-            return ( f.type == MC ) && ( f.stack_index == index )
-                && ( ! ( ( dynamic_cast<TH1*>(f.object)->GetEntries() == 0 ) && (f.legend_group.empty()) ) );
-            } ) ) {
+      for (auto& file: m_plotIt.getMCFiles(index)) {
+          if ((dynamic_cast<TH1*>(file.object)->GetEntries() == 0) && file.legend_group.empty())
+              continue;
 
           TH1* nominal = dynamic_cast<TH1*>(file.object);
           if (!stack) {
@@ -185,10 +202,9 @@ namespace plotIt {
       // Key is systematics name, value is the combined systematics value for each bin
       std::map<std::string, std::vector<float>> combined_systematics_map;
 
-      for ( auto& file: m_plotIt.getFiles([this,index] ( const File& f ) {
-            return ( f.type != DATA ) && ( ! f.systematics->empty() )
-                && ( ( f.type != MC ) || ( f.stack_index == index ) ) ;
-            } ) ) {
+      for (auto& file: m_plotIt.getMCAndSignalFiles(index)) {
+          if (file.systematics->empty())
+              continue;
 
           for (auto& syst: *file.systematics) {
 
@@ -263,11 +279,61 @@ namespace plotIt {
           computeSystematics(stack.first, stack.second, summary);
   }
 
-  boost::optional<Summary> TH1Plotter::plot(TCanvas& c, Plot& plot) {
-    c.cd();
+  /**
+   * Fit `object` with `fct` in [xMin, xMax], and fill `errors` with the 68% confidence interval band.
+   * Identical fits are only done once: the results are memoized in the fit cache.
+   *
+   * Return false if the fit failed.
+   **/
+  template <class T>
+  bool TH1Plotter::fit(T& object, TF1& fct, const std::string& function, float xMin, float xMax, uint16_t n_points, TH1& errors) {
+    FitCache& cache = m_plotIt.getFitCache();
+    uint64_t key = FitCache::key(object, function, xMin, xMax, n_points);
+
+    const FitResult* cached = cache.find(key);
+    if (cached) {
+      PhaseTimings::get().count("fit-cache-hits");
+
+      if (! cached->valid)
+        return false;
+
+      fct.SetParameters(cached->parameters.data());
+      fct.SetParErrors(cached->parameter_errors.data());
+
+      for (size_t i = 0; i < cached->band_contents.size(); i++) {
+        errors.SetBinContent(i + 1, cached->band_contents[i]);
+        errors.SetBinError(i + 1, cached->band_errors[i]);
+      }
 
-    Summary global_summary;
+      return true;
+    }
+
+    PhaseTimings::get().count("fits");
+
+    FitResult result;
+    TFitResultPtr fit_result = object.Fit(&fct, "SMRNEQ");
+    result.valid = fit_result->IsValid();
 
+    if (result.valid) {
+      (TVirtualFitter::GetFitter())->GetConfidenceIntervals(&errors, 0.68);
+
+      for (int i = 0; i < fct.GetNpar(); i++) {
+        result.parameters.push_back(fct.GetParameter(i));
+        result.parameter_errors.push_back(fct.GetParError(i));
+      }
+
+      for (int i = 1; i <= errors.GetNbinsX(); i++) {
+        result.band_contents.push_back(errors.GetBinContent(i));
+        result.band_errors.push_back(errors.GetBinError(i));
+      }
+    }
+
+    cache.insert(key, result);
+
+    return result.valid;
+  }
+
+  void TH1Plotter::prepare(Plot& plot, Prepared& prepared, Summary& global_summary) {
     // Rescale and style histograms
     for (auto& file : m_plotIt.getFiles()) {
       setHistogramStyle(file);
@@ -320,7 +386,7 @@ namespace plotIt {
           syst.update();
 
           syst.scale(factor);
-          syst.rebin(plot.rebin);
+          syst.rebin(plot->rebin);
         }
 
       } else {
@@ -331,10 +397,10 @@ namespace plotIt {
         global_summary.add(file.type, summary);
       }
 
-      h->Rebin(plot.rebin);
+      h->Rebin(plot->rebin);
 
       // Add overflow to first and last bin if requested
-      if (plot.show_overflow) {
+      if (plot->show_overflow) {
         addOverflow(h, file.type, plot);
 
         if (file.type != DATA) {
@@ -347,30 +413,30 @@ namespace plotIt {
       }
     }
 
-    std::shared_ptr<TH1> h_data;
-    std::string data_drawing_options;
-
-    std::vector<File> signal_files;
-
-    for (auto& file: m_plotIt.getFiles()) {
-      if (file.type == SIGNAL) {
-        signal_files.push_back(file);
-      } else if (file.type == DATA) {
-        if (! h_data.get()) {
-          h_data.reset(dynamic_cast<TH1*>(file.object->Clone()));
-          h_data->SetDirectory(nullptr);
-          h_data->Sumw2(false); // Disable SumW2 for data
-          h_data->SetBinErrorOption((TH1::EBinErrorOpt) plot.errors_type);
-          data_drawing_options += m_plotIt.getPlotStyle(file)->drawing_options;
-        } else {
-          h_data->Add(dynamic_cast<TH1*>(file.object));
-        }
+    std::shared_ptr<TH1>& h_data = prepared.h_data;
+    std::string& data_drawing_options = prepared.data_drawing_options;
+
+    std::vector<File>& signal_files = prepared.signal_files;
+
+    for (auto& file: m_plotIt.getFiles(SIGNAL))
+      signal_files.push_back(file);
+
+    for (auto& file: m_plotIt.getFiles(DATA)) {
+      if (! h_data.get()) {
+        h_data.reset(dynamic_cast<TH1*>(file.object->Clone()));
+        h_data->SetDirectory(nullptr);
+        h_data->Sumw2(false); // Disable SumW2 for data
+        h_data->SetBinErrorOption((TH1::EBinErrorOpt) plot->errors_type);
+        data_drawing_options += m_plotIt.getPlotStyle(file)->drawing_options;
+      } else {
+        h_data->Add(dynamic_cast<TH1*>(file.object));
       }
     }
 
-    auto mc_stacks = buildStacks(plot.sort_by_yields);
+    Stacks& mc_stacks = prepared.mc_stacks;
+    mc_stacks = buildStacks(plot->sort_by_yields);
 
-    if (plot.no_data || ((h_data.get()) && !h_data->GetSumOfWeights()))
+    if (plot->no_data || ((h_data.get()) && !h_data->GetSumOfWeights()))
       h_data.reset();
 
     bool has_data = h_data.get() != nullptr;
@@ -378,13 +444,11 @@ namespace plotIt {
 
     bool no_systematics = false;
 
-    if (plot.normalized) {
+    if (plot->normalized) {
         // Normalize each plot
-        for (auto& file: m_plotIt.getFiles()) {
-            if (file.type == SIGNAL) {
-                TH1* h = dynamic_cast<TH1*>(file.object);
-                h->Scale(1. / fabs(h->GetSumOfWeights()));
-            }
+        for (auto& file: m_plotIt.getFiles(SIGNAL)) {
+            TH1* h = dynamic_cast<TH1*>(file.object);
+            h->Scale(1. / fabs(h->GetSumOfWeights()));
         }
 
         if (h_data.get()) {
@@ -409,9 +473,9 @@ namespace plotIt {
     // ROOT will show the marker, even with 'P'
     // The histogram is cloned, reset, and only the non-blinded bins are filled
     std::shared_ptr<TBox> m_blinded_area;
-    if (!CommandLineCfg::get().unblind && has_data && plot.blinded_range.valid()) {
-        float start = plot.blinded_range.start;
-        float end = plot.blinded_range.end;
+    if (!CommandLineCfg::get().unblind && has_data && plot->blinded_range.valid()) {
+        float start = plot->blinded_range.start;
+        float end = plot->blinded_range.end;
 
         size_t start_bin = h_data->FindBin(start);
         size_t end_bin = h_data->FindBin(end);
@@ -454,17 +518,15 @@ namespace plotIt {
         });
     }
 
-    if (!no_systematics && plot.show_errors) {
+    if (!no_systematics && plot->show_errors) {
         computeSystematics(mc_stacks, global_summary);
     }
 
-    if (plot.normalizedByBinWidth) {
+    if (plot->normalizedByBinWidth) {
         // Normalize each plot
-        for (auto& file: m_plotIt.getFiles()) {
-            if (file.type == SIGNAL) {
-                TH1* h = dynamic_cast<TH1*>(file.object);
-                h->Scale(1.,"width");
-            }
+        for (auto& file: m_plotIt.getFiles(SIGNAL)) {
+            TH1* h = dynamic_cast<TH1*>(file.object);
+            h->Scale(1.,"width");
         }
 
         if (h_data.get()) {
@@ -483,6 +545,108 @@ namespace plotIt {
         });
     }
 
+    prepared.has_data = has_data;
+    prepared.has_mc = has_mc;
+    prepared.no_systematics = no_systematics;
+  }
+
+  boost::optional<PreviewPlot> TH1Plotter::preview(Plot& plot) {
+    Summary summary;
+    Prepared prepared;
+    prepare(plot, prepared, summary);
+
+    // Binning is taken from any of the drawn histograms
+    TH1* reference = nullptr;
+    if (prepared.has_data)
+      reference = prepared.h_data.get();
+    else if (prepared.has_mc)
+      reference = prepared.mc_stacks.front().second.stat_only.get();
+    else if (! prepared.signal_files.empty())
+      reference = dynamic_cast<TH1*>(prepared.signal_files.front().object);
+
+    if (! reference) {
+      std::cerr << "Error: nothing to draw." << std::endl;
+      return boost::none;
+    }
+
+    size_t n_bins = reference->GetNbinsX();
+    auto getContents = [n_bins](TH1* h) {
+      std::vector<double> contents;
+      for (size_t i = 1; i <= n_bins; i++)
+        contents.push_back(h->GetBinContent(i));
+
+      return contents;
+    };
+
+    PreviewPlot preview;
+
+    for (size_t i = 1; i <= n_bins + 1; i++)
+      preview.edges.push_back(reference->GetBinLowEdge(i));
+
+    // Only the first stack is shown, like for the ratio
+    if (prepared.has_mc) {
+      const Stack& stack = prepared.mc_stacks.front().second;
+
+      TIter next(stack.stack->GetHists());
+      while (TH1* h = static_cast<TH1*>(next())) {
+        PreviewSeries series;
+        series.values = getContents(h);
+        series.color = getRGB(h->GetFillStyle() != 0 ? h->GetFillColor() : h->GetLineColor());
+
+        preview.stack.push_back(series);
+      }
+
+      if (plot->show_errors) {
+        for (size_t i = 1; i <= n_bins; i++) {
+          preview.band_low.push_back(stack.stat_and_syst->GetBinContent(i) - stack.stat_and_syst->GetBinErrorLow(i));
+          preview.band_high.push_back(stack.stat_and_syst->GetBinContent(i) + stack.stat_and_syst->GetBinErrorUp(i));
+        }
+      }
+    }
+
+    if (prepared.has_data) {
+      preview.data = getContents(prepared.h_data.get());
+      BinErrors errors = PoissonIntervals::get().errors(*prepared.h_data);
+      preview.data_error_low.assign(errors.low.begin() + 1, errors.low.begin() + 1 + n_bins);
+      preview.data_error_high.assign(errors.up.begin() + 1, errors.up.begin() + 1 + n_bins);
+    }
+
+    for (File& signal: prepared.signal_files) {
+      TH1* h = dynamic_cast<TH1*>(signal.object);
+
+      PreviewSeries series;
+      series.values = getContents(h);
+      series.color = getRGB(h->GetLineColor());
+
+      preview.signals.push_back(series);
+    }
+
+    if (!prepared.has_data || !prepared.has_mc || prepared.mc_stacks.size() != 1)
+      plot.show_ratio = false;
+
+    preview.log_y = plot.log_y;
+    preview.show_ratio = plot.show_ratio;
+    preview.ratio_range = plot->ratio_y_axis_range;
+
+    return preview;
+  }
+
+  boost::optional<Summary> TH1Plotter::plot(CanvasLayout& layout, Plot& plot) {
+    layout.canvas().cd();
+
+    Summary global_summary;
+
+    Prepared prepared;
+    prepare(plot, prepared, global_summary);
+
+    std::shared_ptr<TH1>& h_data = prepared.h_data;
+    std::string& data_drawing_options = prepared.data_drawing_options;
+    std::vector<File>& signal_files = prepared.signal_files;
+    Stacks& mc_stacks = prepared.mc_stacks;
+    bool has_data = prepared.has_data;
+    bool has_mc = prepared.has_mc;
+    bool no_systematics = prepared.no_systematics;
+
     // Store all the histograms to draw, and find the one with the highest maximum
     std::vector<std::pair<TObject*, std::string>> toDraw = { std::make_pair(h_data.get(), data_drawing_options) };
     for (File& signal: signal_files) {
@@ -526,34 +690,10 @@ namespace plotIt {
         plot.show_ratio = false;
     }
 
-    std::shared_ptr<TPad> hi_pad;
-    std::shared_ptr<TPad> low_pad;
-    if (plot.show_ratio) {
-      hi_pad = std::make_shared<TPad>("pad_hi", "", 0., 0.33333, 1, 1);
-      hi_pad->Draw();
-      const auto& config = m_plotIt.getConfiguration();
-      hi_pad->SetTopMargin(config.margin_top / .6666);
-      hi_pad->SetLeftMargin(config.margin_left);
-      hi_pad->SetBottomMargin(0.015);
-      hi_pad->SetRightMargin(config.margin_right);
-
-      low_pad = std::make_shared<TPad>("pad_lo", "", 0., 0., 1, 0.33333);
-      low_pad->Draw();
-      low_pad->SetLeftMargin(config.margin_left);
-      low_pad->SetTopMargin(1.);
-      low_pad->SetBottomMargin(config.margin_bottom / .3333);
-      low_pad->SetRightMargin(config.margin_right);
-      low_pad->SetTickx(1);
-
-      hi_pad->cd();
-      if (plot.log_y)
-        hi_pad->SetLogy();
-
-      if (plot.log_x) {
-        hi_pad->SetLogx();
-        low_pad->SetLogx();
-      }
-    }
+    TPad* hi_pad = nullptr;
+    TPad* low_pad = nullptr;
+    if (plot.show_ratio)
+      std::tie(hi_pad, low_pad) = layout.ratioPads(plot);
 
     // Take into account systematics for maximum
     if (has_mc && !no_systematics) {
@@ -572,13 +712,13 @@ namespace plotIt {
         maximum = std::max(maximum, maximum_with_errors);
     }
 
-    auto x_axis_range = plot.log_x ? plot.log_x_axis_range : plot.x_axis_range;
-    auto y_axis_range = plot.log_y ? plot.log_y_axis_range : plot.y_axis_range;
+    auto x_axis_range = plot.log_x ? plot->log_x_axis_range : plot->x_axis_range;
+    auto y_axis_range = plot.log_y ? plot->log_y_axis_range : plot->y_axis_range;
 
     toDraw[0].first->Draw(toDraw[0].second.c_str());
     setRange(toDraw[0].first, x_axis_range, y_axis_range);
 
-    hideTicks(toDraw[0].first, plot.x_axis_hide_ticks, plot.y_axis_hide_ticks);
+    hideTicks(toDraw[0].first, plot->x_axis_hide_ticks, plot->y_axis_hide_ticks);
 
     float safe_margin = .20;
     if (plot.log_y)
@@ -597,7 +737,7 @@ namespace plotIt {
       if (!plot.log_y)
         minimum = minimum * (1 - std::copysign(safe_margin, minimum));
 
-      if (plot.y_axis_show_zero && !plot.log_y)
+      if (plot->y_axis_show_zero && !plot.log_y)
         minimum = 0;
 
       setMinimum(toDraw[0].first, minimum);
@@ -622,7 +762,7 @@ namespace plotIt {
             }
 
             // Then, if requested, errors
-            if (plot.show_errors) {
+            if (plot->show_errors) {
                 value.second.stat_and_syst->SetMarkerSize(0);
                 value.second.stat_and_syst->SetMarkerStyle(0);
                 value.second.stat_and_syst->SetFillStyle(m_plotIt.getConfiguration().error_fill_style);
@@ -651,17 +791,17 @@ namespace plotIt {
     for (auto& obj: toDraw) {
       setDefaultStyle(obj.first, plot, (plot.show_ratio) ? 0.6666 : 1.);
       setAxisTitles(obj.first, plot);
-      hideTicks(obj.first, plot.x_axis_hide_ticks, plot.y_axis_hide_ticks);
+      hideTicks(obj.first, plot->x_axis_hide_ticks, plot->y_axis_hide_ticks);
     }
 
     gPad->Modified();
     gPad->Update();
 
     // We have the plot range. Compute the shaded area corresponding to the blinded area, if any
-    if (!CommandLineCfg::get().unblind && h_data.get() && plot.blinded_range.valid()) {
-        int bin_x_start = h_data->FindBin(plot.blinded_range.start);
+    if (!CommandLineCfg::get().unblind && h_data.get() && plot->blinded_range.valid()) {
+        int bin_x_start = h_data->FindBin(plot->blinded_range.start);
         float x_start = h_data->GetXaxis()->GetBinLowEdge(bin_x_start);
-        int bin_x_end = h_data->FindBin(plot.blinded_range.end);
+        int bin_x_end = h_data->FindBin(plot->blinded_range.end);
         float x_end = h_data->GetXaxis()->GetBinUpEdge(bin_x_end);
 
         float y_start = gPad->GetUymin();
@@ -699,7 +839,7 @@ namespace plotIt {
         blinded_area->Draw("same");
     }
 
-    auto drawLine = [&](Line& line, TVirtualPad* pad) {
+    auto drawLine = [&](Line line, TVirtualPad* pad) {
         Range x_range = getXRange(toDraw[0].first);
 
         float y_range_start = pad->GetUymin();
@@ -727,12 +867,12 @@ namespace plotIt {
         l->Draw("same");
     };
 
-    for (Line& line: plot.lines) {
+    for (const Line& line: plot->lines) {
       // Only keep TOP lines
       if (line.pad != TOP)
         continue;
 
-      drawLine(line, hi_pad ? hi_pad.get() : gPad);
+      drawLine(line, hi_pad ? hi_pad : gPad);
     }
 
     // Redraw only axis
@@ -747,15 +887,15 @@ namespace plotIt {
       std::shared_ptr<TH1> h_low_pad_axis(static_cast<TH1*>(h_data->Clone()));
       h_low_pad_axis->SetDirectory(nullptr);
       h_low_pad_axis->Reset(); // Keep binning
-      setRange(h_low_pad_axis.get(), x_axis_range, plot.ratio_y_axis_range);
+      setRange(h_low_pad_axis.get(), x_axis_range, plot->ratio_y_axis_range);
 
       setDefaultStyle(h_low_pad_axis.get(), plot, 0.6666);
-      h_low_pad_axis->GetYaxis()->SetTitle(plot.ratio_y_axis_title.c_str());
+      h_low_pad_axis->GetYaxis()->SetTitle(plot->ratio_y_axis_title.c_str());
       h_low_pad_axis->GetYaxis()->SetTickLength(0.04);
       h_low_pad_axis->GetYaxis()->SetNdivisions(505, true);
       h_low_pad_axis->GetXaxis()->SetTickLength(0.07);
 
-      hideTicks(h_low_pad_axis.get(), plot.x_axis_hide_ticks, plot.y_axis_hide_ticks);
+      hideTicks(h_low_pad_axis.get(), plot->x_axis_hide_ticks, plot->y_axis_hide_ticks);
 
       h_low_pad_axis->Draw();
 
@@ -799,24 +939,23 @@ namespace plotIt {
 
       h_low_pad_axis->Draw("same");
 
-      if (plot.fit_ratio) {
+      if (plot->fit_ratio) {
         float xMin, xMax;
-        if (plot.ratio_fit_range.valid()) {
-          xMin = plot.ratio_fit_range.start;
-          xMax = plot.ratio_fit_range.end;
+        if (plot->ratio_fit_range.valid()) {
+          xMin = plot->ratio_fit_range.start;
+          xMax = plot->ratio_fit_range.end;
         } else {
           xMin = h_low_pad_axis->GetXaxis()->GetBinLowEdge(1);
           xMax = h_low_pad_axis->GetXaxis()->GetBinUpEdge(h_low_pad_axis->GetXaxis()->GetLast());
         }
 
-        std::shared_ptr<TF1> fct = std::make_shared<TF1>("fit_function", plot.ratio_fit_function.c_str(), xMin, xMax);
+        std::shared_ptr<TF1> fct = std::make_shared<TF1>("fit_function", plot->ratio_fit_function.c_str(), xMin, xMax);
         fct->SetNpx(m_plotIt.getConfiguration().ratio_fit_n_points);
 
-        TFitResultPtr fit_result = ratio->Fit(fct.get(), "SMRNEQ");
-        if (fit_result->IsValid()) {
-          std::shared_ptr<TH1> errors = std::make_shared<TH1D>("errors", "errors", m_plotIt.getConfiguration().ratio_fit_n_points, xMin, xMax);
-          errors->SetDirectory(nullptr);
-          (TVirtualFitter::GetFitter())->GetConfidenceIntervals(errors.get(), 0.68);
+        std::shared_ptr<TH1> errors = std::make_shared<TH1D>("errors", "errors", m_plotIt.getConfiguration().ratio_fit_n_points, xMin, xMax);
+        errors->SetDirectory(nullptr);
+
+        if (fit(*ratio, *fct, plot->ratio_fit_function, xMin, xMax, m_plotIt.getConfiguration().ratio_fit_n_points, *errors)) {
           errors->SetStats(false);
           errors->SetMarkerSize(0);
           errors->SetFillColor(m_plotIt.getConfiguration().ratio_fit_error_fill_color);
@@ -828,9 +967,9 @@ namespace plotIt {
           fct->SetLineStyle(m_plotIt.getConfiguration().ratio_fit_line_style);
           fct->Draw("same");
 
-          if (plot.ratio_fit_legend.length() > 0) {
+          if (plot->ratio_fit_legend.length() > 0) {
             uint32_t fit_parameters = fct->GetNpar();
-            boost::format formatter = get_formatter(plot.ratio_fit_legend);
+            boost::format formatter = get_formatter(plot->ratio_fit_legend);
 
             for (uint32_t i = 0; i < fit_parameters; i++) {
               formatter % fct->GetParameter(i);
@@ -838,7 +977,7 @@ namespace plotIt {
 
             std::string legend = formatter.str();
 
-            std::shared_ptr<TLatex> t(new TLatex(plot.ratio_fit_legend_position.x, plot.ratio_fit_legend_position.y, legend.c_str()));
+            std::shared_ptr<TLatex> t(new TLatex(plot->ratio_fit_legend_position.x, plot->ratio_fit_legend_position.y, legend.c_str()));
             t->SetNDC(true);
             t->SetTextFont(43);
             t->SetTextSize(LABEL_FONTSIZE - 4);
@@ -861,43 +1000,40 @@ namespace plotIt {
       low_pad->Modified();
       low_pad->Update();
 
-      for (Line& line: plot.lines) {
+      for (const Line& line: plot->lines) {
         // Only keep BOTTOM lines
         if (line.pad != BOTTOM)
           continue;
 
-        drawLine(line, low_pad.get());
+        drawLine(line, low_pad);
       }
 
       TemporaryPool::get().add(h_low_pad_axis);
       TemporaryPool::get().add(ratio);
       TemporaryPool::get().add(h_systematics);
-      TemporaryPool::get().add(hi_pad);
-      TemporaryPool::get().add(low_pad);
     }
 
-    if (has_mc && mc_stacks.size() == 1 && plot.fit) {
+    if (has_mc && mc_stacks.size() == 1 && plot->fit) {
 
       auto& mc_stack = mc_stacks.begin()->second;
 
       float xMin, xMax;
-      if (plot.fit_range.valid()) {
-        xMin = plot.fit_range.start;
-        xMax = plot.fit_range.end;
+      if (plot->fit_range.valid()) {
+        xMin = plot->fit_range.start;
+        xMax = plot->fit_range.end;
       } else {
         xMin = mc_stack.stat_only->GetXaxis()->GetBinLowEdge(1);
         xMax = mc_stack.stat_only->GetXaxis()->GetBinUpEdge(mc_stack.stat_only->GetXaxis()->GetLast());
       }
 
-      std::shared_ptr<TF1> fct = std::make_shared<TF1>("fit_function", plot.fit_function.c_str(), xMin, xMax);
+      std::shared_ptr<TF1> fct = std::make_shared<TF1>("fit_function", plot->fit_function.c_str(), xMin, xMax);
       fct->SetNpx(m_plotIt.getConfiguration().fit_n_points);
 
       TH1* mc_hist = mc_stack.stat_only.get();
-      TFitResultPtr fit_result = mc_hist->Fit(fct.get(), "SMRNEQ");
-      if (fit_result->IsValid()) {
-        std::shared_ptr<TH1> errors = std::make_shared<TH1D>("errors", "errors", m_plotIt.getConfiguration().fit_n_points, xMin, xMax);
-        errors->SetDirectory(nullptr);
-        (TVirtualFitter::GetFitter())->GetConfidenceIntervals(errors.get(), 0.68);
+      std::shared_ptr<TH1> errors = std::make_shared<TH1D>("errors", "errors", m_plotIt.getConfiguration().fit_n_points, xMin, xMax);
+      errors->SetDirectory(nullptr);
+
+      if (fit(*mc_hist, *fct, plot->fit_function, xMin, xMax, m_plotIt.getConfiguration().fit_n_points, *errors)) {
         errors->SetStats(false);
         errors->SetMarkerSize(0);
         errors->SetFillColor(m_plotIt.getConfiguration().fit_error_fill_color);
@@ -909,9 +1045,9 @@ namespace plotIt {
         fct->SetLineStyle(m_plotIt.getConfiguration().fit_line_style);
         fct->Draw("same");
 
-        if (plot.fit_legend.length() > 0) {
+        if (plot->fit_legend.length() > 0) {
           uint32_t fit_parameters = fct->GetNpar();
-          boost::format formatter = get_formatter(plot.fit_legend);
+          boost::format formatter = get_formatter(plot->fit_legend);
 
           for (uint32_t i = 0; i < fit_parameters; i++) {
             formatter % fct->GetParameter(i);
@@ -919,7 +1055,7 @@ namespace plotIt {
 
           std::string legend = formatter.str();
 
-          std::shared_ptr<TLatex> t(new TLatex(plot.fit_legend_position.x, plot.fit_legend_position.y, legend.c_str()));
+          std::shared_ptr<TLatex> t(new TLatex(plot->fit_legend_position.x, plot->fit_legend_position.y, legend.c_str()));
           t->SetNDC(true);
           t->SetTextFont(43);
           t->SetTextSize(LABEL_FONTSIZE - 4);
@@ -937,7 +1073,7 @@ namespace plotIt {
     gPad->Update();
     gPad->RedrawAxis();
 
-    if (hi_pad.get())
+    if (hi_pad)
       hi_pad->cd();
 
     return global_summary;
@@ -984,7 +1120,7 @@ namespace plotIt {
     size_t first_bin = 1;
     size_t last_bin = h->GetNbinsX();
 
-    auto x_axis_range = plot.log_x ? plot.log_x_axis_range : plot.x_axis_range;
+    auto x_axis_range = plot.log_x ? plot->log_x_axis_range : plot->x_axis_range;
 
     if (x_axis_range.valid()) {
       std::shared_ptr<TH1> copy(dynamic_cast<TH1*>(h->Clone()));
@@ -0,0 +1,143 @@
+#include <arena.h>
+
+#include <TArray.h>
+#include <TArrayD.h>
+#include <TH1.h>
+
+#include <sys/mman.h>
+
+#include <algorithm>
+
+namespace plotIt {
+
+    namespace {
+        // Size of the statistics array of TH1::GetStats (TH1::kNstat)
+        constexpr size_t n_stats = 13;
+
+        bool canAdopt(const TH1* h) {
+            return dynamic_cast<const TArray*>(h) &&
+                !h->InheritsFrom("TProfile") &&
+                !h->InheritsFrom("TProfile2D") &&
+                !h->InheritsFrom("TProfile3D") &&
+                !h->InheritsFrom("TH2Poly");
+        }
+    }
+
+    HistogramArena::~HistogramArena() {
+        restore();
+    }
+
+    bool HistogramArena::adopt(const std::vector<TH1*>& histograms) {
+        restore();
+
+        // First pass: layout of the arena
+        size_t size = 0;
+        for (TH1* h: histograms) {
+            if (!h || m_entries.count(h) || !canAdopt(h))
+                continue;
+
+            Entry entry;
+            entry.contents = size;
+            entry.n_cells = h->GetNcells();
+            size += entry.n_cells;
+
+            entry.sumw2 = size;
+            entry.n_sumw2 = h->GetSumw2N();
+            size += entry.n_sumw2;
+
+            entry.stats = size;
+            size += n_stats;
+
+            entry.entries = h->GetEntries();
+            entry.materialized = true;
+
+            m_entries.emplace(h, entry);
+        }
+
+        if (m_entries.empty())
+            return true;
+
+        m_size = size * sizeof(double);
+        void* data = mmap(nullptr, m_size, PROT_READ | PROT_WRITE, MAP_SHARED | MAP_ANONYMOUS, -1, 0);
+        if (data == MAP_FAILED) {
+            m_entries.clear();
+            m_size = 0;
+            return false;
+        }
+
+        m_data = static_cast<double*>(data);
+
+        // Second pass: copy the storage, and release it from the histograms
+        for (auto& it: m_entries) {
+            TH1* h = it.first;
+            Entry& entry = it.second;
+
+            for (size_t i = 0; i < entry.n_cells; i++)
+                m_data[entry.contents + i] = h->GetBinContent(i);
+
+            if (entry.n_sumw2)
+                std::copy_n(h->GetSumw2()->GetArray(), entry.n_sumw2, m_data + entry.sumw2);
+
+            std::fill_n(m_data + entry.stats, n_stats, 0.);
+            h->GetStats(m_data + entry.stats);
+
+            hollow(h);
+            entry.materialized = false;
+        }
+
+        // Nobody is supposed to write into the arena once filled
+        mprotect(m_data, m_size, PROT_READ);
+
+        return true;
+    }
+
+    void HistogramArena::materialize(TH1* h) {
+        auto it = m_entries.find(h);
+        if (it == m_entries.end() || it->second.materialized)
+            return;
+
+        const Entry& entry = it->second;
+
+        dynamic_cast<TArray*>(h)->Set(entry.n_cells);
+        // SetContent resets the statistics, they are put back afterwards
+        h->SetContent(m_data + entry.contents);
+
+        if (entry.n_sumw2)
+            h->GetSumw2()->Set(entry.n_sumw2, m_data + entry.sumw2);
+
+        double stats[n_stats];
+        std::copy_n(m_data + entry.stats, n_stats, stats);
+        h->PutStats(stats);
+        h->SetEntries(entry.entries);
+
+        it->second.materialized = true;
+    }
+
+    void HistogramArena::release(TH1* h) {
+        auto it = m_entries.find(h);
+        if (it == m_entries.end() || !it->second.materialized)
+            return;
+
+        hollow(h);
+        it->second.materialized = false;
+    }
+
+    void HistogramArena::restore() {
+        for (auto& it: m_entries)
+            materialize(it.first);
+
+        m_entries.clear();
+
+        if (m_data)
+            munmap(m_data, m_size);
+
+        m_data = nullptr;
+        m_size = 0;
+    }
+
+    void HistogramArena::hollow(TH1* h) {
+        dynamic_cast<TArray*>(h)->Set(0);
+        if (h->GetSumw2N())
+            h->GetSumw2()->Set(0);
+    }
+}
@@ -0,0 +1,252 @@
+#include <bundle.h>
+
+#include <TCanvas.h>
+
+#include <algorithm>
+#include <cstring>
+#include <ctime>
+#include <iostream>
+#include <sstream>
+
+namespace plotIt {
+
+    namespace {
+        const size_t BLOCK_SIZE = 512;
+        const size_t BUFFER_SIZE = 4 * 1024 * 1024;
+
+        const std::string MANIFEST_NAME = "plotIt-manifest.tsv";
+
+        /**
+         * Write `value` in octal in a tar header field of `size` bytes, NUL terminated
+         **/
+        void writeOctal(char* field, size_t size, uint64_t value) {
+            std::ostringstream out;
+            out.width(size - 1);
+            out.fill('0');
+            out << std::oct << value;
+
+            std::string text = out.str();
+            std::memcpy(field, text.data(), std::min(text.size(), size - 1));
+            field[size - 1] = '\0';
+        }
+    }
+
+    OutputBundle::OutputBundle(const fs::path& output, bool multipage_pdf, const fs::path& archive):
+        m_output(output), m_multipage_pdf(multipage_pdf) {
+
+            if (archive.empty())
+                return;
+
+            m_archive_path = fs::absolute(archive, m_output);
+            fs::create_directories(m_archive_path.parent_path());
+
+            // Few large writes instead of many small ones
+            m_buffer.resize(BUFFER_SIZE);
+            m_archive.rdbuf()->pubsetbuf(m_buffer.data(), m_buffer.size());
+            m_archive.open(m_archive_path.native(), std::ios::binary | std::ios::trunc);
+            if (! m_archive) {
+                std::cerr << "Error: cannot create archive " << m_archive_path << std::endl;
+                m_failed = true;
+            }
+
+            // Plots are written on the local disk first, by ROOT, and then appended to the archive
+            m_scratch = fs::temp_directory_path() / fs::unique_path("plotIt-%%%%-%%%%-%%%%");
+            fs::create_directories(m_scratch);
+        }
+
+    OutputBundle::~OutputBundle() {
+        finish();
+    }
+
+    bool OutputBundle::save(TCanvas& canvas, const fs::path& path) {
+        bool archived = m_archive.is_open();
+
+        if (m_multipage_pdf && path.extension() == ".pdf") {
+            fs::path folder = path.parent_path();
+            if (! m_pdf_open || m_pdf.parent_path() != folder) {
+                closePDF();
+
+                size_t part = ++m_pdf_parts[folder];
+                m_pdf = folder / ((part == 1) ? "plots.pdf" : "plots-" + std::to_string(part) + ".pdf");
+
+                if (archived) {
+                    m_pdf_file = m_scratch / ("multipage-" + std::to_string(m_members.size()) + ".pdf");
+                } else {
+                    m_pdf_file = m_output / m_pdf;
+                    fs::create_directories(m_pdf_file.parent_path());
+                }
+
+                canvas.Print((m_pdf_file.native() + "[").c_str());
+                m_pdf_open = true;
+            }
+
+            // The page is named after the plot in the outline of the document
+            std::string title = "Title:" + path.stem().string();
+            canvas.Print(m_pdf_file.c_str(), title.c_str());
+            m_pdf_canvas = &canvas;
+
+            return true;
+        }
+
+        if (! archived) {
+            fs::path file = m_output / path;
+            fs::create_directories(file.parent_path());
+            canvas.SaveAs(file.c_str());
+
+            return true;
+        }
+
+        fs::path file = m_scratch / ("plot" + path.extension().string());
+        canvas.SaveAs(file.c_str());
+
+        bool success = addToArchive(file, path.generic_string());
+        fs::remove(file);
+
+        return success;
+    }
+
+    bool OutputBundle::closePDF() {
+        if (! m_pdf_open)
+            return true;
+
+        m_pdf_canvas->Print((m_pdf_file.native() + "]").c_str());
+        m_pdf_open = false;
+
+        if (! m_archive.is_open())
+            return true;
+
+        bool success = addToArchive(m_pdf_file, m_pdf.generic_string());
+        fs::remove(m_pdf_file);
+
+        return success;
+    }
+
+    bool OutputBundle::finish() {
+        if (m_finished)
+            return ! m_failed;
+
+        m_finished = true;
+
+        if (! closePDF())
+            m_failed = true;
+
+        if (m_archive.is_open()) {
+            // Members of the archive, with the offset of their content to read them without tar
+            std::ostringstream manifest;
+            manifest << "# offset\tsize\tname" << std::endl;
+            for (const auto& member: m_members)
+                manifest << member.offset << "\t" << member.size << "\t" << member.name << std::endl;
+
+            addToArchive(manifest.str(), MANIFEST_NAME);
+
+            // End of archive: two empty blocks
+            pad(2 * BLOCK_SIZE);
+
+            m_archive.close();
+            if (! m_archive) {
+                std::cerr << "Error: cannot write archive " << m_archive_path << std::endl;
+                m_failed = true;
+            } else {
+                std::cout << m_members.size() << " files written in " << m_archive_path << std::endl;
+            }
+        }
+
+        if (! m_scratch.empty()) {
+            boost::system::error_code error;
+            fs::remove_all(m_scratch, error);
+        }
+
+        return ! m_failed;
+    }
+
+    bool OutputBundle::addToArchive(const fs::path& file, const std::string& name) {
+        std::ifstream input(file.native(), std::ios::binary);
+        if (! input) {
+            std::cerr << "Error: cannot read " << file << " to add it to the archive" << std::endl;
+            m_failed = true;
+            return false;
+        }
+
+        std::ostringstream content;
+        content << input.rdbuf();
+
+        return addToArchive(content.str(), name);
+    }
+
+    bool OutputBundle::addToArchive(const std::string& content, const std::string& name) {
+        writeHeader(name, content.size(), '0');
+
+        Member member = {name, m_archive_size, content.size()};
+        if (name != MANIFEST_NAME)
+            m_members.push_back(member);
+
+        m_archive.write(content.data(), content.size());
+        m_archive_size += content.size();
+        pad((BLOCK_SIZE - content.size() % BLOCK_SIZE) % BLOCK_SIZE);
+
+        if (! m_archive) {
+            std::cerr << "Error: cannot write " << name << " in archive " << m_archive_path << std::endl;
+            m_failed = true;
+            return false;
+        }
+
+        return true;
+    }
+
+    void OutputBundle::writeHeader(const std::string& name, uint64_t size, char type) {
+        // ustar header: names of up to 100 characters, or 255 split on a '/'
+        // between a prefix and the name. Longer names use a GNU long name record.
+        std::string prefix;
+        std::string short_name = name;
+        if (name.size() > 100) {
+            size_t split = name.rfind('/', 155);
+            if (split != std::string::npos && split > 0 && name.size() - split - 1 <= 100) {
+                prefix = name.substr(0, split);
+                short_name = name.substr(split + 1);
+            } else {
+                std::string long_name = name + '\0';
+                writeHeader("././@LongLink", long_name.size(), 'L');
+                m_archive.write(long_name.data(), long_name.size());
+                m_archive_size += long_name.size();
+                pad((BLOCK_SIZE - long_name.size() % BLOCK_SIZE) % BLOCK_SIZE);
+
+                short_name = name.substr(0, 100);
+            }
+        }
+
+        char header[BLOCK_SIZE];
+        std::memset(header, 0, sizeof(header));
+
+        std::memcpy(header, short_name.data(), std::min<size_t>(short_name.size(), 100));
+        writeOctal(header + 100, 8, 0644);
+        writeOctal(header + 108, 8, 0);
+        writeOctal(header + 116, 8, 0);
+        writeOctal(header + 124, 12, size);
+        writeOctal(header + 136, 12, std::time(nullptr));
+        header[156] = type;
+        std::memcpy(header + 257, "ustar", 6);
+        std::memcpy(header + 263, "00", 2);
+        std::memcpy(header + 345, prefix.data(), std::min<size_t>(prefix.size(), 155));
+
+        // Checksum of the header, computed with the checksum field filled with spaces
+        std::memset(header + 148, ' ', 8);
+        uint64_t checksum = 0;
+        for (size_t i = 0; i < sizeof(header); i++)
+            checksum += static_cast<unsigned char>(header[i]);
+        writeOctal(header + 148, 7, checksum);
+        header[155] = ' ';
+
+        m_archive.write(header, sizeof(header));
+        m_archive_size += sizeof(header);
+    }
+
+    void OutputBundle::pad(uint64_t size) {
+        static const char zeros[BLOCK_SIZE] = {0};
+        while (size > 0) {
+            uint64_t n = std::min<uint64_t>(size, BLOCK_SIZE);
+            m_archive.write(zeros, n);
+            m_archive_size += n;
+            size -= n;
+        }
+    }
+}
@@ -0,0 +1,119 @@
+#include <cache.h>
+#include <staging.h>
+
+#include <TFile.h>
+#include <TMemFile.h>
+#include <TObject.h>
+
+#include <algorithm>
+#include <stdexcept>
+
+namespace plotIt {
+    thread_local bool InputCache::s_thread_handles = false;
+
+    std::shared_ptr<TFile> InputCache::open(const std::string& path) {
+        if (! m_enabled)
+            return std::shared_ptr<TFile>(TFile::Open(StagingArea::get().localPath(path).c_str()));
+
+        if (! s_thread_handles || isMemoryPath(path)) {
+            std::lock_guard<std::mutex> lock(m_mutex);
+            auto it = m_files.find(path);
+            if (it != m_files.end())
+                return it->second;
+        }
+
+        std::shared_ptr<TFile> file(TFile::Open(StagingArea::get().localPath(path).c_str()));
+        if (file && ! s_thread_handles) {
+            std::lock_guard<std::mutex> lock(m_mutex);
+            // Another thread may have opened it in the meantime
+            auto it = m_files.emplace(path, file).first;
+            return it->second;
+        }
+
+        return file;
+    }
+
+    TObject* InputCache::getObject(TFile& file, const std::string& name) {
+        if (! m_enabled)
+            return file.Get(name.c_str());
+
+        auto key = std::make_pair(std::string(file.GetName()), name);
+        {
+            std::lock_guard<std::mutex> lock(m_mutex);
+            auto it = m_objects.find(key);
+            if (it != m_objects.end())
+                return it->second.get();
+        }
+
+        // Missing objects are cached too, as a null pointer
+        std::shared_ptr<TObject> object(file.Get(name.c_str()));
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+        // If another thread read the same object in the meantime, its copy is kept
+        return m_objects.emplace(key, object).first->second.get();
+    }
+
+    const std::vector<std::string>* InputCache::getContent(const std::string& path) const {
+        if (! m_enabled)
+            return nullptr;
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+        auto it = m_contents.find(path);
+        if (it == m_contents.end())
+            return nullptr;
+
+        return &it->second;
+    }
+
+    void InputCache::setContent(const std::string& path, const std::vector<std::string>& content) {
+        if (! m_enabled)
+            return;
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+        m_contents[path] = content;
+    }
+
+    void InputCache::addObject(const std::string& path, const std::string& name, const std::shared_ptr<TObject>& object) {
+        if (! m_enabled)
+            throw std::logic_error("In-memory objects require the input cache to be enabled");
+
+        if (! isMemoryPath(path))
+            throw std::invalid_argument("Invalid in-memory file path '" + path + "', it must start with memory://");
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+
+        // An empty file stands for the in-memory file, so that it can be used like any other
+        std::shared_ptr<TFile>& file = m_files[path];
+        if (! file)
+            file.reset(new TMemFile(path.c_str(), "recreate"));
+
+        m_objects[std::make_pair(path, name)] = object;
+
+        // Systematic variations are not listed, like for files on disk
+        if (name.find("__") == std::string::npos) {
+            std::vector<std::string>& content = m_contents[path];
+            if (std::find(content.begin(), content.end(), name) == content.end())
+                content.push_back(name);
+        }
+    }
+
+    void InputCache::invalidate(const std::string& path) {
+        std::lock_guard<std::mutex> lock(m_mutex);
+        m_files.erase(path);
+        m_contents.erase(path);
+
+        // Objects are cached under the name of the file they were read from, which may be a staged copy
+        for (const std::string& name: {path, StagingArea::get().stagedPath(path)}) {
+            auto it = m_objects.lower_bound(std::make_pair(name, std::string()));
+            while (it != m_objects.end() && it->first.first == name)
+                it = m_objects.erase(it);
+        }
+    }
+
+    void InputCache::clear() {
+        std::lock_guard<std::mutex> lock(m_mutex);
+        m_objects.clear();
+        m_contents.clear();
+        m_files.clear();
+    }
+}
@@ -0,0 +1,648 @@
+#include <configcache.h>
+
+#include <plotIt.h>
+#include <utilities.h>
+
+#include <yaml-cpp/yaml.h>
+
+#include <boost/algorithm/string/predicate.hpp>
+
+#include <sys/stat.h>
+
+#include <algorithm>
+#include <cstring>
+#include <fstream>
+#include <iostream>
+#include <iterator>
+#include <sstream>
+#include <stdexcept>
+#include <type_traits>
+
+namespace plotIt {
+
+    namespace {
+        // Increase when the layout of the serialized structures changes
+        const uint32_t CACHE_VERSION = 2;
+        const char CACHE_MAGIC[8] = {'p', 'l', 'o', 't', 'I', 't', 'C', 'C'};
+
+        class Writer {
+            public:
+                static const bool reading = false;
+
+                template <typename T>
+                void raw(const T& value) {
+                    m_data.append(reinterpret_cast<const char*>(&value), sizeof(T));
+                }
+
+                void bytes(std::string& value, size_t) {
+                    m_data.append(value);
+                }
+
+                const std::string& data() const {
+                    return m_data;
+                }
+
+            private:
+                std::string m_data;
+        };
+
+        class Reader {
+            public:
+                static const bool reading = true;
+
+                Reader(const std::string& data):
+                    m_data(data) {
+                        // Empty
+                    }
+
+                template <typename T>
+                void raw(T& value) {
+                    check(sizeof(T));
+                    std::memcpy(&value, m_data.data() + m_position, sizeof(T));
+                    m_position += sizeof(T);
+                }
+
+                void bytes(std::string& value, size_t size) {
+                    check(size);
+                    value.assign(m_data, m_position, size);
+                    m_position += size;
+                }
+
+                bool done() const {
+                    return m_position == m_data.size();
+                }
+
+            private:
+                void check(size_t size) {
+                    if (m_position + size > m_data.size())
+                        throw std::runtime_error("truncated configuration cache");
+                }
+
+                const std::string& m_data;
+                size_t m_position = 0;
+        };
+
+        // Everything is declared first, so that containers of any of these types can be serialized
+        template <class A, class T>
+        typename std::enable_if<std::is_arithmetic<T>::value || std::is_enum<T>::value>::type io(A& a, T& value);
+        template <class A> void io(A& a, std::string& value);
+        template <class A, class T> void io(A& a, std::vector<T>& values);
+        template <class A, class K, class V> void io(A& a, std::map<K, V>& values);
+        template <class A, class T> void io(A& a, boost::optional<T>& value);
+        template <class A, class T> void io(A& a, std::shared_ptr<T>& value);
+        template <class A> void io(A& a, Point& point);
+        template <class A> void io(A& a, Range& range);
+        template <class A> void io(A& a, Position& position);
+        template <class A> void io(A& a, Label& label);
+        template <class A> void io(A& a, LineStyle& style);
+        template <class A> void io(A& a, PlotStyle& style);
+        template <class A> void io(A& a, Line& line);
+        template <class A> void io(A& a, RenameOp& op);
+        template <class A> void io(A& a, CustomColor& color);
+        template <class A> void io(A& a, LegendEntry& entry);
+        template <class A> void io(A& a, Legend& legend);
+        template <class A> void io(A& a, Group& group);
+        template <class A> void io(A& a, File& file);
+        template <class A> void io(A& a, PlotTemplate& settings);
+        template <class A> void io(A& a, Plot& plot);
+        template <class A> void io(A& a, Configuration& config);
+
+        template <class A, class T>
+        typename std::enable_if<std::is_arithmetic<T>::value || std::is_enum<T>::value>::type io(A& a, T& value) {
+            a.raw(value);
+        }
+
+        template <class A> void io(A& a, std::string& value) {
+            uint64_t size = value.size();
+            a.raw(size);
+            a.bytes(value, size);
+        }
+
+        template <class A, class T> void io(A& a, std::vector<T>& values) {
+            uint64_t size = values.size();
+            a.raw(size);
+            if (A::reading)
+                values.resize(size);
+
+            for (auto& value: values)
+                io(a, value);
+        }
+
+        template <class A, class K, class V> void io(A& a, std::map<K, V>& values) {
+            uint64_t size = values.size();
+            a.raw(size);
+
+            if (A::reading) {
+                values.clear();
+                for (uint64_t i = 0; i < size; i++) {
+                    K key;
+                    V value;
+                    io(a, key);
+                    io(a, value);
+                    values.emplace(key, value);
+                }
+            } else {
+                for (auto& it: values) {
+                    K key = it.first;
+                    io(a, key);
+                    io(a, it.second);
+                }
+            }
+        }
+
+        template <class A, class T> void io(A& a, boost::optional<T>& value) {
+            bool present = !!value;
+            a.raw(present);
+            if (! present)
+                return;
+
+            if (A::reading)
+                value = T();
+            io(a, *value);
+        }
+
+        template <class A, class T> void io(A& a, std::shared_ptr<T>& value) {
+            bool present = !!value;
+            a.raw(present);
+            if (! present)
+                return;
+
+            if (A::reading)
+                value = std::make_shared<T>();
+            io(a, *value);
+        }
+
+        template <class A> void io(A& a, Point& point) {
+            io(a, point.x);
+            io(a, point.y);
+        }
+
+        template <class A> void io(A& a, Range& range) {
+            io(a, range.start);
+            io(a, range.end);
+        }
+
+        template <class A> void io(A& a, Position& position) {
+            io(a, position.x1);
+            io(a, position.y1);
+            io(a, position.x2);
+            io(a, position.y2);
+        }
+
+        template <class A> void io(A& a, Label& label) {
+            io(a, label.text);
+            io(a, label.size);
+            io(a, label.position);
+        }
+
+        template <class A> void io(A& a, LineStyle& style) {
+            io(a, style.line_width);
+            io(a, style.line_color);
+            io(a, style.line_type);
+        }
+
+        template <class A> void io(A& a, PlotStyle& style) {
+            io(a, static_cast<LineStyle&>(style));
+            io(a, style.marker_size);
+            io(a, style.marker_color);
+            io(a, style.marker_type);
+            io(a, style.fill_color);
+            io(a, style.fill_type);
+            io(a, style.drawing_options);
+            io(a, style.legend);
+            io(a, style.legend_style);
+            io(a, style.legend_order);
+        }
+
+        template <class A> void io(A& a, Line& line) {
+            io(a, line.start);
+            io(a, line.end);
+            io(a, line.style);
+            io(a, line.pad);
+        }
+
+        template <class A> void io(A& a, RenameOp& op) {
+            io(a, op.pattern);
+            io(a, op.to);
+            if (A::reading)
+                op.from = std::regex(op.pattern, std::regex::extended);
+        }
+
+        template <class A> void io(A& a, CustomColor& color) {
+            io(a, color.index);
+            io(a, color.r);
+            io(a, color.g);
+            io(a, color.b);
+            io(a, color.a);
+            io(a, color.name);
+        }
+
+        template <class A> void io(A& a, LegendEntry& entry) {
+            io(a, entry.legend);
+            io(a, entry.style);
+            io(a, entry.order);
+            io(a, entry.fill_style);
+            io(a, entry.fill_color);
+            io(a, entry.line_width);
+        }
+
+        template <class A> void io(A& a, Legend& legend) {
+            io(a, legend.position);
+            io(a, legend.columns);
+        }
+
+        template <class A> void io(A& a, Group& group) {
+            io(a, group.name);
+            io(a, group.plot_style);
+        }
+
+        template <class A> void io(A& a, File& file) {
+            io(a, file.path);
+            io(a, file.pretty_name);
+            io(a, file.id);
+            io(a, file.era);
+            io(a, file.cross_section);
+            io(a, file.branching_ratio);
+            io(a, file.generated_events);
+            io(a, file.scale);
+            io(a, file.stack_index);
+            io(a, file.plot_style);
+            io(a, file.legend_group);
+            io(a, file.yields_group);
+            io(a, file.type);
+            io(a, file.order);
+            io(a, file.renaming_ops);
+        }
+
+        template <class A> void io(A& a, PlotTemplate& settings) {
+            io(a, settings.exclude);
+            io(a, settings.book_keeping_folder);
+            io(a, settings.renaming_ops);
+            io(a, settings.no_data);
+            io(a, settings.override);
+            io(a, settings.normalized);
+            io(a, settings.normalizedByBinWidth);
+            io(a, settings.x_axis);
+            io(a, settings.y_axis);
+            io(a, settings.y_axis_format);
+            io(a, settings.y_axis_show_zero);
+            io(a, settings.ratio_y_axis_title);
+            io(a, settings.x_axis_range);
+            io(a, settings.log_x_axis_range);
+            io(a, settings.y_axis_range);
+            io(a, settings.log_y_axis_range);
+            io(a, settings.ratio_y_axis_range);
+            io(a, settings.blinded_range);
+            io(a, settings.binning_x);
+            io(a, settings.binning_y);
+            io(a, settings.draw_string);
+            io(a, settings.selection_string);
+            io(a, settings.save_extensions);
+            io(a, settings.fit);
+            io(a, settings.fit_function);
+            io(a, settings.fit_legend);
+            io(a, settings.fit_legend_position);
+            io(a, settings.fit_range);
+            io(a, settings.fit_ratio);
+            io(a, settings.ratio_fit_function);
+            io(a, settings.ratio_fit_legend);
+            io(a, settings.ratio_fit_legend_position);
+            io(a, settings.ratio_fit_range);
+            io(a, settings.show_errors);
+            io(a, settings.show_overflow);
+            io(a, settings.inherits_from);
+            io(a, settings.rebin);
+            io(a, settings.labels);
+            io(a, settings.extra_label);
+            io(a, settings.legend_position);
+            io(a, settings.legend_columns);
+            io(a, settings.errors_type);
+            io(a, settings.yields_title);
+            io(a, settings.yields_table_order);
+            io(a, settings.sort_by_yields);
+            io(a, settings.lines);
+            io(a, settings.x_axis_label_size);
+            io(a, settings.y_axis_label_size);
+            io(a, settings.x_axis_hide_ticks);
+            io(a, settings.y_axis_hide_ticks);
+        }
+
+        template <class A> void io(A& a, Plot& plot) {
+            io(a, plot.name);
+            io(a, plot.output_suffix);
+            io(a, plot.log_y);
+            io(a, plot.log_x);
+            io(a, plot.show_ratio);
+            io(a, plot.use_for_yields);
+
+            // Plots are written with their own copy of the settings
+            std::shared_ptr<PlotTemplate> settings = std::const_pointer_cast<PlotTemplate>(plot.settings);
+            io(a, settings);
+            plot.settings = settings;
+        }
+
+        template <class A> void io(A& a, Configuration& config) {
+            io(a, config.width);
+            io(a, config.height);
+            io(a, config.margin_left);
+            io(a, config.margin_right);
+            io(a, config.margin_top);
+            io(a, config.margin_bottom);
+            io(a, config.eras);
+            io(a, config.luminosity);
+            io(a, config.scale);
+            io(a, config.no_lumi_rescaling);
+            io(a, config.luminosity_error_percent);
+            io(a, config.y_axis_format);
+            io(a, config.ratio_y_axis_title);
+            io(a, config.ratio_style);
+            io(a, config.error_fill_color);
+            io(a, config.error_fill_style);
+            io(a, config.fit_n_points);
+            io(a, config.fit_line_color);
+            io(a, config.fit_line_width);
+            io(a, config.fit_line_style);
+            io(a, config.fit_error_fill_color);
+            io(a, config.fit_error_fill_style);
+            io(a, config.ratio_fit_n_points);
+            io(a, config.ratio_fit_line_color);
+            io(a, config.ratio_fit_line_width);
+            io(a, config.ratio_fit_line_style);
+            io(a, config.ratio_fit_error_fill_color);
+            io(a, config.ratio_fit_error_fill_style);
+            io(a, config.line_style);
+            io(a, config.labels);
+            io(a, config.experiment);
+            io(a, config.extra_label);
+            io(a, config.lumi_label);
+            io(a, config.root);
+            io(a, config.show_overflow);
+            io(a, config.transparent_background);
+            io(a, config.mode);
+            io(a, config.tree_name);
+            io(a, config.errors_type);
+            io(a, config.yields_table_stretch);
+            io(a, config.yields_table_align);
+            io(a, config.yields_table_text_align);
+            io(a, config.yields_table_num_prec_yields);
+            io(a, config.yields_table_num_prec_ratio);
+            io(a, config.blinded_range_fill_color);
+            io(a, config.blinded_range_fill_style);
+            io(a, config.uncertainty_label);
+            io(a, config.static_legend_entries);
+            io(a, config.book_keeping_file_name);
+            io(a, config.x_axis_label_size);
+            io(a, config.y_axis_label_size);
+            io(a, config.x_axis_top_ticks);
+            io(a, config.y_axis_right_ticks);
+        }
+
+        /**
+         * Everything parseConfiguration sets. Systematics are kept as YAML, and
+         * created again when restored.
+         **/
+        template <class A>
+        void serializeConfiguration(A& a, std::string& output_path, Configuration& config, Legend& legend,
+                std::vector<File>& files, std::vector<Plot>& plots, std::map<std::string, Group>& groups,
+                std::vector<std::string>& file_patterns, std::vector<std::string>& systematics, std::vector<CustomColor>& colors) {
+            io(a, output_path);
+            io(a, config);
+            io(a, legend);
+            io(a, files);
+            io(a, plots);
+            io(a, groups);
+            io(a, file_patterns);
+            io(a, systematics);
+            io(a, colors);
+        }
+    }
+
+    ConfigCache::ConfigCache(const fs::path& path):
+        m_path(path) {
+
+            std::ifstream in(path.string(), std::ios::binary);
+            if (! in.is_open())
+                return;
+
+            std::string content((std::istreambuf_iterator<char>(in)), std::istreambuf_iterator<char>());
+
+            try {
+                Reader reader(content);
+
+                char magic[sizeof(CACHE_MAGIC)];
+                for (char& c: magic)
+                    reader.raw(c);
+
+                uint32_t version = 0;
+                reader.raw(version);
+
+                if (std::memcmp(magic, CACHE_MAGIC, sizeof(CACHE_MAGIC)) != 0 || version != CACHE_VERSION) {
+                    std::cout << "Warning: configuration cache " << path << " was written by another version of plotIt, ignoring it" << std::endl;
+                    return;
+                }
+
+                uint64_t size = 0;
+                reader.raw(size);
+                for (uint64_t i = 0; i < size; i++) {
+                    std::string file;
+                    uint64_t index;
+                    Entry entry;
+
+                    io(reader, file);
+                    reader.raw(index);
+                    io(reader, entry.context);
+                    reader.raw(entry.count);
+
+                    uint64_t n_dependencies = 0;
+                    reader.raw(n_dependencies);
+                    entry.dependencies.resize(n_dependencies);
+                    for (auto& dependency: entry.dependencies) {
+                        io(reader, dependency.path);
+                        reader.raw(dependency.size);
+                        reader.raw(dependency.mtime);
+                    }
+
+                    io(reader, entry.data);
+
+                    m_entries[std::make_pair(file, index)] = entry;
+                }
+            } catch (const std::runtime_error& e) {
+                std::cout << "Warning: configuration cache " << path << " is corrupted, ignoring it" << std::endl;
+                m_entries.clear();
+            }
+        }
+
+    bool ConfigCache::makeDependency(const std::string& path, Dependency& dependency) {
+        struct stat info;
+        if (stat(path.c_str(), &info) != 0)
+            return false;
+
+        dependency.path = path;
+        dependency.size = info.st_size;
+        dependency.mtime = static_cast<int64_t>(info.st_mtim.tv_sec) * 1000000000 + info.st_mtim.tv_nsec;
+
+        return true;
+    }
+
+    const ConfigCache::Entry* ConfigCache::find(const std::string& file, size_t index) const {
+        auto it = m_entries.find(std::make_pair(fs::absolute(file).string(), index));
+        if (it == m_entries.end())
+            return nullptr;
+
+        for (const auto& dependency: it->second.dependencies) {
+            Dependency current;
+            if (! makeDependency(dependency.path, current) || current.size != dependency.size || current.mtime != dependency.mtime)
+                return nullptr;
+        }
+
+        return &it->second;
+    }
+
+    size_t ConfigCache::documents(const std::string& file) const {
+        const Entry* entry = find(file, 0);
+
+        return entry ? entry->count : 0;
+    }
+
+    bool ConfigCache::restore(plotIt& p, const std::string& file, size_t index, const std::string& context) const {
+        const Entry* entry = find(file, index);
+        if (! entry || entry->context != context)
+            return false;
+
+        std::string output_path;
+        std::vector<std::string> systematics;
+        std::vector<CustomColor> colors;
+
+        try {
+            Reader reader(entry->data);
+            serializeConfiguration(reader, output_path, p.m_config, p.m_legend, p.m_files, p.m_plots, p.m_legend_groups,
+                    p.m_file_patterns, systematics, colors);
+        } catch (const std::runtime_error& e) {
+            return false;
+        }
+
+        // Input files may have been added or removed since the configuration was parsed
+        std::vector<std::string> expanded_files;
+        for (const auto& pattern: p.m_file_patterns) {
+            std::vector<std::string> matches = glob(pattern);
+            expanded_files.insert(expanded_files.end(), matches.begin(), matches.end());
+        }
+
+        std::vector<std::string> cached_files;
+        for (const auto& f: p.m_files)
+            cached_files.push_back(f.path);
+
+        std::sort(expanded_files.begin(), expanded_files.end());
+        std::sort(cached_files.begin(), cached_files.end());
+        if (expanded_files != cached_files)
+            return false;
+
+        for (const auto& color: colors) {
+            if (! restoreColor(color))
+                return false;
+        }
+        p.m_custom_colors = colors;
+
+        for (const auto& systematic: systematics)
+            p.parseSystematicsNode(YAML::Load(systematic));
+
+        // The first dependency is the configuration file itself, the others are its includes
+        p.m_included_files.clear();
+        for (size_t i = 1; i < entry->dependencies.size(); i++)
+            p.m_included_files.push_back(entry->dependencies[i].path);
+
+        p.m_outputPath = output_path;
+        if (! fs::exists(p.m_outputPath))
+            fs::create_directories(p.m_outputPath);
+
+        return true;
+    }
+
+    void ConfigCache::store(const plotIt& p, const std::string& file, size_t index, size_t count, const std::string& context) {
+        // In-memory inputs do not outlive the process
+        for (const auto& f: p.m_files) {
+            if (boost::starts_with(f.path, "memory://"))
+                return;
+        }
+
+        Entry entry;
+        entry.context = context;
+        entry.count = count;
+
+        std::vector<std::string> paths = {fs::absolute(file).string()};
+        paths.insert(paths.end(), p.m_included_files.begin(), p.m_included_files.end());
+        for (const auto& path: paths) {
+            Dependency dependency;
+            if (! makeDependency(path, dependency))
+                return;
+
+            entry.dependencies.push_back(dependency);
+        }
+
+        // Serialization does not modify anything, but shares its code with deserialization
+        plotIt& q = const_cast<plotIt&>(p);
+        std::string output_path = p.m_outputPath.string();
+        std::vector<std::string> systematics = p.m_systematics_nodes;
+        std::vector<CustomColor> colors = p.m_custom_colors;
+
+        Writer writer;
+        serializeConfiguration(writer, output_path, q.m_config, q.m_legend, q.m_files, q.m_plots, q.m_legend_groups,
+                q.m_file_patterns, systematics, colors);
+        entry.data = writer.data();
+
+        m_entries[std::make_pair(fs::absolute(file).string(), index)] = entry;
+        m_modified = true;
+    }
+
+    bool ConfigCache::save() const {
+        if (! m_modified)
+            return true;
+
+        Writer writer;
+        for (char c: CACHE_MAGIC)
+            writer.raw(c);
+        writer.raw(CACHE_VERSION);
+
+        uint64_t size = m_entries.size();
+        writer.raw(size);
+        for (const auto& it: m_entries) {
+            std::string file = it.first.first;
+            uint64_t index = it.first.second;
+            Entry entry = it.second;
+
+            io(writer, file);
+            writer.raw(index);
+            io(writer, entry.context);
+            writer.raw(entry.count);
+
+            uint64_t n_dependencies = entry.dependencies.size();
+            writer.raw(n_dependencies);
+            for (auto& dependency: entry.dependencies) {
+                io(writer, dependency.path);
+                writer.raw(dependency.size);
+                writer.raw(dependency.mtime);
+            }
+
+            io(writer, entry.data);
+        }
+
+        // Written then renamed, so that concurrent runs never see a partial cache
+        fs::path tmp = m_path;
+        tmp += ".tmp";
+
+        {
+            std::ofstream out(tmp.string(), std::ios::binary);
+            if (! out.is_open())
+                return false;
+
+            out.write(writer.data().data(), writer.data().size());
+            if (! out)
+                return false;
+        }
+
+        boost::system::error_code ec;
+        fs::rename(tmp, m_path, ec);
+
+        return !ec;
+    }
+}
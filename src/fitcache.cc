@@ -0,0 +1,143 @@
+#include <fitcache.h>
+#include <hash.h>
+
+#include <TGraph.h>
+#include <TH1.h>
+
+#include <cmath>
+#include <fstream>
+#include <iomanip>
+#include <iostream>
+#include <limits>
+
+namespace plotIt {
+
+  namespace {
+    void updateDefinition(Hasher& hasher, const std::string& function, double xMin, double xMax, uint16_t n_points) {
+      hasher.update(function);
+      hasher.update(xMin);
+      hasher.update(xMax);
+      hasher.update(static_cast<double>(n_points));
+    }
+
+    void writeVector(std::ostream& out, const std::vector<double>& values) {
+      out << " " << values.size();
+      for (double value: values)
+        out << " " << value;
+    }
+
+    bool isFinite(const std::vector<double>& values) {
+      for (double value: values) {
+        if (! std::isfinite(value))
+          return false;
+      }
+
+      return true;
+    }
+
+    bool readVector(std::istream& in, std::vector<double>& values) {
+      size_t size = 0;
+      if (! (in >> size))
+        return false;
+
+      values.resize(size);
+      for (double& value: values) {
+        if (! (in >> value))
+          return false;
+      }
+
+      return true;
+    }
+  }
+
+  uint64_t FitCache::key(const TH1& h, const std::string& function, double xMin, double xMax, uint16_t n_points) {
+    Hasher hasher;
+    updateDefinition(hasher, function, xMin, xMax, n_points);
+
+    hasher.update(h);
+
+    return hasher.digest();
+  }
+
+  uint64_t FitCache::key(const TGraph& g, const std::string& function, double xMin, double xMax, uint16_t n_points) {
+    Hasher hasher;
+    updateDefinition(hasher, function, xMin, xMax, n_points);
+
+    size_t n = g.GetN();
+    for (const double* values: {g.GetX(), g.GetY(), g.GetEXlow(), g.GetEXhigh(), g.GetEYlow(), g.GetEYhigh()}) {
+      // Errors are not defined for all kinds of graphs
+      if (values)
+        hasher.update(values, n * sizeof(double));
+    }
+
+    return hasher.digest();
+  }
+
+  const FitResult* FitCache::find(uint64_t key) const {
+    auto it = m_results.find(key);
+    if (it == m_results.end())
+      return nullptr;
+
+    return &it->second;
+  }
+
+  void FitCache::insert(uint64_t key, const FitResult& result) {
+    m_results[key] = result;
+    m_modified = true;
+  }
+
+  /**
+   * Text format, one fit per line:
+   *   <key> <valid> <n> <parameters...> <n> <parameter errors...> <n> <band contents...> <n> <band errors...>
+   **/
+  bool FitCache::load(const fs::path& path) {
+    std::ifstream in(path.native());
+    if (! in.is_open())
+      return false;
+
+    uint64_t key;
+    while (in >> std::hex >> key >> std::dec) {
+      FitResult result;
+      if (! (in >> result.valid) ||
+          ! readVector(in, result.parameters) ||
+          ! readVector(in, result.parameter_errors) ||
+          ! readVector(in, result.band_contents) ||
+          ! readVector(in, result.band_errors)) {
+        std::cout << "Warning: fit cache " << path << " is corrupted, ignoring the remaining entries" << std::endl;
+        break;
+      }
+
+      m_results[key] = result;
+    }
+
+    return true;
+  }
+
+  bool FitCache::save(const fs::path& path) const {
+    if (! m_modified)
+      return true;
+
+    std::ofstream out(path.native());
+    if (! out.is_open())
+      return false;
+
+    out << std::setprecision(std::numeric_limits<double>::max_digits10);
+    for (const auto& it: m_results) {
+      const FitResult& result = it.second;
+
+      // nan and inf cannot be read back, such results are fitted again by the next run
+      if (! isFinite(result.parameters) || ! isFinite(result.parameter_errors) ||
+          ! isFinite(result.band_contents) || ! isFinite(result.band_errors))
+        continue;
+
+      out << std::hex << it.first << std::dec << " " << result.valid;
+      writeVector(out, result.parameters);
+      writeVector(out, result.parameter_errors);
+      writeVector(out, result.band_contents);
+      writeVector(out, result.band_errors);
+      out << std::endl;
+    }
+
+    return true;
+  }
+}
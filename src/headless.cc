@@ -0,0 +1,18 @@
+/**
+ * Rendering entry point of plotIt-yields, which is not linked against the
+ * ROOT graphics libraries: only the yields table can be produced.
+ */
+
+#include "plotIt.h"
+
+#include <iostream>
+
+namespace plotIt {
+
+  void plotIt::renderPlots(std::vector<Plot>::iterator, std::vector<Plot>::iterator, size_t) {
+    std::cerr << "Error: plotIt-yields cannot render plots, use plotIt instead" << std::endl;
+  }
+
+  void plotIt::finishRendering() {
+  }
+}
@@ -0,0 +1,145 @@
+#include <layout.h>
+
+#include <TCanvas.h>
+#include <TLatex.h>
+#include <TPad.h>
+#include <TPaveText.h>
+
+#include <boost/format.hpp>
+
+namespace plotIt {
+
+    CanvasLayout::CanvasLayout(const Configuration& config):
+        m_config(config) {
+
+            m_canvas = std::make_shared<TCanvas>("plotit_canvas", "", m_config.width, m_config.height);
+
+            if (m_config.transparent_background) {
+                m_canvas->SetFillStyle(4000);
+                m_canvas->SetFrameFillStyle(4000);
+            }
+        }
+
+    CanvasLayout::~CanvasLayout() {
+        clear();
+    }
+
+    TCanvas& CanvasLayout::prepare(const std::string& name) {
+        // Left over by a plot which failed before being saved
+        clear();
+
+        m_canvas->SetName(name.c_str());
+        m_canvas->SetTitle(name.c_str());
+        m_canvas->cd();
+
+        return *m_canvas;
+    }
+
+    std::pair<TPad*, TPad*> CanvasLayout::ratioPads(const Plot& plot) {
+        m_canvas->cd();
+
+        if (! m_hi_pad) {
+            m_hi_pad = std::make_shared<TPad>("pad_hi", "", 0., 0.33333, 1, 1);
+            m_hi_pad->SetTopMargin(m_config.margin_top / .6666);
+            m_hi_pad->SetLeftMargin(m_config.margin_left);
+            m_hi_pad->SetBottomMargin(0.015);
+            m_hi_pad->SetRightMargin(m_config.margin_right);
+
+            m_low_pad = std::make_shared<TPad>("pad_lo", "", 0., 0., 1, 0.33333);
+            m_low_pad->SetLeftMargin(m_config.margin_left);
+            m_low_pad->SetTopMargin(1.);
+            m_low_pad->SetBottomMargin(m_config.margin_bottom / .3333);
+            m_low_pad->SetRightMargin(m_config.margin_right);
+            m_low_pad->SetTickx(1);
+        }
+
+        m_hi_pad->Draw();
+        m_low_pad->Draw();
+
+        m_hi_pad->SetLogy(plot.log_y);
+        m_hi_pad->SetLogx(plot.log_x);
+        m_low_pad->SetLogx(plot.log_x);
+
+        m_hi_pad->cd();
+
+        return std::make_pair(m_hi_pad.get(), m_low_pad.get());
+    }
+
+    void CanvasLayout::decorate(const Plot& plot, const std::vector<Label>& labels) {
+        std::string extra_label = plot->extra_label;
+        if (extra_label.length() == 0)
+            extra_label = m_config.extra_label;
+
+        auto& headers = m_headers[std::make_pair(plot.show_ratio, extra_label)];
+        if (headers.empty()) {
+            float topMargin = m_config.margin_top;
+            if (plot.show_ratio)
+                topMargin /= .6666;
+
+            // Luminosity label
+            if (m_config.lumi_label.length() > 0) {
+                std::shared_ptr<TPaveText> pt = std::make_shared<TPaveText>(m_config.margin_left, 1 - 0.5 * topMargin, 1 - m_config.margin_right, 1, "brNDC");
+
+                pt->SetFillStyle(0);
+                pt->SetBorderSize(0);
+                pt->SetMargin(0);
+                pt->SetTextFont(42);
+                pt->SetTextSize(0.6 * topMargin);
+                pt->SetTextAlign(33);
+
+                pt->AddText(m_config.lumi_label.c_str());
+                headers.push_back(pt);
+            }
+
+            // Experiment
+            if (m_config.experiment.length() > 0) {
+                std::shared_ptr<TPaveText> pt = std::make_shared<TPaveText>(m_config.margin_left, 1 - 0.5 * topMargin, 1 - m_config.margin_right, 1, "brNDC");
+
+                pt->SetFillStyle(0);
+                pt->SetBorderSize(0);
+                pt->SetMargin(0);
+                pt->SetTextFont(62);
+                pt->SetTextSize(0.75 * topMargin);
+                pt->SetTextAlign(13);
+
+                std::string text = m_config.experiment;
+                if (extra_label.length()) {
+                    boost::format fmt("%s #font[52]{#scale[0.76]{%s}}");
+                    fmt % m_config.experiment % extra_label;
+
+                    text = fmt.str();
+                }
+
+                pt->AddText(text.c_str());
+                headers.push_back(pt);
+            }
+        }
+
+        for (const auto& header: headers)
+            header->Draw();
+
+        m_canvas->cd();
+
+        for (const auto& label: labels) {
+            auto& t = m_labels[std::make_tuple(label.text, label.size, label.position.x, label.position.y)];
+            if (! t) {
+                t.reset(new TLatex(label.position.x, label.position.y, label.text.c_str()));
+                t->SetNDC(true);
+                t->SetTextFont(43);
+                t->SetTextSize(label.size);
+            }
+
+            t->Draw();
+        }
+    }
+
+    void CanvasLayout::clear() {
+        // Pads are owned by the layout, clearing the canvas only removes them from it
+        if (m_hi_pad) {
+            m_hi_pad->Clear();
+            m_low_pad->Clear();
+        }
+
+        m_canvas->Clear();
+    }
+}
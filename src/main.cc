@@ -0,0 +1,455 @@
+#include "plotIt.h"
+
+#include <algorithm>
+#include <cstdio>
+#include <iostream>
+#include <map>
+#include <memory>
+#include <set>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+#include "tclap/CmdLine.h"
+
+#include <boost/filesystem.hpp>
+
+#include <cache.h>
+#include <commandlinecfg.h>
+#include <configcache.h>
+#include <pool.h>
+#include <selector.h>
+#include <shards.h>
+#include <staging.h>
+#include <timing.h>
+#include <watch.h>
+
+#include <TROOT.h>
+
+namespace fs = boost::filesystem;
+
+/**
+ * plotIt merge: combine the yields and book-keeping files of the shards of a job
+ */
+int merge(int argc, char** argv) {
+
+  try {
+
+    TCLAP::CmdLine cmd("Merge the output of the shards of a job (see --shard)", ' ', "0.1");
+
+    TCLAP::ValueArg<std::string> outputFolderArg("o", "output-folder", "output folder", true, "", "string", cmd);
+
+    TCLAP::SwitchArg verboseArg("v", "verbose", "Verbose output (print the yields table)", cmd, false);
+
+    TCLAP::UnlabeledMultiArg<std::string> manifestsArg("manifests", "shard manifests (default: all the plotit-shard-*-of-*.yml files of the output folder)", false, "string", cmd);
+
+    cmd.parse(argc, argv);
+
+    fs::path outputPath(outputFolderArg.getValue());
+
+    if (! fs::exists(outputPath)) {
+      std::cout << "Error: output path " << outputPath << " does not exist" << std::endl;
+      return 1;
+    }
+
+    CommandLineCfg::get().verbose = verboseArg.getValue();
+
+    std::vector<fs::path> manifests;
+    for (const std::string& manifest: manifestsArg.getValue())
+      manifests.push_back(manifest);
+
+    if (! plotIt::mergeShards(outputPath, manifests))
+      return 1;
+
+  } catch (TCLAP::ArgException &e) {
+    std::cerr << "error: " << e.error() << " for arg " << e.argId() << std::endl;
+    return 1;
+  }
+
+  return 0;
+}
+
+int main(int argc, char** argv) {
+
+  if (argc > 1 && std::string(argv[1]) == "merge")
+    return merge(argc - 1, argv + 1);
+
+  try {
+
+    TCLAP::CmdLine cmd("Plot histograms", ' ', "0.1");
+
+    TCLAP::ValueArg<std::string> histogramsFolderArg("i", "histograms-folder", "histograms base folder (default: current directory)", false, "./", "string", cmd);
+
+    TCLAP::ValueArg<std::string> outputFolderArg("o", "output-folder", "output folder", true, "", "string", cmd);
+
+    TCLAP::ValueArg<std::string> eraArg("e", "era", "era to restrict to", false, "", "string", cmd);
+
+    TCLAP::SwitchArg ignoreScaleArg("", "ignore-scales", "Ignore any scales present in the configuration file", cmd, false);
+
+    TCLAP::SwitchArg verboseArg("v", "verbose", "Verbose output (print summary)", cmd, false);
+
+    TCLAP::SwitchArg yieldsArg("y", "yields", "Produce LaTeX table of yields", cmd, false);
+
+    TCLAP::SwitchArg plotsArg("p", "plots", "Do not produce the plots - can be useful if only the yields table is needed", cmd, false);
+
+    TCLAP::SwitchArg unblindArg("u", "unblind", "Unblind the plots, ie ignore any blinded-range in the configuration", cmd, false);
+
+    TCLAP::SwitchArg systematicsBreakdownArg("b", "systs-breadown", "Print systematics details for each MC process separately in addition to the total contribution", cmd, false);
+
+    TCLAP::SwitchArg fitCacheArg("", "fit-cache", "Keep the results of the fits in the output folder (plotIt_fit_cache.txt), and reuse them when the fitted histograms did not change", cmd, false);
+
+    TCLAP::SwitchArg selectionCacheArg("", "selection-cache", "In tree mode, keep the entries passing each selection in the output folder (plotIt_selection_cache.root), so that each selection is evaluated over all the entries only once per input file, across runs", cmd, false);
+
+    TCLAP::ValueArg<size_t> jobsArg("j", "jobs", "Number of processes rendering the plots (default: 1; with --preview, threads drawing the thumbnails, by default one per core). Loaded histograms are shared between the processes", false, 1, "int", cmd);
+
+    TCLAP::ValueArg<size_t> ioThreadsArg("", "io-threads", "Number of threads reading and decompressing the objects of different input files at the same time (default: 1). Not used in tree mode", false, 1, "int", cmd);
+
+    TCLAP::SwitchArg previewArg("", "preview", "Only write low resolution PNG thumbnails of the plots, and an HTML gallery of them (preview/index.html in the output folder). Much faster than the full rendering", cmd, false);
+
+    TCLAP::SwitchArg multipagePdfArg("", "multipage-pdf", "Write the PDF outputs of all the plots of a folder as the pages of a single plots.pdf in this folder, instead of one file per plot. Plots are rendered sequentially", cmd, false);
+
+    TCLAP::ValueArg<std::string> archiveArg("", "archive", "Write all the outputs in this tar archive (relative to the output folder), with a manifest of its content, instead of one file per plot and extension. Plots are rendered sequentially", false, "", "file.tar", cmd);
+
+    TCLAP::ValueArg<std::string> filterArg("", "filter", "Only render the plots whose name matches this glob pattern, e.g. to render with full quality the plots chosen from the previews", false, "", "pattern", cmd);
+
+    TCLAP::MultiArg<std::string> selectArg("", "select", "Only list, load and render the plots matching this expression: [name|dir|category]=glob or [name|dir|category]~regex (default field: name). Can be repeated: a plot is selected if it matches one of the expressions of each field used", false, "expression", cmd);
+
+    TCLAP::ValueArg<std::string> shardArg("", "shard", "Render only the i-th out of N shards of the plots (i/N, starting at 1). Plots are split deterministically, and yields and book-keeping are combined afterwards with 'plotIt merge'", false, "", "i/N", cmd);
+
+    TCLAP::ValueArg<std::string> configCacheArg("", "config-cache", "Keep the parsed configurations in this file, and reuse them as long as the configuration files and their includes are unchanged", false, "", "file", cmd);
+
+    TCLAP::ValueArg<std::string> stageDirArg("", "stage-dir", "Copy the input files and the files of the shape systematics in this local folder, with large sequential reads ahead of the time they are needed, and read them from there. Copies are kept for the next runs, as long as the original files are unchanged", false, "", "folder", cmd);
+
+    TCLAP::ValueArg<double> stageBudgetArg("", "stage-budget", "Disk space used by the local copies of --stage-dir, in GB (default: 20). The least recently used copies are removed first", false, 20, "GB", cmd);
+
+    TCLAP::SwitchArg watchArg("", "watch", "Keep running, and render again what depends on the configuration files, their includes and the input files when they change. Only the plots whose objects changed are rendered again, and unchanged input files are not read again", cmd, false);
+
+    TCLAP::SwitchArg timingArg("t", "timing", "Print the wall time spent in each phase of the run (parsing, loading, plotting, ...)", cmd, false);
+
+    TCLAP::UnlabeledMultiArg<std::string> configFileArg("configFiles", "configuration file(s). A file may contain several YAML documents. When more than one configuration is given, each one is rendered in its own sub-folder of the output folder, unless 'output-folder' is set in its 'configuration' block", true, "string", cmd);
+
+    cmd.parse(argc, argv);
+
+    //bool isData = dataArg.isSet();
+
+    fs::path histogramsPath(fs::canonical(histogramsFolderArg.getValue()));
+
+    if (! fs::exists(histogramsPath)) {
+      std::cout << "Error: histograms path " << histogramsPath << " does not exist" << std::endl;
+    }
+
+    fs::path outputPath(outputFolderArg.getValue());
+
+    if (! fs::exists(outputPath)) {
+      std::cout << "Error: output path " << outputPath << " does not exist" << std::endl;
+      return 1;
+    }
+
+#ifdef PLOTIT_HEADLESS
+    // plotIt-yields only produces the yields table, -y and -p are implied
+    bool do_plots = false;
+    bool do_yields = true;
+#else
+    bool do_plots = !plotsArg.getValue();
+    bool do_yields = yieldsArg.getValue();
+#endif
+
+    if( !do_plots && !do_yields ) {
+      std::cerr << "Error: we have nothing to do" << std::endl;
+      return 1;
+    }
+
+    CommandLineCfg::get().era = eraArg.getValue();
+    CommandLineCfg::get().ignore_scales = ignoreScaleArg.getValue();
+    CommandLineCfg::get().verbose = verboseArg.getValue();
+    CommandLineCfg::get().do_plots = do_plots;
+    CommandLineCfg::get().do_yields = do_yields;
+    CommandLineCfg::get().unblind = unblindArg.getValue();
+    CommandLineCfg::get().systematicsBreakdown = systematicsBreakdownArg.getValue();
+    CommandLineCfg::get().timing = timingArg.getValue();
+    CommandLineCfg::get().fit_cache = fitCacheArg.getValue();
+    CommandLineCfg::get().selection_cache = selectionCacheArg.getValue();
+    if (jobsArg.isSet())
+      CommandLineCfg::get().jobs = std::max<size_t>(jobsArg.getValue(), 1);
+    CommandLineCfg::get().io_threads = std::max<size_t>(ioThreadsArg.getValue(), 1);
+    CommandLineCfg::get().preview = previewArg.getValue();
+    CommandLineCfg::get().multipage_pdf = multipagePdfArg.getValue();
+    CommandLineCfg::get().archive = archiveArg.getValue();
+    CommandLineCfg::get().config_cache = configCacheArg.getValue();
+    CommandLineCfg::get().watch = watchArg.getValue();
+    CommandLineCfg::get().select = selectArg.getValue();
+    CommandLineCfg::get().stage_dir = stageDirArg.getValue();
+    CommandLineCfg::get().stage_budget = static_cast<uint64_t>(std::max(stageBudgetArg.getValue(), 0.) * 1e9);
+
+    try {
+      plotIt::PlotSelector selector(CommandLineCfg::get().select);
+    } catch (const std::invalid_argument& e) {
+      std::cerr << "Error: " << e.what() << std::endl;
+      return 1;
+    }
+
+    if (CommandLineCfg::get().io_threads > 1)
+      ROOT::EnableThreadSafety();
+
+    if (shardArg.isSet()) {
+      size_t index = 0, count = 0;
+      char end;
+      if (std::sscanf(shardArg.getValue().c_str(), "%zu/%zu%c", &index, &count, &end) != 2 || index < 1 || index > count) {
+        std::cerr << "Error: invalid shard '" << shardArg.getValue() << "', expected i/N with 1 <= i <= N" << std::endl;
+        return 1;
+      }
+
+      CommandLineCfg::get().shard_index = index;
+      CommandLineCfg::get().shard_count = count;
+    }
+
+    if (! CommandLineCfg::get().stage_dir.empty())
+      plotIt::StagingArea::get().enable(CommandLineCfg::get().stage_dir, CommandLineCfg::get().stage_budget);
+
+    std::unique_ptr<plotIt::ConfigCache> configCache;
+    if (! CommandLineCfg::get().config_cache.empty())
+      configCache.reset(new plotIt::ConfigCache(CommandLineCfg::get().config_cache));
+
+    // Documents of each configuration file, loaded only when needed if the configuration cache is used
+    std::map<std::string, std::vector<YAML::Node>> nodes;
+    const auto& loadNodes = [&nodes](const std::string& file) -> const std::vector<YAML::Node>& {
+      auto it = nodes.find(file);
+      if (it != nodes.end())
+        return it->second;
+
+      try {
+        return nodes[file] = YAML::LoadAllFromFile(file);
+      } catch ( const YAML::BadFile& e ) {
+        std::cout << "Problem parsing YAML file '" << file << "'" << std::endl;
+        throw e;
+      }
+    };
+
+    // Each YAML document of each configuration file is a configuration to render
+    struct ConfigurationDocument {
+      std::string file;
+      size_t index;
+      size_t count;
+    };
+
+    std::vector<ConfigurationDocument> documents;
+    for (const std::string& file: configFileArg.getValue()) {
+      size_t count = configCache ? configCache->documents(file) : 0;
+      if (count == 0)
+        count = loadNodes(file).size();
+
+      if (count == 0) {
+        std::cerr << "Error: configuration file '" << file << "' is empty" << std::endl;
+        return 1;
+      }
+
+      for (size_t i = 0; i < count; i++)
+        documents.push_back({file, i, count});
+    }
+
+    // Configurations rendered in the same process share the opened files and the histograms read from them.
+    // In watch mode, they are kept from one update to the next.
+    bool batch = documents.size() > 1;
+    bool watch = CommandLineCfg::get().watch;
+    plotIt::InputCache::get().setEnabled(batch || watch);
+
+    // Output folder of each configuration
+    std::vector<fs::path> documentOutputPaths;
+    std::set<std::string> used_folders;
+    for (const auto& document: documents) {
+      fs::path documentOutputPath = outputPath;
+      if (batch) {
+        std::string folder = fs::path(document.file).stem().native();
+        if (document.count > 1)
+          folder += "_" + std::to_string(document.index);
+
+        // Configuration files with the same name may come from different folders
+        std::string unique_folder = folder;
+        for (size_t n = 1; used_folders.count(unique_folder); n++)
+          unique_folder = folder + "_" + std::to_string(n);
+        used_folders.insert(unique_folder);
+
+        documentOutputPath /= unique_folder;
+      }
+
+      documentOutputPaths.push_back(documentOutputPath);
+    }
+
+    // Parse a configuration, or restore it from the cache if `restore` is set. Return nullptr if it is invalid.
+    const auto& load = [&](const ConfigurationDocument& document, const fs::path& documentOutputPath, bool restore) -> std::unique_ptr<plotIt::plotIt> {
+      plotIt::ScopedTimer timer("parse");
+
+      std::unique_ptr<plotIt::plotIt> p(new plotIt::plotIt(documentOutputPath));
+
+      // Everything the parsed configuration depends on, besides the configuration files
+      std::string context = CommandLineCfg::get().era + "\n" + histogramsPath.string() + "\n" + fs::absolute(documentOutputPath).string();
+
+      if (configCache && restore && configCache->restore(*p, document.file, document.index, context)) {
+        if (CommandLineCfg::get().verbose)
+          std::cout << "Configuration " << document.index + 1 << "/" << document.count << " of '" << document.file << "' restored from the cache" << std::endl;
+
+        return p;
+      }
+
+      // A failed restore may leave a partial configuration behind
+      p.reset(new plotIt::plotIt(documentOutputPath));
+
+      const std::vector<YAML::Node>& fileNodes = loadNodes(document.file);
+      if (document.index >= fileNodes.size()) {
+        std::cerr << "Error: configuration file '" << document.file << "' has only " << fileNodes.size() << " documents" << std::endl;
+        return nullptr;
+      }
+
+      if (!p->parseConfiguration(fileNodes[document.index], fs::absolute(fs::path(document.file)).parent_path(), histogramsPath))
+        return nullptr;
+
+      if (configCache)
+        configCache->store(*p, document.file, document.index, fileNodes.size(), context);
+
+      return p;
+    };
+
+    // In watch mode, configurations are kept with the configuration files they were parsed from
+    std::vector<std::unique_ptr<plotIt::plotIt>> instances(documents.size());
+    std::vector<std::set<std::string>> configurationFiles(documents.size());
+
+    bool success = true;
+    {
+      plotIt::ScopedTimer total_timer("total");
+
+      for (size_t i = 0; i < documents.size(); i++) {
+        const auto& document = documents[i];
+        if (batch) {
+          if (! fs::exists(documentOutputPaths[i]))
+            fs::create_directories(documentOutputPaths[i]);
+
+          std::cout << "Rendering configuration " << document.index + 1 << "/" << document.count << " of '" << document.file << "'..." << std::endl;
+        }
+
+        configurationFiles[i].insert(document.file);
+
+        std::unique_ptr<plotIt::plotIt> p = load(document, documentOutputPaths[i], true);
+        if (! p) {
+          success = false;
+          continue;
+        }
+
+        const std::vector<std::string>& included = p->getIncludedFiles();
+        configurationFiles[i].insert(included.begin(), included.end());
+
+        p->setIncremental(watch);
+        p->plotAll(filterArg.getValue());
+
+        if (watch)
+          instances[i] = std::move(p);
+
+        // Objects of this configuration are not referenced anymore
+        plotIt::TemporaryPool::get().clearRuntime();
+      }
+
+      if (! watch)
+        plotIt::InputCache::get().clear();
+    }
+
+    if (watch) {
+      if (! plotIt::StagingArea::get().save())
+        std::cerr << "Warning: cannot write the list of staged files" << std::endl;
+
+      if (configCache && ! configCache->save())
+        std::cerr << "Warning: cannot write the configuration cache " << CommandLineCfg::get().config_cache << std::endl;
+
+      if (CommandLineCfg::get().timing)
+        plotIt::PhaseTimings::get().print(std::cout);
+
+      const auto& intersects = [](const std::set<std::string>& files, const std::set<std::string>& changed) {
+        for (const std::string& file: changed) {
+          if (files.count(file))
+            return true;
+        }
+
+        return false;
+      };
+
+      // Configuration files, includes, input files and files of the systematics are watched.
+      // Everything is rendered again when a configuration changes; when input files change,
+      // only the plots whose objects changed are rendered again, see plotIt::setIncremental.
+      plotIt::FileWatcher watcher;
+      while (watcher.valid()) {
+        for (size_t i = 0; i < documents.size(); i++) {
+          watcher.watch(configurationFiles[i]);
+          if (instances[i])
+            watcher.watch(instances[i]->getInputFiles());
+        }
+
+        std::cout << "Watching for changes, press Ctrl-C to stop..." << std::endl;
+        std::set<std::string> changed = watcher.wait();
+
+        for (const std::string& file: changed) {
+          if (CommandLineCfg::get().verbose)
+            std::cout << "'" << file << "' changed" << std::endl;
+
+          plotIt::InputCache::get().invalidate(file);
+          nodes.erase(file);
+        }
+
+        plotIt::ScopedTimer total_timer("total");
+        for (size_t i = 0; i < documents.size(); i++) {
+          const auto& document = documents[i];
+
+          if (intersects(configurationFiles[i], changed)) {
+            std::cout << "Configuration " << document.index + 1 << "/" << document.count << " of '" << document.file << "' changed, rendering everything again..." << std::endl;
+
+            // Parsed again: the modification time of a file written twice in a row may not change
+            std::unique_ptr<plotIt::plotIt> p = load(document, documentOutputPaths[i], false);
+            if (! p) {
+              // The previous configuration is kept until the configuration is fixed
+              continue;
+            }
+
+            configurationFiles[i] = {document.file};
+            const std::vector<std::string>& included = p->getIncludedFiles();
+            configurationFiles[i].insert(included.begin(), included.end());
+
+            p->setIncremental(true);
+            instances[i] = std::move(p);
+          } else if (instances[i] && intersects(instances[i]->getInputFiles(), changed)) {
+            std::cout << "Inputs of configuration " << document.index + 1 << "/" << document.count << " of '" << document.file << "' changed, rendering the affected plots again..." << std::endl;
+
+            instances[i]->reloadFiles(changed);
+          } else {
+            continue;
+          }
+
+          instances[i]->plotAll(filterArg.getValue());
+          plotIt::TemporaryPool::get().clearRuntime();
+        }
+
+        if (! plotIt::StagingArea::get().save())
+          std::cerr << "Warning: cannot write the list of staged files" << std::endl;
+
+        if (configCache && ! configCache->save())
+          std::cerr << "Warning: cannot write the configuration cache " << CommandLineCfg::get().config_cache << std::endl;
+      }
+
+      // Only reached if the files cannot be watched
+      return 1;
+    }
+
+    plotIt::StagingArea::get().finish();
+
+    if (configCache && ! configCache->save())
+      std::cerr << "Warning: cannot write the configuration cache " << CommandLineCfg::get().config_cache << std::endl;
+
+    if (CommandLineCfg::get().timing)
+      plotIt::PhaseTimings::get().print(std::cout);
+
+    if (! success)
+      return 1;
+
+  } catch (TCLAP::ArgException &e) {
+    std::cerr << "error: " << e.error() << " for arg " << e.argId() << std::endl;
+    return 1;
+  }
+
+  return 0;
+}
@@ -6,38 +6,39 @@
 #include <TROOT.h>
 #include <TList.h>
 #include <TCollection.h>
-#include <TCanvas.h>
 #include <TError.h>
 #include <TFile.h>
 #include <TKey.h>
-#include <TLatex.h>
-#include <TLegend.h>
-#include <TLegendEntry.h>
-#include <TPaveText.h>
 #include <TColor.h>
-#include <TGaxis.h>
-#include <Math/QuantFuncMathCore.h>
+#include <TEntryList.h>
 
+#include <algorithm>
 #include <vector>
 #include <map>
+#include <unordered_map>
 #include <fstream>
 #include <sstream>
 #include <set>
 #include <iomanip>
+#include <thread>
 
 #include <cmath>
-#include "tclap/CmdLine.h"
 
 #include <boost/algorithm/string/replace.hpp>
 #include <boost/algorithm/string.hpp>
 #include <boost/filesystem.hpp>
 #include <boost/format.hpp>
 
+#include <cache.h>
 #include <commandlinecfg.h>
-#include <plotters.h>
+#include <hash.h>
 #include <pool.h>
+#include <selector.h>
+#include <shards.h>
+#include <staging.h>
 #include <summary.h>
 #include <systematics.h>
+#include <timing.h>
 #include <utilities.h>
 
 
@@ -60,8 +61,6 @@ namespace plotIt {
   plotIt::plotIt(const fs::path& outputPath):
     m_outputPath(outputPath) {
 
-      createPlotters(*this);
-
       gErrorIgnoreLevel = kError;
 
       TH1::AddDirectory(false);
@@ -78,6 +77,8 @@ namespace plotIt {
 
         for (std::string& file: files) {
           fs::path ifp = fs::absolute(fs::path(file), base);
+          m_included_files.push_back(ifp.string());
+
           YAML::Node root;
           try {
             root = YAML::LoadFile(ifp.string());
@@ -141,6 +142,7 @@ namespace plotIt {
       }
 
       m_systematics.push_back(SystematicFactory::create(name, type, configuration));
+      m_systematics_nodes.push_back(YAML::Dump(node));
   }
 
   std::vector<RenameOp> parseRenameNode(const YAML::Node& node) {
@@ -154,7 +156,8 @@ namespace plotIt {
       for (YAML::const_iterator it = rename_node.begin(); it != rename_node.end(); ++it) {
           const YAML::Node& rename_op_node = *it;
           RenameOp op;
-          op.from = std::regex(rename_op_node["from"].as<std::string>(), std::regex::extended);
+          op.pattern = rename_op_node["from"].as<std::string>();
+          op.from = std::regex(op.pattern, std::regex::extended);
           op.to = rename_op_node["to"].as<std::string>();
 
           ops.push_back(op);
@@ -175,10 +178,11 @@ namespace plotIt {
           file.path = node["file"].as<std::string>();
       }
 
-      // Normalize path
+      // Normalize path. In-memory files are not relative to the root folder
       fs::path root = fs::path(m_config.root);
       fs::path path = fs::path(file.path);
-      file.path = (root / path).string();
+      if (! InputCache::isMemoryPath(file.path))
+        file.path = (root / path).string();
 
       if (node["pretty-name"]) {
         file.pretty_name = node["pretty-name"].as<std::string>();
@@ -233,11 +237,19 @@ namespace plotIt {
       throw e;
     }
 
+    return parseConfiguration(f, fs::absolute(fs::path(file)).parent_path(), histogramsPath);
+  }
+
+  bool plotIt::parseConfiguration(YAML::Node f, const fs::path& base, const fs::path& histogramsPath) {
+
     if (CommandLineCfg::get().verbose) {
         std::cout << "Parsing configuration file ...";
     }
 
-    parseIncludes(f, fs::absolute(fs::path(file)).parent_path());
+    // Colors created by the previous configurations are kept by them
+    size_t colors_begin = createdColors().size();
+
+    parseIncludes(f, base);
 
     if (! f["files"]) {
       throw YAML::ParserException(YAML::Mark::null_mark(), "Your configuration file must have a 'files' list");
@@ -481,6 +493,12 @@ namespace plotIt {
       if (node["book-keeping-file"])
         m_config.book_keeping_file_name = node["book-keeping-file"].as<std::string>();
 
+      if (node["output-folder"]) {
+        m_outputPath = fs::absolute(fs::path(node["output-folder"].as<std::string>()), m_outputPath);
+        if (! fs::exists(m_outputPath))
+          fs::create_directories(m_outputPath);
+      }
+
       // Axis size
       if (node["x-axis-label-size"])
         m_config.x_axis_label_size = node["x-axis-label-size"].as<float>();
@@ -512,6 +530,9 @@ namespace plotIt {
         }
     }
 
+    for (const File& file: m_files)
+      m_file_patterns.push_back(file.path);
+
     if (! expandFiles())
         return false;
 
@@ -595,39 +616,40 @@ namespace plotIt {
 
     for (YAML::const_iterator it = plots.begin(); it != plots.end(); ++it) {
       Plot plot;
+      std::shared_ptr<PlotTemplate> settings = std::make_shared<PlotTemplate>();
 
       plot.name = it->first.as<std::string>();
 
       YAML::Node node = it->second;
       if (node["exclude"])
-        plot.exclude = node["exclude"].as<std::string>();
+        settings->exclude = node["exclude"].as<std::string>();
 
       if (node["x-axis"])
-        plot.x_axis = node["x-axis"].as<std::string>();
+        settings->x_axis = node["x-axis"].as<std::string>();
 
       if (node["y-axis"])
-        plot.y_axis = node["y-axis"].as<std::string>();
+        settings->y_axis = node["y-axis"].as<std::string>();
 
       if (node["ratio-y-axis"])
-        plot.ratio_y_axis_title = node["ratio-y-axis"].as<std::string>();
+        settings->ratio_y_axis_title = node["ratio-y-axis"].as<std::string>();
       else
-        plot.ratio_y_axis_title = m_config.ratio_y_axis_title;
+        settings->ratio_y_axis_title = m_config.ratio_y_axis_title;
 
-      plot.y_axis_format = m_config.y_axis_format;
+      settings->y_axis_format = m_config.y_axis_format;
       if (node["y-axis-format"])
-        plot.y_axis_format = node["y-axis-format"].as<std::string>();
+        settings->y_axis_format = node["y-axis-format"].as<std::string>();
 
       if (node["normalized"])
-        plot.normalized = node["normalized"].as<bool>();
+        settings->normalized = node["normalized"].as<bool>();
 
       if (node["normalizedByBinWidth"])
-        plot.normalizedByBinWidth = node["normalizedByBinWidth"].as<bool>();
+        settings->normalizedByBinWidth = node["normalizedByBinWidth"].as<bool>();
 
       if (node["no-data"])
-        plot.no_data = node["no-data"].as<bool>();
+        settings->no_data = node["no-data"].as<bool>();
 
       if (node["override"])
-        plot.override = node["override"].as<bool>();
+        settings->override = node["override"].as<bool>();
 
       Log log_y = False;
       if (node["log-y"]) {
@@ -644,174 +666,176 @@ namespace plotIt {
         plot.log_x = (bool) log_x;
 
       if (node["save-extensions"])
-        plot.save_extensions = node["save-extensions"].as<std::vector<std::string>>();
+        settings->save_extensions = node["save-extensions"].as<std::vector<std::string>>();
 
       if (node["show-ratio"])
         plot.show_ratio = node["show-ratio"].as<bool>();
 
       if (node["fit-ratio"])
-        plot.fit_ratio = node["fit-ratio"].as<bool>();
+        settings->fit_ratio = node["fit-ratio"].as<bool>();
 
       if (node["fit"])
-        plot.fit = node["fit"].as<bool>();
+        settings->fit = node["fit"].as<bool>();
 
       if (node["fit-function"])
-        plot.fit_function = node["fit-function"].as<std::string>();
+        settings->fit_function = node["fit-function"].as<std::string>();
 
       if (node["fit-legend"])
-        plot.fit_legend = node["fit-legend"].as<std::string>();
+        settings->fit_legend = node["fit-legend"].as<std::string>();
 
       if (node["fit-legend-position"])
-        plot.fit_legend_position = node["fit-legend-position"].as<Point>();
+        settings->fit_legend_position = node["fit-legend-position"].as<Point>();
 
       if (node["fit-range"])
-        plot.fit_range = node["fit-range"].as<Range>();
+        settings->fit_range = node["fit-range"].as<Range>();
 
       if (node["ratio-fit-function"])
-        plot.ratio_fit_function = node["ratio-fit-function"].as<std::string>();
+        settings->ratio_fit_function = node["ratio-fit-function"].as<std::string>();
 
       if (node["ratio-fit-legend"])
-        plot.ratio_fit_legend = node["ratio-fit-legend"].as<std::string>();
+        settings->ratio_fit_legend = node["ratio-fit-legend"].as<std::string>();
 
       if (node["ratio-fit-legend-position"])
-        plot.ratio_fit_legend_position = node["ratio-fit-legend-position"].as<Point>();
+        settings->ratio_fit_legend_position = node["ratio-fit-legend-position"].as<Point>();
 
       if (node["ratio-fit-range"])
-        plot.ratio_fit_range = node["ratio-fit-range"].as<Range>();
+        settings->ratio_fit_range = node["ratio-fit-range"].as<Range>();
 
       if (node["show-errors"])
-        plot.show_errors = node["show-errors"].as<bool>();
+        settings->show_errors = node["show-errors"].as<bool>();
 
       if (node["x-axis-range"])
-        plot.x_axis_range = node["x-axis-range"].as<Range>();
-      plot.log_x_axis_range = plot.x_axis_range;
+        settings->x_axis_range = node["x-axis-range"].as<Range>();
+      settings->log_x_axis_range = settings->x_axis_range;
 
       if (node["log-x-axis-range"])
-        plot.log_x_axis_range = node["log-x-axis-range"].as<Range>();
+        settings->log_x_axis_range = node["log-x-axis-range"].as<Range>();
 
       if (node["y-axis-range"])
-        plot.y_axis_range = node["y-axis-range"].as<Range>();
-      plot.log_y_axis_range = plot.y_axis_range;
+        settings->y_axis_range = node["y-axis-range"].as<Range>();
+      settings->log_y_axis_range = settings->y_axis_range;
 
       if (node["log-y-axis-range"])
-        plot.log_y_axis_range = node["log-y-axis-range"].as<Range>();
+        settings->log_y_axis_range = node["log-y-axis-range"].as<Range>();
 
       if (node["ratio-y-axis-range"])
-        plot.ratio_y_axis_range = node["ratio-y-axis-range"].as<Range>();
+        settings->ratio_y_axis_range = node["ratio-y-axis-range"].as<Range>();
 
       if (node["blinded-range"])
-        plot.blinded_range = node["blinded-range"].as<Range>();
+        settings->blinded_range = node["blinded-range"].as<Range>();
 
       if (node["y-axis-show-zero"])
-        plot.y_axis_show_zero = node["y-axis-show-zero"].as<bool>();
+        settings->y_axis_show_zero = node["y-axis-show-zero"].as<bool>();
 
       if (node["inherits-from"])
-        plot.inherits_from = node["inherits-from"].as<std::string>();
+        settings->inherits_from = node["inherits-from"].as<std::string>();
 
       if (node["rebin"])
-        plot.rebin = node["rebin"].as<uint16_t>();
+        settings->rebin = node["rebin"].as<uint16_t>();
 
       if (node["labels"]) {
         YAML::Node labels = node["labels"];
-        plot.labels = parseLabelsNode(labels);
+        settings->labels = parseLabelsNode(labels);
       }
 
       if (node["extra-label"])
-        plot.extra_label = node["extra-label"].as<std::string>();
+        settings->extra_label = node["extra-label"].as<std::string>();
 
       if (node["legend-position"])
-        plot.legend_position = node["legend-position"].as<Position>();
+        settings->legend_position = node["legend-position"].as<Position>();
       else
-        plot.legend_position = m_legend.position;
+        settings->legend_position = m_legend.position;
 
       if (node["legend-columns"])
-        plot.legend_columns = node["legend-columns"].as<size_t>();
+        settings->legend_columns = node["legend-columns"].as<size_t>();
       else
-        plot.legend_columns = m_legend.columns;
+        settings->legend_columns = m_legend.columns;
 
       if (node["show-overflow"])
-        plot.show_overflow = node["show-overflow"].as<bool>();
+        settings->show_overflow = node["show-overflow"].as<bool>();
       else
-        plot.show_overflow = m_config.show_overflow;
+        settings->show_overflow = m_config.show_overflow;
 
       if (node["errors-type"])
-        plot.errors_type = string_to_errors_type(node["errors-type"].as<std::string>());
+        settings->errors_type = string_to_errors_type(node["errors-type"].as<std::string>());
       else
-        plot.errors_type = m_config.errors_type;
+        settings->errors_type = m_config.errors_type;
 
       if (node["binning-x"])
-        plot.binning_x = node["binning-x"].as<uint16_t>();
+        settings->binning_x = node["binning-x"].as<uint16_t>();
 
       if (node["binning-y"])
-        plot.binning_y = node["binning-y"].as<uint16_t>();
+        settings->binning_y = node["binning-y"].as<uint16_t>();
 
       if (node["draw-string"])
-        plot.draw_string = node["draw-string"].as<std::string>();
+        settings->draw_string = node["draw-string"].as<std::string>();
 
       if (node["selection-string"])
-        plot.selection_string = node["selection-string"].as<std::string>();
+        settings->selection_string = node["selection-string"].as<std::string>();
 
       if (node["for-yields"])
         plot.use_for_yields = node["for-yields"].as<bool>();
 
       if (node["yields-title"])
-        plot.yields_title = node["yields-title"].as<std::string>();
+        settings->yields_title = node["yields-title"].as<std::string>();
       else
-        plot.yields_title = plot.name;
+        settings->yields_title = plot.name;
 
       if (node["yields-table-order"])
-        plot.yields_table_order = node["yields-table-order"].as<int>();
+        settings->yields_table_order = node["yields-table-order"].as<int>();
 
       if (node["vertical-lines"]) {
         for (const auto& line: node["vertical-lines"]) {
-          plot.lines.push_back(Line(line, VERTICAL));
+          settings->lines.push_back(Line(line, VERTICAL));
         }
       }
 
       if (node["horizontal-lines"]) {
         for (const auto& line: node["horizontal-lines"]) {
-          plot.lines.push_back(Line(line, HORIZONTAL));
+          settings->lines.push_back(Line(line, HORIZONTAL));
         }
       }
 
       if (node["lines"]) {
         for (const auto& line: node["lines"]) {
-          plot.lines.push_back(Line(line, UNSPECIFIED));
+          settings->lines.push_back(Line(line, UNSPECIFIED));
         }
       }
 
-      for (auto& line: plot.lines) {
+      for (auto& line: settings->lines) {
         if (! line.style)
           line.style = m_config.line_style;
       }
 
       if (node["book-keeping-folder"]) {
-        plot.book_keeping_folder = node["book-keeping-folder"].as<std::string>();
+        settings->book_keeping_folder = node["book-keeping-folder"].as<std::string>();
       }
 
-      plot.renaming_ops = parseRenameNode(node);
+      settings->renaming_ops = parseRenameNode(node);
 
       if (node["sort-by-yields"]) {
-        plot.sort_by_yields = node["sort-by-yields"].as<bool>();
+        settings->sort_by_yields = node["sort-by-yields"].as<bool>();
       }
 
       // Axis size
       if (node["x-axis-label-size"])
-        plot.x_axis_label_size = node["x-axis-label-size"].as<float>();
+        settings->x_axis_label_size = node["x-axis-label-size"].as<float>();
       else
-        plot.x_axis_label_size = m_config.x_axis_label_size;
+        settings->x_axis_label_size = m_config.x_axis_label_size;
 
       if (node["y-axis-label-size"])
-        plot.y_axis_label_size = node["y-axis-label-size"].as<float>();
+        settings->y_axis_label_size = node["y-axis-label-size"].as<float>();
       else
-        plot.y_axis_label_size = m_config.y_axis_label_size;
+        settings->y_axis_label_size = m_config.y_axis_label_size;
 
       // Show or hide ticks
       if (node["x-axis-hide-ticks"])
-        plot.x_axis_hide_ticks = node["x-axis-hide-ticks"].as<bool>();
+        settings->x_axis_hide_ticks = node["x-axis-hide-ticks"].as<bool>();
 
       if (node["y-axis-hide-ticks"])
-        plot.y_axis_hide_ticks = node["y-axis-hide-ticks"].as<bool>();
+        settings->y_axis_hide_ticks = node["y-axis-hide-ticks"].as<bool>();
+
+      plot.settings = settings;
 
       // Handle log
       std::vector<bool> logs_x;
@@ -852,13 +876,15 @@ namespace plotIt {
     }
 
     // If at least one plot has 'override' set to true, keep only plots which do
-    if( std::find_if(m_plots.begin(), m_plots.end(), [](Plot &plot){ return plot.override; }) != m_plots.end() ){
-      auto new_end = std::remove_if(m_plots.begin(), m_plots.end(), [](Plot &plot){ return !plot.override; });
+    if( std::find_if(m_plots.begin(), m_plots.end(), [](Plot &plot){ return plot->override; }) != m_plots.end() ){
+      auto new_end = std::remove_if(m_plots.begin(), m_plots.end(), [](Plot &plot){ return !plot->override; });
       m_plots.erase(new_end, m_plots.end());
     }
 
     parseLumiLabel();
 
+    m_custom_colors.assign(createdColors().begin() + colors_begin, createdColors().end());
+
     if (CommandLineCfg::get().verbose) {
         std::cout << " done." << std::endl;
     }
@@ -876,304 +902,20 @@ namespace plotIt {
     m_config.lumi_label = formatter.str();
   }
 
-  void plotIt::fillLegend(TLegend& legend, const Plot& plot, bool with_uncertainties) {
-      std::vector<LegendEntry> legend_entries[plot.legend_columns];
-
-      auto getLegendEntryFromFile = [&](File& file, LegendEntry& entry) {
-          if (file.legend_group.length() > 0 && m_legend_groups.count(file.legend_group) && m_legend_groups[file.legend_group].plot_style->legend.length() > 0) {
-              if (m_legend_groups[file.legend_group].added)
-                  return false;
-              m_legend_groups[file.legend_group].added = true;
-
-              const auto& plot_style = m_legend_groups[file.legend_group].plot_style;
-              entry = {file.object, plot_style->legend, plot_style->legend_style, plot_style->legend_order};
-          } else if (file.plot_style.get() && file.plot_style->legend.length() > 0) {
-              entry = {file.object, file.plot_style->legend, file.plot_style->legend_style, file.plot_style->legend_order};
-          } else {
-            return false;
-          }
-
-          return true;
-      };
-
-      auto getEntries = [&](Type type) {
-          std::vector<LegendEntry> entries;
-          for (File& file: m_files) {
-              if (file.type == type) {
-                  LegendEntry entry;
-                  if (getLegendEntryFromFile(file, entry)) {
-                      entries.push_back(entry);
-                  }
-              }
-          }
-
-          for (const auto& entry: m_config.static_legend_entries[type]) {
-            entries.push_back(entry);
-          }
-
-          std::sort(entries.begin(), entries.end(), [](const LegendEntry& a, const LegendEntry& b) { return a.order > b.order; });
-
-          return entries;
-      };
-
-      // First, add data, always on first column
-      if (!plot.no_data) {
-          std::vector<LegendEntry> entries = getEntries(DATA);
-          for (const auto& entry: entries)
-              legend_entries[0].push_back(entry);
-      }
-
-      // Then MC, spanning on the remaining columns
-      size_t index = 0;
-      std::vector<LegendEntry> entries = getEntries(MC);
-      for (const LegendEntry& entry: entries) {
-          size_t column_index = (plot.legend_columns == 1) ? 0 : ((index % (plot.legend_columns - 1)) + 1);
-          legend_entries[column_index].push_back(entry);
-          index++;
-      }
-
-      // Signal, also on the first column
-      entries = getEntries(SIGNAL);
-      for (const LegendEntry& entry: entries) {
-          legend_entries[0].push_back(entry);
-      }
-
-      // Finally, if requested, the uncertainties entry
-      if (with_uncertainties)
-          legend_entries[0].push_back({m_config.uncertainty_label, "f", m_config.error_fill_style, m_config.error_fill_color, 0});
-
-      // Ensure all columns have the same size
-      size_t max_size = 0;
-      for (size_t i = 0; i < plot.legend_columns; i++) {
-          max_size = std::max(max_size, legend_entries[i].size());
-      }
-
-      for (size_t i = 0; i < plot.legend_columns; i++) {
-          legend_entries[i].resize(max_size, LegendEntry());
-      }
-
-      // Add entries to the legend
-      for (size_t i = 0; i < (plot.legend_columns * max_size); i++) {
-          size_t column_index = (i % plot.legend_columns);
-          size_t row_index = static_cast<size_t>(i / static_cast<float>(plot.legend_columns));
-          LegendEntry& entry = legend_entries[column_index][row_index];
-          TLegendEntry* e = legend.AddEntry(entry.object, entry.legend.c_str(), entry.style.c_str());
-          entry.stylize(e);
-      }
-  }
-
-  bool plotIt::plot(Plot& plot) {
-    std::cout << "Plotting '" << plot.name << "'" << std::endl;
-
-    bool hasMC = false;
-    bool hasData = false;
-    bool hasSignal = false;
-    bool hasLegend = false;
-    // Open all files, and find histogram in each
-    for (File& file: m_files) {
-      if (! loadObject(file, plot)) {
-        return false;
-      }
-
-      hasLegend |= getPlotStyle(file)->legend.length() > 0;
-      hasData |= file.type == DATA;
-      hasMC |= file.type == MC;
-      hasSignal |= file.type == SIGNAL;
-    }
-
-    // Can contains '/' if the plot is inside a folder
-    fs::path plot_path = plot.name + plot.output_suffix;
-    std::string plot_name = plot_path.filename().string();
-
-    // Create canvas
-    TCanvas c(plot_name.c_str(), plot_name.c_str(), m_config.width, m_config.height);
-
-    if (m_config.transparent_background) {
-        c.SetFillStyle(4000);
-        c.SetFrameFillStyle(4000);
-    }
-
-    if ( m_files.empty() ) {
-      std::cout << "No files selected" << std::endl;
-      return false;
-    }
-    boost::optional<Summary> summary = ::plotIt::plot(m_files[0], c, plot);
-
-    if (! summary)
-      return false;
-
-    if (CommandLineCfg::get().verbose) {
-      ConsoleSummaryPrinter printer;
-      printer.print(*summary);
-    }
-
-    if (plot.log_y)
-      c.SetLogy();
-
-    if (plot.log_x)
-      c.SetLogx();
-
-    Position legend_position = plot.legend_position;
-
-    // Build legend
-    TLegend legend(legend_position.x1, legend_position.y1, legend_position.x2, legend_position.y2);
-    legend.SetTextFont(43);
-    legend.SetFillStyle(0);
-    legend.SetBorderSize(0);
-    legend.SetNColumns(plot.legend_columns);
-
-    fillLegend(legend, plot, hasMC && plot.show_errors);
-
-    legend.Draw();
-
-    float topMargin = m_config.margin_top;
-    if (plot.show_ratio)
-      topMargin /= .6666;
-
-    // Move exponent label if shown
-    TGaxis::SetExponentOffset(-0.06, 0, "y");
-
-    // Luminosity label
-    if (m_config.lumi_label.length() > 0) {
-      std::shared_ptr<TPaveText> pt = std::make_shared<TPaveText>(m_config.margin_left, 1 - 0.5 * topMargin, 1 - m_config.margin_right, 1, "brNDC");
-      TemporaryPool::get().add(pt);
-
-      pt->SetFillStyle(0);
-      pt->SetBorderSize(0);
-      pt->SetMargin(0);
-      pt->SetTextFont(42);
-      pt->SetTextSize(0.6 * topMargin);
-      pt->SetTextAlign(33);
-
-      pt->AddText(m_config.lumi_label.c_str());
-      pt->Draw();
-    }
-
-    // Experiment
-    if (m_config.experiment.length() > 0) {
-      std::shared_ptr<TPaveText> pt = std::make_shared<TPaveText>(m_config.margin_left, 1 - 0.5 * topMargin, 1 - m_config.margin_right, 1, "brNDC");
-      TemporaryPool::get().add(pt);
-
-      pt->SetFillStyle(0);
-      pt->SetBorderSize(0);
-      pt->SetMargin(0);
-      pt->SetTextFont(62);
-      pt->SetTextSize(0.75 * topMargin);
-      pt->SetTextAlign(13);
-
-      std::string text = m_config.experiment;
-      if (m_config.extra_label.length() || plot.extra_label.length()) {
-        std::string extra_label = plot.extra_label;
-        if (extra_label.length() == 0) {
-          extra_label = m_config.extra_label;
-        }
-
-        boost::format fmt("%s #font[52]{#scale[0.76]{%s}}");
-        fmt % m_config.experiment % extra_label;
-
-        text = fmt.str();
-      }
-
-      pt->AddText(text.c_str());
-      pt->Draw();
-    }
-
-    c.cd();
-
-    const auto& labels = mergeLabels(plot.labels);
-
-    // Labels
-    for (auto& label: labels) {
-
-      std::shared_ptr<TLatex> t(new TLatex(label.position.x, label.position.y, label.text.c_str()));
-      t->SetNDC(true);
-      t->SetTextFont(43);
-      t->SetTextSize(label.size);
-      t->Draw();
-
-      TemporaryPool::get().add(t);
-    }
-
-    fs::path rootDir = m_outputPath;
-    fs::path outputName = rootDir / plot_path;
-
-    // Ensure path exists
-    fs::create_directories(outputName.parent_path());
-
-    for (const std::string& extension: plot.save_extensions) {
-      fs::path plotPathWithExtension = plot_path.replace_extension(extension);
-
-      std::string finalPlotPathWithExtension = applyRenaming(plot.renaming_ops, plotPathWithExtension.native());
-      fs::path finalOutputName = rootDir / finalPlotPathWithExtension;
-
-      c.SaveAs(finalOutputName.c_str());
-    }
-
-    if (m_config.book_keeping_file) {
-      TDirectory* root = m_config.book_keeping_file.get();
-      if (!plot.book_keeping_folder.empty() || !plot_path.parent_path().empty()) {
-        // Look in the cache if we have this folder. This avoid querying the file each time we save a plot
-        std::string path = (!plot.book_keeping_folder.empty()) ? plot.book_keeping_folder : plot_path.parent_path().string();
-        auto it = m_book_keeping_folders.find(path);
-        if (it == m_book_keeping_folders.end()) {
-          root = ::plotIt::getDirectory(m_config.book_keeping_file.get(), path);
-          m_book_keeping_folders.emplace(path, root);
-        } else {
-          root = it->second;
-        }
-      }
-      root->WriteTObject(&c, nullptr, "Overwrite");
-    }
-
-    // Clean all temporary resources
-    TemporaryPool::get().clear();
-
-    // Reset groups
-    for (auto& group: m_legend_groups) {
-      group.second.added = false;
-    }
-
-    return true;
-  }
-
   bool plotIt::yields(std::vector<Plot>::iterator plots_begin, std::vector<Plot>::iterator plots_end){
-    std::cout << "Producing LaTeX yield table.\n";
-
-    std::map<std::string, double> data_yields;
-
-    std::map< std::string, std::map<std::string, std::pair<double, double> > > mc_yields;
-    std::map< std::string, double > mc_total;
-    std::map< std::string, double > mc_total_sqerrs;
-    std::set<std::string> mc_processes;
-
-    std::map< std::string, std::map<std::string, std::pair<double, double> > > signal_yields;
-    std::set<std::string> signal_processes;
-
-    std::map<
-        std::tuple<Type, std::string, std::string>, // Type, category, systematics name
-        double
-    > process_systematics;
-
-    std::map<
-        std::string,
-        std::map<Type, double>
-    > total_systematics_squared;
-
-    std::vector< std::pair<int, std::string> > categories;
-
-    bool has_data(false);
 
     for ( auto it = plots_begin; it != plots_end; ++it ) {
       auto& plot = *it;
       if (!plot.use_for_yields)
         continue;
 
-      if (plot.yields_title.find("$") == std::string::npos)
-          replace_substr(plot.yields_title, "_", "\\_");
+      std::string yields_title = plot->yields_title;
+      if (yields_title.find("$") == std::string::npos)
+          replace_substr(yields_title, "_", "\\_");
 
-      if( std::find_if(categories.begin(), categories.end(), [&](const std::pair<int, std::string> &x){ return x.second == plot.yields_title; }) != categories.end() )
+      YieldsCategory* category = m_yields.add(yields_title, plot.global_id, plot->yields_table_order);
+      if (! category)
           continue;
-      categories.push_back( std::make_pair(plot.yields_table_order, plot.yields_title) );
 
       std::map<std::tuple<Type, std::string>, double> plot_total_systematics;
 
@@ -1186,8 +928,8 @@ namespace plotIt {
 
         if ( file.type == DATA ){
           TH1* h = dynamic_cast<TH1*>(file.object);
-          data_yields[plot.yields_title] += h->Integral(0, h->GetNbinsX() + 1);
-          has_data = true;
+          category->data += h->Integral(0, h->GetNbinsX() + 1);
+          m_yields.has_data = true;
           continue;
         }
 
@@ -1215,17 +957,15 @@ namespace plotIt {
         if (!CommandLineCfg::get().ignore_scales)
           factor *= m_config.scale * file.scale;
 
-        if (!plot.is_rescaled)
-          hist->Scale(factor);
-
+        // The histogram itself is left as loaded, for the rendering
         for (auto& syst: *file.systematics) {
           syst.update();
           syst.scale(factor);
         }
 
         // Retrieve yield and stat. error, taking overflow into account
-        yield_sqerror.first = hist->IntegralAndError(0, hist->GetNbinsX() + 1, yield_sqerror.second);
-        yield_sqerror.second = std::pow(yield_sqerror.second, 2);
+        yield_sqerror.first = factor * hist->IntegralAndError(0, hist->GetNbinsX() + 1, yield_sqerror.second);
+        yield_sqerror.second = std::pow(factor * yield_sqerror.second, 2);
 
         // Add systematics
         double file_total_systematics = 0;
@@ -1254,311 +994,152 @@ namespace plotIt {
         }
 
         // file_total_systematics contains the quadratic sum of all the systematics for this file
-        process_systematics[std::make_tuple(file.type, plot.yields_title, process_name)] += std::sqrt(file_total_systematics);
+        category->process_systematics[std::make_pair(file.type, process_name)] += std::sqrt(file_total_systematics);
 
         if ( file.type == MC ){
-          ADD_PAIRS(mc_yields[plot.yields_title][process_name], yield_sqerror);
-          mc_total[plot.yields_title] += yield_sqerror.first;
-          mc_total_sqerrs[plot.yields_title] += yield_sqerror.second;
-          mc_processes.emplace(process_name);
+          ADD_PAIRS(category->mc[process_name], yield_sqerror);
+          category->mc_total += yield_sqerror.first;
+          category->mc_total_sqerr += yield_sqerror.second;
+          m_yields.mc_processes.emplace(process_name);
         }
         if ( file.type == SIGNAL ){
-          ADD_PAIRS(signal_yields[plot.yields_title][process_name], yield_sqerror);
-          signal_processes.emplace(process_name);
+          ADD_PAIRS(category->signal[process_name], yield_sqerror);
+          m_yields.signal_processes.emplace(process_name);
         }
       }
 
       // Get the total systematics for this category
       for (auto& syst: plot_total_systematics) {
-        total_systematics_squared[plot.yields_title][std::get<0>(syst.first)] += syst.second * syst.second;
+        category->total_systematics_squared[std::get<0>(syst.first)] += syst.second * syst.second;
       }
     }
 
-    if( ( !(mc_processes.size()+signal_processes.size()) && !has_data ) || !categories.size() ){
-      std::cout << "No processes/data/categories defined\n";
-      return false;
-    }
-
-    // Sort according to user-defined order
-    std::sort(categories.begin(), categories.end(), [](const std::pair<int, std::string>& cat1, const std::pair<int, std::string>& cat2){  return cat1.first < cat2.first; });
-
-    std::ostringstream latexString;
-    std::string tab("    ");
-
-    latexString << std::setiosflags(std::ios_base::fixed);
-    latexString << R"(% Yields table generated automatically by plotIt.
-% Needed packages:
-%    \usepackage{booktabs}
-%
-% Use the following if building a CMS document
-%
-% \makeatletter
-% \newcommand{\thickhline}{%
-%     \noalign {\ifnum 0=`}\fi \hrule height .08em
-%     \futurelet \reserved@a \@xhline
-% }
-% \newcommand{\thinhline}{%
-%     \noalign {\ifnum 0=`}\fi \hrule height .05em
-%     \futurelet \reserved@a \@xhline
-% }
-% \makeatother
-% \newcommand{\toprule}{\noalign{\vskip0pt}\thickhline\noalign{\vskip.65ex}}
-% \newcommand{\midrule}{\noalign{\vskip.4ex}\thinhline\noalign{\vskip.65ex}}
-% \newcommand{\bottomrule}{\noalign{\vskip.4ex}\thickhline\noalign{\vskip0pt}})" << std::endl << std::endl;
-
-    auto format_number_with_errors = [](double number, double error_low, double error_high, uint8_t number_precision, uint8_t error_precision) -> std::string {
-        std::stringstream ss;
-        ss << std::setiosflags(std::ios_base::fixed);
-        ss << std::setprecision(number_precision);
-        if (std::abs(error_high - error_low) > std::pow(10, -1 * error_precision)) {
-            // Errors are really asymmetric
-            ss << "$" << number << std::setprecision(error_precision) << "^{+" << error_high << "}_{-" << error_low << "}$";
-        } else {
-            // Symmetric errors
-            ss << "$" << number << R"( {\scriptstyle\ \pm\ )" << std::setprecision(error_precision) << error_low << "}$";
-        }
-
-        return ss.str();
-    };
-
-    if( m_config.yields_table_align.find("h") != std::string::npos ){
-
-      latexString << "\\renewcommand{\\arraystretch}{" << m_config.yields_table_stretch << "}\n";
-      latexString << "\\begin{tabular}{ |l||";
-
-      // tabular config.
-      for(size_t i = 0; i < signal_processes.size(); ++i)
-        latexString << m_config.yields_table_text_align << "|";
-      if(signal_processes.size())
-        latexString << "|";
-      for(size_t i = 0; i < mc_processes.size(); ++i)
-        latexString << m_config.yields_table_text_align << "|";
-      if(mc_processes.size())
-        latexString << "|" + m_config.yields_table_text_align << "||";
-      if(has_data)
-        latexString << m_config.yields_table_text_align << "||";
-      if(has_data && mc_processes.size())
-        latexString << m_config.yields_table_text_align << "||";
-      latexString.seekp(latexString.tellp() - 2l);
-      latexString << "| }\n" << tab << tab << "\\hline\n";
-
-      // title line
-      latexString << "    Cat. & ";
-      for(auto &proc: signal_processes)
-        latexString << proc << " & ";
-      for(auto &proc: mc_processes)
-        latexString << proc << " & ";
-      if( mc_processes.size() )
-        latexString << "Tot. MC & ";
-      if( has_data )
-        latexString << "Data & ";
-      if( has_data && mc_processes.size() )
-        latexString << "Data/MC & ";
-      latexString.seekp(latexString.tellp() - 2l);
-      latexString << "\\\\\n" << tab << tab << "\\hline\n";
-
-      // loop over each category
-      for(auto& cat_pair: categories){
-
-        std::string categ(cat_pair.second);
-        latexString << tab << categ << " & ";
-        latexString << std::setprecision(m_config.yields_table_num_prec_yields);
-
-        for(auto &proc: signal_processes)
-          latexString << "$" << signal_yields[categ][proc].first << " \\pm " << std::sqrt(signal_yields[categ][proc].second + std::pow(process_systematics[std::make_tuple(SIGNAL, categ, proc)], 2)) << "$ & ";
-
-        for(auto &proc: mc_processes)
-          latexString << "$" << mc_yields[categ][proc].first << " \\pm " << std::sqrt(mc_yields[categ][proc].second + std::pow(process_systematics[std::make_tuple(MC, categ, proc)], 2)) << "$ & ";
-        if( mc_processes.size() )
-          latexString << "$" << mc_total[categ] << " \\pm " << std::sqrt(mc_total_sqerrs[categ] + total_systematics_squared[categ][MC]) << "$ & ";
-
-        if( has_data ) {
-          static const double alpha = 1. - 0.682689492;
-          uint64_t yield = data_yields[cat_pair.second];
-          double error_low = yield - ROOT::Math::gamma_quantile(alpha / 2., yield, 1.);
-          double error_high = ROOT::Math::gamma_quantile_c(alpha / 2., yield, 1.) - yield;
-          latexString << format_number_with_errors(yield, error_low, error_high, 0, m_config.yields_table_num_prec_yields) << " & ";
-        }
-
-        if( has_data && mc_processes.size() ){
-          uint64_t data_yield = data_yields[categ];
-          double ratio = data_yield / mc_total[categ];
-
-          static const double alpha = 1. - 0.682689492;
-          double error_data_low = data_yield - ROOT::Math::gamma_quantile(alpha / 2., data_yield, 1.);
-          double error_data_high = ROOT::Math::gamma_quantile_c(alpha / 2., data_yield, 1.) - data_yield;
+    return true;
+  }
 
-          double error_mc = std::sqrt(mc_total_sqerrs[categ] + total_systematics_squared[categ][MC]);
+  void plotIt::plotAll(const std::string& filter) {
 
-          double error_low = ratio * std::sqrt(std::pow(error_data_low / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
-          double error_high = ratio * std::sqrt(std::pow(error_data_high / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
+    // Custom colors are runtime objects: they are gone if this configuration was rendered before
+    for (const CustomColor& color: m_custom_colors) {
+      if (! restoreColor(color))
+        std::cout << "Warning: color index " << color.index << " of '" << color.name << "' is already used by another color" << std::endl;
+    }
 
-          latexString << format_number_with_errors(ratio, error_low, error_high, m_config.yields_table_num_prec_ratio, m_config.yields_table_num_prec_ratio) << " & ";
+    matchSystematics();
+    buildFileIndex();
+
+    // Input files, and the files of their shape variations, are copied locally in the order they are read.
+    // Trees are read through chains, from the original files.
+    if (StagingArea::get().enabled() && m_config.mode != "tree") {
+      std::vector<std::string> inputs;
+      // Only read if the variations are not in the nominal file
+      std::set<std::string> friends;
+      for (const File& file: m_files) {
+        inputs.push_back(file.path);
+        for (size_t syst: file.applicable_systematics) {
+          for (const std::string& path: m_systematics[syst]->friendFiles(file)) {
+            inputs.push_back(path);
+            friends.insert(path);
+          }
         }
-
-        latexString.seekp(latexString.tellp() - 2l);
-        latexString << "\\\\\n";
       }
 
-      latexString << tab << tab << "\\hline\n\\end{tabular}\n";
-
-    } else if (m_config.yields_table_align.find("v") != std::string::npos) {
-
-        // Tabular header
-        latexString << R"(\begin{tabular}{@{}l)";
-        std::string header = " & ";
-        for (size_t i = 0; i < categories.size(); i++) {
-            latexString << "r";
-            header += categories[i].second;
-            if (i != (categories.size() - 1))
-                header += " & ";
-        }
-        latexString << R"(@{}} \toprule)" << std::endl;
-        latexString << header << R"(\\)" << std::endl;
-
-        latexString << std::setprecision(m_config.yields_table_num_prec_yields);
-
-        // Start with signals
-        if (!signal_processes.empty()) {
-            latexString << "Signal sample" << ((signal_processes.size() == 1) ? "" : "s") << R"( & \\ \midrule)" << std::endl;
-
-            // Loop
-            for (const auto& p: signal_processes) {
-
-                latexString << p << " & ";
-
-                for (const auto& c: categories) {
-                    std::string categ = c.second;
-
-                    latexString << "$" << signal_yields[categ][p].first << R"( {\scriptstyle\ \pm\ )" << std::sqrt(signal_yields[categ][p].second + std::pow(process_systematics[std::make_tuple(SIGNAL, categ, p)], 2)) << "}$ & ";
-                }
-
-                latexString.seekp(latexString.tellp() - 2l);
-                latexString << R"( \\ )" << std::endl;
-            }
-
-            // Space
-            if (!mc_processes.empty() || has_data)
-                latexString << R"( & \\)" << std::endl;
-        }
-
-        // Then MC samples
-        if (!mc_processes.empty()) {
-            latexString << "SM sample" << ((mc_processes.size() == 1) ? "" : "s") << R"( & \\ \midrule)" << std::endl;
-
-            // Loop
-            for (const auto& p: mc_processes) {
-
-                latexString << p << " & ";
-
-                for (const auto& c: categories) {
-                    std::string categ = c.second;
-
-                    latexString << "$" << mc_yields[categ][p].first << R"( {\scriptstyle\ \pm\ )" << std::sqrt(mc_yields[categ][p].second + std::pow(process_systematics[std::make_tuple(MC, categ, p)], 2)) << "}$ & ";
-                }
-
-                latexString.seekp(latexString.tellp() - 2l);
-                latexString << R"( \\ )" << std::endl;
-            }
-
-            // Space
-            latexString << R"( & \\)" << std::endl;
-            latexString << R"(Total {\scriptsize $\pm$ (stat.) $\pm$ (syst.)} & )";
+      StagingArea::get().prefetch(inputs, friends);
+    }
 
-            for (const auto& c: categories) {
-                latexString << "$" << mc_total[c.second] << R"({\scriptstyle\ \pm\ )" << std::sqrt(mc_total_sqerrs[c.second]) << R"(\ \pm\ )" << std::sqrt(total_systematics_squared[c.second][MC]) << "}$ & ";
-            }
+    fs::path fitCachePath = m_outputPath / "plotIt_fit_cache.txt";
+    if (CommandLineCfg::get().fit_cache)
+      m_fit_cache.load(fitCachePath);
 
-            latexString.seekp(latexString.tellp() - 2l);
-            latexString << R"( \\ )" << std::endl;
-        }
+    fs::path selectionCachePath = m_outputPath / "plotIt_selection_cache.root";
+    bool selection_cache = CommandLineCfg::get().selection_cache && m_config.mode == "tree";
+    if (selection_cache)
+      m_selection_cache.load(selectionCachePath);
 
-        // Print data
-        if (has_data) {
-            latexString << R"(\midrule)" << std::endl;
-            latexString << R"(Data {\scriptsize $\pm$ (stat.)} & )";
-            latexString << std::setprecision(0);
-
-            for (const auto& c: categories) {
-                // Compute poisson errors on the data yields
-                static const double alpha = 1. - 0.682689492;
-                int64_t yield = data_yields[c.second];
-                double error_low = yield - ROOT::Math::gamma_quantile(alpha / 2., yield, 1.);
-                double error_high = ROOT::Math::gamma_quantile_c(alpha / 2., yield, 1.) - yield;
-                latexString << format_number_with_errors(yield, error_low, error_high, 0, m_config.yields_table_num_prec_yields) << " & ";
-            }
+    // First, explode plots to match all glob patterns
 
-            latexString.seekp(latexString.tellp() - 2l);
-            latexString << R"( \\ )" << std::endl;
-        }
+    // Selected plots, applied while expanding so that only their objects are listed and loaded
+    PlotSelector selector(CommandLineCfg::get().select);
 
-        // And finally data / MC
-        if (!mc_processes.empty() && has_data) {
-            latexString << R"(\midrule)" << std::endl;
-            latexString << R"(Data / prediction & )";
-            latexString << std::setprecision(m_config.yields_table_num_prec_ratio);
+    std::vector<Plot> plots;
+    if (m_config.mode == "tree") {
+      for (const Plot& plot: m_plots) {
+        if (selector.matches(plot.name, plot->yields_title))
+          plots.push_back(plot);
+      }
+    } else {
+      ScopedTimer timer("expand");
+      if (!expandObjects(m_files[0], plots, selector)) {
+        return;
+      }
+    }
 
-            for (const auto& c: categories) {
-                std::string categ = c.second;
-                int64_t data_yield = data_yields[categ];
-                double ratio = data_yield / mc_total[categ];
+    if (! filter.empty()) {
+      plots.erase(std::remove_if(plots.begin(), plots.end(), [&filter](const Plot& plot) {
+            return fnmatch(filter.c_str(), plot.name.c_str(), 0) != 0;
+            }), plots.end());
+    }
 
-                static const double alpha = 1. - 0.682689492;
-                double error_data_low = data_yield - ROOT::Math::gamma_quantile(alpha / 2., data_yield, 1.);
-                double error_data_high = ROOT::Math::gamma_quantile_c(alpha / 2., data_yield, 1.) - data_yield;
+    for (size_t i = 0; i < plots.size(); i++)
+      plots[i].global_id = i;
 
-                double error_mc = std::sqrt(mc_total_sqerrs[categ] + total_systematics_squared[categ][MC]);
+    size_t shard_index = CommandLineCfg::get().shard_index;
+    size_t shard_count = CommandLineCfg::get().shard_count;
+    bool sharded = shard_count > 0;
+    if (sharded) {
+      std::vector<double> costs;
+      for (const Plot& plot: plots)
+        costs.push_back(estimatePlotCost(plot));
 
-                double error_low = ratio * std::sqrt(std::pow(error_data_low / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
-                double error_high = ratio * std::sqrt(std::pow(error_data_high / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
+      std::vector<size_t> shards = assignShards(costs, shard_count);
 
-                latexString << format_number_with_errors(ratio, error_low, error_high, m_config.yields_table_num_prec_ratio, m_config.yields_table_num_prec_ratio) << " & ";
-            }
+      std::vector<Plot> shard_plots;
+      for (size_t i = 0; i < plots.size(); i++) {
+        if (shards[i] == shard_index - 1)
+          shard_plots.push_back(plots[i]);
+      }
 
-            latexString.seekp(latexString.tellp() - 2l);
-            latexString << R"( \\ )" << std::endl;
-        }
+      std::cout << "Shard " << shard_index << "/" << shard_count << ": rendering " << shard_plots.size() << " out of " << plots.size() << " plots" << std::endl;
 
-        latexString << R"(\bottomrule)" << std::endl;
-        latexString << R"(\end{tabular})" << std::endl;
-    } else {
-      std::cerr << "Error: yields table alignment " << m_config.yields_table_align << " is not recognized (for now, only \"h\" and \"v\" are supported)" << std::endl;
-      return false;
+      plots.swap(shard_plots);
     }
 
-    if(CommandLineCfg::get().verbose)
-      std::cout << "LaTeX yields table:\n\n" << latexString.str() << std::endl;
-
-    fs::path outputName(m_outputPath);
-    outputName /= "yields.tex";
-
-    std::ofstream out(outputName.string());
-    out << latexString.str();
-    out.close();
-
-    return true;
-  }
+    // Only one multi-page PDF can be written at a time, plots are rendered folder by folder
+    if (CommandLineCfg::get().multipage_pdf) {
+      std::stable_sort(plots.begin(), plots.end(), [](const Plot& a, const Plot& b) {
+          return fs::path(a.name).parent_path() < fs::path(b.name).parent_path();
+          });
+    }
 
-  void plotIt::plotAll() {
+    for (size_t i = 0; i < plots.size(); i++)
+      plots[i].id = i;
 
-    m_style.reset(createStyle(m_config));
+    m_yields = YieldsTable();
+    m_saved_reads = 0;
 
-    // First, explode plots to match all glob patterns
+    std::string book_keeping_file_name = m_config.book_keeping_file_name;
+    if (sharded && !book_keeping_file_name.empty())
+      book_keeping_file_name = shardFileName(book_keeping_file_name, shard_index, shard_count);
 
-    std::vector<Plot> plots;
-    if (m_config.mode == "tree") {
-      plots = m_plots;
-    } else {
-      if (!expandObjects(m_files[0], plots)) {
-        return;
-      }
+    if (!book_keeping_file_name.empty()) {
+      fs::path outputName = m_outputPath / book_keeping_file_name;
+      m_config.book_keeping_file.reset(TFile::Open(outputName.native().c_str(), "recreate"));
     }
 
-    if (!m_config.book_keeping_file_name.empty()) {
-      fs::path outputName = m_outputPath / m_config.book_keeping_file_name;
-      m_config.book_keeping_file.reset(TFile::Open(outputName.native().c_str(), "recreate"));
+    size_t jobs = std::max<size_t>(CommandLineCfg::get().jobs, 1);
+    if (jobs > 1 && (m_config.book_keeping_file || m_keep_summaries)) {
+      std::cout << "Warning: the book-keeping file and the summaries are filled by the main process, plots are rendered sequentially" << std::endl;
+      jobs = 1;
+    }
+    if (jobs > 1 && (CommandLineCfg::get().multipage_pdf || ! CommandLineCfg::get().archive.empty()) && ! CommandLineCfg::get().preview) {
+      std::cout << "Warning: the multi-page PDFs and the archive are written by the main process, plots are rendered sequentially" << std::endl;
+      jobs = 1;
     }
 
+    // Outputs written as a whole (book-keeping file, previews gallery, multi-page PDFs, archive) need all the plots
+    bool incremental = m_incremental && book_keeping_file_name.empty() && ! CommandLineCfg::get().preview &&
+        ! CommandLineCfg::get().multipage_pdf && CommandLineCfg::get().archive.empty();
+
     constexpr std::size_t plots_per_chunk = 100;
 
     auto plots_begin = plots.begin();
@@ -1574,40 +1155,156 @@ namespace plotIt {
       if (CommandLineCfg::get().verbose)
           std::cout << "Loading plots " << std::distance(plots.begin(), plots_begin) << "-" << std::distance(plots.begin(), plots_end) << " of " << plots.size() << "..." << std::endl;
 
-      for (File& file: m_files) {
-        if (! loadAllObjects(file, plots_begin, plots_end))
-            return;
+      {
+        ScopedTimer timer("load");
+        if (! loadAllFiles(plots_begin, plots_end))
+          return;
       }
 
       if (CommandLineCfg::get().verbose)
           std::cout << "done." << std::endl;
 
-      if (CommandLineCfg::get().do_plots) {
-        for ( auto it = plots_begin; it != plots_end; ++it ) {
-          plotIt::plot(*it);
-        }
-      }
-
+      // Before the rendering, which rescales, rebins and normalizes the histograms
       if (CommandLineCfg::get().do_yields) {
+        ScopedTimer timer("yields");
         plotIt::yields(plots_begin, plots_end);
       }
+
+      if (CommandLineCfg::get().do_plots) {
+        ScopedTimer timer("plot");
+        if (incremental) {
+          // Changed plots first, rendered in place; hashed while the objects are still as loaded
+          auto changed_end = std::stable_partition(plots_begin, plots_end, [this](const Plot& plot) { return hasChanged(plot); });
+          renderPlots(plots_begin, changed_end, jobs);
+        } else {
+          renderPlots(plots_begin, plots_end, jobs);
+        }
+      }
     }
 
+    if (CommandLineCfg::get().do_plots)
+      finishRendering();
+
+    m_input_files.clear();
     for (File& file: m_files) {
+      if (! InputCache::isMemoryPath(file.path))
+        m_input_files.insert(file.path);
+      for (const auto& friend_handle: file.friend_handles)
+        m_input_files.insert(friend_handle.first);
+
       file.handle.reset();
       file.friend_handles.clear();
     }
 
+    if (m_saved_reads > 0) {
+      PhaseTimings::get().count("object-reads-saved", m_saved_reads.load());
+      if (CommandLineCfg::get().verbose)
+        std::cout << m_saved_reads.load() << " objects shared between plots instead of being read again" << std::endl;
+    }
+
     if (m_config.book_keeping_file) {
       m_config.book_keeping_file->Close();
       m_config.book_keeping_file.reset();
     }
+
+    if (sharded) {
+      // Yields and book-keeping are merged with the other shards by `plotIt merge`
+      ShardManifest manifest;
+      manifest.index = shard_index;
+      manifest.count = shard_count;
+      manifest.plots = plots.size();
+      if (!book_keeping_file_name.empty()) {
+        manifest.book_keeping_file = m_config.book_keeping_file_name;
+        manifest.book_keeping_shard_file = book_keeping_file_name;
+      }
+      manifest.has_yields = CommandLineCfg::get().do_yields;
+      manifest.yields = m_yields;
+      manifest.config = m_config;
+
+      fs::path manifestPath = m_outputPath / shardManifestName(shard_index, shard_count);
+      if (! manifest.save(manifestPath))
+        std::cout << "Error: cannot write shard manifest " << manifestPath << std::endl;
+    } else if (CommandLineCfg::get().do_yields) {
+      std::cout << "Producing LaTeX yield table.\n";
+      writeYieldsTable(m_yields, m_config, m_outputPath / "yields.tex");
+    }
+
+    if (CommandLineCfg::get().fit_cache && !m_fit_cache.save(fitCachePath))
+      std::cout << "Warning: cannot write fit cache " << fitCachePath << std::endl;
+
+    if (selection_cache && !m_selection_cache.save(selectionCachePath))
+      std::cout << "Warning: cannot write selection cache " << selectionCachePath << std::endl;
+  }
+
+  bool plotIt::loadAllFiles(std::vector<Plot>::const_iterator plots_begin, std::vector<Plot>::const_iterator plots_end) {
+    size_t threads = std::min(CommandLineCfg::get().io_threads, m_files.size());
+
+    // Histograms are filled from the trees through gROOT, one file at a time
+    if (threads <= 1 || m_config.mode == "tree") {
+      for (File& file: m_files) {
+        if (! loadAllObjects(file, plots_begin, plots_end))
+          return false;
+      }
+
+      return true;
+    }
+
+    // Files with the same path share their handle, so they are loaded by the same thread
+    std::vector<std::vector<size_t>> groups;
+    std::unordered_map<std::string, size_t> group_of_path;
+    for (size_t i = 0; i < m_files.size(); i++) {
+      auto it = group_of_path.emplace(m_files[i].path, groups.size());
+      if (it.second)
+        groups.emplace_back();
+      groups[it.first->second].push_back(i);
+    }
+
+    threads = std::min(threads, groups.size());
+
+    // Each file is only touched by the thread loading it; messages are kept
+    // to be printed in order once all the files are loaded
+    std::vector<std::unique_ptr<std::ostringstream>> logs(m_files.size());
+    std::vector<char> loaded(m_files.size(), false);
+    std::atomic<size_t> next_group{0};
+
+    auto work = [&]() {
+      InputCache::ThreadHandles handles;
+
+      for (size_t group = next_group++; group < groups.size(); group = next_group++) {
+        for (size_t i: groups[group]) {
+          logs[i].reset(new std::ostringstream());
+          loaded[i] = loadAllObjects(m_files[i], plots_begin, plots_end, *logs[i]);
+        }
+      }
+    };
+
+    std::vector<std::thread> pool;
+    for (size_t i = 0; i < threads; i++)
+      pool.emplace_back(work);
+
+    for (auto& thread: pool)
+      thread.join();
+
+    bool success = true;
+    for (size_t i = 0; i < m_files.size(); i++) {
+      std::cout << logs[i]->str();
+      success &= (bool) loaded[i];
+    }
+
+    return success;
   }
 
-  bool plotIt::loadAllObjects(File& file, std::vector<Plot>::const_iterator plots_begin, std::vector<Plot>::const_iterator plots_end) {
+  bool plotIt::loadAllObjects(File& file, std::vector<Plot>::const_iterator plots_begin, std::vector<Plot>::const_iterator plots_end, std::ostream& log) {
 
     file.object = nullptr;
-    file.objects.clear();
+
+    // One slot per plot of the chunk; the vectors keep their storage from one chunk to the next
+    file.objects_offset = plots_begin->id;
+    file.objects.assign(std::distance(plots_begin, plots_end), nullptr);
+    file.shared_objects.assign(file.objects.size(), false);
+    file.systematics_cache.resize(file.objects.size());
+    for (auto& systematics: file.systematics_cache)
+      systematics.clear();
 
     if (m_config.mode == "tree") {
 
@@ -1619,16 +1316,28 @@ namespace plotIt {
         for ( auto it = plots_begin; it != plots_end; ++it ) {
           const auto& plot = *it;
 
-          auto x_axis_range = plot.log_x ? plot.log_x_axis_range : plot.x_axis_range;
+          auto x_axis_range = plot.log_x ? plot->log_x_axis_range : plot->x_axis_range;
 
-          std::shared_ptr<TH1> hist(new TH1F((plot.uid + std::to_string(file.id)).c_str(), "", plot.binning_x, x_axis_range.start, x_axis_range.end));
+          std::string hist_name = "plotit_h_" + std::to_string(plot.id) + "_" + std::to_string(file.id);
+          std::shared_ptr<TH1> hist(new TH1F(hist_name.c_str(), "", plot->binning_x, x_axis_range.start, x_axis_range.end));
           hist->SetDirectory(gROOT);
 
-          file.chain->Draw((plot.draw_string + ">>" + plot.uid + std::to_string(file.id)).c_str(), plot.selection_string.c_str());
+          // Only the entries passing the selection are read; it is still evaluated on them, for the weights
+          TEntryList* entries = nullptr;
+          if (CommandLineCfg::get().selection_cache && !plot->selection_string.empty())
+            entries = m_selection_cache.get(*file.chain, file.path, plot->selection_string);
+
+          if (entries)
+            file.chain->SetEntryList(entries);
+
+          file.chain->Draw((plot->draw_string + ">>" + hist_name).c_str(), plot->selection_string.c_str());
+
+          if (entries)
+            file.chain->SetEntryList(nullptr);
 
           hist->SetDirectory(nullptr);
           
-          file.objects.emplace(plot.uid, hist.get());
+          file.objects[plot.id - file.objects_offset] = hist.get();
 
           TemporaryPool::get().addRuntime(hist);
         }
@@ -1637,39 +1346,65 @@ namespace plotIt {
     }
 
     if (! file.handle)
-      file.handle.reset(TFile::Open(file.path.c_str()));
+      file.handle = InputCache::get().open(file.path);
     if (! file.handle)
       return false;
 
-    file.systematics_cache.clear();
+
+    // Name of each object read from the file -> slot it was loaded in
+    std::unordered_map<std::string, size_t> loaded;
 
     for ( auto it = plots_begin; it != plots_end; ++it ) {
       const auto& plot = *it;
+      size_t index = plot.id - file.objects_offset;
 
       std::string plot_name = plot.name;
 
       // Rename plot name according to user's transformations
       plot_name = applyRenaming(file.renaming_ops, plot_name);
 
-      TObject* obj = file.handle->Get(plot_name.c_str());
+      // Plots pointing to an object already loaded (same name, different
+      // styles or suffix) share it; each one gets its own copy only when
+      // used, see loadObject
+      auto shared = loaded.find(plot_name);
+      if (shared != loaded.end()) {
+        size_t source = shared->second;
+        const Plot& source_plot = *(plots_begin + source);
+
+        file.objects[index] = file.objects[source];
+        file.shared_objects[index] = true;
+        file.shared_objects[source] = true;
+
+        // Shape variations are looked up from the plot name, which can differ from the renamed one
+        if (source_plot.name == plot.name) {
+          file.systematics_cache[index] = file.systematics_cache[source];
+        } else if (file.type != DATA) {
+          for (size_t syst: file.applicable_systematics)
+              file.systematics_cache[index].push_back(m_systematics[syst]->newSet(file.objects[source], file, plot));
+        }
+
+        m_saved_reads++;
+        continue;
+      }
+
+      TObject* obj = InputCache::get().getObject(*file.handle, plot_name);
 
       if (obj) {
         std::shared_ptr<TObject> cloned_obj(obj->Clone());
         TemporaryPool::get().addRuntime(cloned_obj);
 
-        file.objects.emplace(plot.uid, cloned_obj.get());
+        file.objects[index] = cloned_obj.get();
+        loaded[plot_name] = index;
 
         if (file.type != DATA) {
-          for (auto& syst: m_systematics) {
-              if (std::regex_search(file.path, syst->on))
-                  file.systematics_cache[plot.uid].push_back(syst->newSet(cloned_obj.get(), file, plot));
-          }
+          for (size_t syst: file.applicable_systematics)
+              file.systematics_cache[index].push_back(m_systematics[syst]->newSet(cloned_obj.get(), file, plot));
         }
 
         continue;
       }
 
-      std::cout << "Error: object '" << plot_name << "' inheriting from '" << plot.inherits_from << "' not found in file '" << file.path << "'" << std::endl;
+      log << "Error: object '" << plot_name << "' inheriting from '" << plot->inherits_from << "' not found in file '" << file.path << "'" << std::endl;
       return false;
     }
 
@@ -1680,25 +1415,141 @@ namespace plotIt {
 
     file.object = nullptr;
 
-    auto it = file.objects.find(plot.uid);
+    size_t index = plot.id - file.objects_offset;
 
-    if (it == file.objects.end()) {
+    if (plot.id < file.objects_offset || index >= file.objects.size() || !file.objects[index]) {
       auto exception = std::runtime_error("Object not found in cache. It should be here since it was preloaded before. Object name: " + plot.name + " in " + file.path);
       std::cerr << exception.what() << std::endl;
       throw exception;
     }
 
-    file.object = it->second;
+    if (file.shared_objects[index]) {
+      // The object loaded once for several plots is left untouched, each plot works on its own copy
+      std::shared_ptr<TObject> copy(file.objects[index]->Clone());
+      TemporaryPool::get().addRuntime(copy);
+
+      file.objects[index] = copy.get();
+      file.shared_objects[index] = false;
+    }
+
+    file.object = file.objects[index];
+
+    file.systematics = & file.systematics_cache[index];
+
+    return true;
+  }
+
+  void plotIt::matchSystematics() {
+    for (File& file: m_files) {
+      file.applicable_systematics.clear();
+      if (file.type == DATA)
+        continue;
+
+      for (size_t i = 0; i < m_systematics.size(); i++) {
+        if (std::regex_search(file.path, m_systematics[i]->on))
+          file.applicable_systematics.push_back(i);
+      }
+    }
+
+    if (CommandLineCfg::get().verbose && ! m_systematics.empty()) {
+      std::cout << "Systematics applying to each file:" << std::endl;
+      for (const File& file: m_files) {
+        std::cout << "  " << file.path << ":";
+        if (file.applicable_systematics.empty())
+          std::cout << " none";
+        for (size_t syst: file.applicable_systematics)
+          std::cout << " " << m_systematics[syst]->name;
+        std::cout << std::endl;
+      }
+    }
+  }
+
+  void plotIt::buildFileIndex() {
+    m_file_index = FileIndex();
+
+    for (const File& file: m_files) {
+      m_file_index.all.push_back(file);
+      m_file_index.by_type[file.type].push_back(file);
+
+      if (file.type == MC)
+        m_file_index.mc_by_stack[file.stack_index].push_back(file);
+    }
+
+    // Signal files contribute to the systematics of every stack
+    for (auto& it: m_file_index.mc_by_stack) {
+      file_list& files = m_file_index.mc_and_signal_by_stack[it.first];
+      for (const File& file: m_files) {
+        if ((file.type == SIGNAL) || ((file.type == MC) && (file.stack_index == it.first)))
+          files.push_back(file);
+      }
+    }
+
+    if (CommandLineCfg::get().verbose) {
+      std::cout << "File index: " << m_files.size() << " files, " << m_file_index.mc_by_stack.size() << " MC stacks" << std::endl;
+    }
+  }
+
+  std::vector<TH1*> plotIt::getLoadedHistograms(const Plot& plot) {
+    std::vector<TH1*> histograms;
+
+    for (File& file: m_files) {
+      size_t index = plot.id - file.objects_offset;
+      if (plot.id < file.objects_offset || index >= file.objects.size())
+        continue;
+
+      if (TH1* h = dynamic_cast<TH1*>(file.objects[index]))
+        histograms.push_back(h);
+
+      for (const SystematicSet& set: file.systematics_cache[index]) {
+        for (TObject* shape: {set.true_nominal_shape.get(), set.true_up_shape.get(), set.true_down_shape.get()}) {
+          if (TH1* h = dynamic_cast<TH1*>(shape))
+            histograms.push_back(h);
+        }
+      }
+    }
+
+    return histograms;
+  }
+
+  bool plotIt::hasChanged(const Plot& plot) {
+    Hasher hasher;
+    for (TH1* h: getLoadedHistograms(plot))
+      hasher.update(*h);
 
-    file.systematics = & file.systematics_cache[plot.uid];
+    std::string key = plot.name + plot.output_suffix;
+    auto rendered = m_rendered_inputs.find(key);
+    if (rendered != m_rendered_inputs.end() && rendered->second == hasher.digest()) {
+      PhaseTimings::get().count("plots-unchanged");
+      return false;
+    }
+
+    m_rendered_inputs[key] = hasher.digest();
 
     return true;
   }
 
+  void plotIt::reloadFiles(const std::set<std::string>& paths) {
+    for (File& file: m_files) {
+      // Trees are read through a chain kept from one call to the next
+      if (paths.count(file.path))
+        file.chain.reset();
+    }
+  }
+
   bool plotIt::expandFiles() {
     std::vector<File> files;
 
     for (File& file: m_files) {
+      if (InputCache::isMemoryPath(file.path)) {
+        if (! InputCache::get().hasFile(file.path)) {
+          std::cerr << "Error: in-memory file '" << file.path << "' does not exist" << std::endl;
+          return false;
+        }
+
+        files.push_back(file);
+        continue;
+      }
+
       std::vector<std::string> matchedFiles = glob(file.path);
       if (matchedFiles.empty()) {
           std::cerr << "Error: no files matching '" << file.path << "' (either the file does not exist, or the expression does not match any file)" << std::endl;
@@ -1742,7 +1593,7 @@ namespace plotIt {
     return labels;
   }
 
-  void get_directory_content(TDirectory* root, const std::string& prefix, std::vector<std::string>& content) {
+  void get_directory_content(TDirectory* root, const std::string& prefix, std::vector<std::string>& content, const PlotSelector& selector) {
       TIter it(root->GetListOfKeys());
       TKey* key = nullptr;
 
@@ -1755,7 +1606,12 @@ namespace plotIt {
               if (!prefix.empty())
                   new_prefix += "/";
               new_prefix += name;
-              get_directory_content(static_cast<TDirectory*>(key->ReadObj()), new_prefix, content);
+
+              // Folders without any selected plot are not read at all
+              if (! selector.mayMatchFolder(new_prefix))
+                  continue;
+
+              get_directory_content(static_cast<TDirectory*>(key->ReadObj()), new_prefix, content, selector);
           } else if (cl.find("TH") != std::string::npos) {
               if (name.find("__") != std::string::npos) {
                   // TODO: Maybe we should be a bit less strict and check that the
@@ -1774,7 +1630,7 @@ namespace plotIt {
   /**
    * Open 'file', and expand all plots
    */
-  bool plotIt::expandObjects(File& file, std::vector<Plot>& plots) {
+  bool plotIt::expandObjects(File& file, std::vector<Plot>& plots, const PlotSelector& selector) {
     file.object = nullptr;
     plots.clear();
 
@@ -1782,26 +1638,40 @@ namespace plotIt {
     // If not, do not iterate of the file to match pattern, it's useless
     std::vector<Plot> glob_plots;
     for (Plot& plot: m_plots) {
+        if (! selector.matchesCategory(plot->yields_title))
+            continue;
+
         if ((plot.name.find("*") != std::string::npos) || (plot.name.find("?") != std::string::npos) || (plot.name.find("[") != std::string::npos)) {
             glob_plots.push_back(plot);
-        } else {
+        } else if (selector.matches(plot.name, plot->yields_title)) {
             plots.push_back(plot.Clone(plot.name));
         }
     }
 
     if (glob_plots.empty()) {
+        if (plots.empty() && ! selector.empty()) {
+          std::cout << "Error: no plot selected" << std::endl;
+          return false;
+        }
+
         return true;
     }
 
-    std::shared_ptr<TFile> input(TFile::Open(file.path.c_str()));
-    if (! input.get())
-      return false;
-
     // Create file structure, flattening any directory
-    TIter root_keys(input->GetListOfKeys());
-
     std::vector<std::string> file_content;
-    get_directory_content(input.get(), "", file_content);
+    if (const auto* cached_content = InputCache::get().getContent(file.path)) {
+      file_content = *cached_content;
+    } else {
+      std::shared_ptr<TFile> input = InputCache::get().open(file.path);
+      if (! input.get())
+        return false;
+
+      get_directory_content(input.get(), "", file_content, selector);
+
+      // Only complete listings are shared with other configurations
+      if (selector.empty())
+        InputCache::get().setContent(file.path, file_content);
+    }
 
     for (Plot& plot: glob_plots) {
         bool match = false;
@@ -1813,7 +1683,7 @@ namespace plotIt {
             if (fnmatch(plot.name.c_str(), content.c_str(), FNM_CASEFOLD) == 0) {
 
                 // Check if this name is excluded
-                if ((plot.exclude.length() > 0) && (fnmatch(plot.exclude.c_str(), content.c_str(), FNM_CASEFOLD) == 0)) {
+                if ((plot->exclude.length() > 0) && (fnmatch(plot->exclude.c_str(), content.c_str(), FNM_CASEFOLD) == 0)) {
                     continue;
                 }
 
@@ -1827,17 +1697,24 @@ namespace plotIt {
                 // Got it!
                 match = true;
                 matched.push_back(content);
+
+                if (! selector.matches(content, plot->yields_title))
+                    continue;
+
                 plots.push_back(plot.Clone(content));
             }
         }
 
         if (! match) {
-            std::cout << "Warning: object '" << plot.name << "' inheriting from '" << plot.inherits_from << "' does not match something in file '" << file.path << "'" << std::endl;
+            std::cout << "Warning: object '" << plot.name << "' inheriting from '" << plot->inherits_from << "' does not match something in file '" << file.path << "'" << std::endl;
         }
     }
 
     if (!plots.size()) {
-      std::cout << "Error: no plots found in file '" << file.path << "'" << std::endl;
+      if (selector.empty())
+        std::cout << "Error: no plots found in file '" << file.path << "'" << std::endl;
+      else
+        std::cout << "Error: no plot selected" << std::endl;
       return false;
     }
 
@@ -1852,73 +1729,3 @@ namespace plotIt {
     }
   }
 }
-
-int main(int argc, char** argv) {
-
-  try {
-
-    TCLAP::CmdLine cmd("Plot histograms", ' ', "0.1");
-
-    TCLAP::ValueArg<std::string> histogramsFolderArg("i", "histograms-folder", "histograms base folder (default: current directory)", false, "./", "string", cmd);
-
-    TCLAP::ValueArg<std::string> outputFolderArg("o", "output-folder", "output folder", true, "", "string", cmd);
-
-    TCLAP::ValueArg<std::string> eraArg("e", "era", "era to restrict to", false, "", "string", cmd);
-
-    TCLAP::SwitchArg ignoreScaleArg("", "ignore-scales", "Ignore any scales present in the configuration file", cmd, false);
-
-    TCLAP::SwitchArg verboseArg("v", "verbose", "Verbose output (print summary)", cmd, false);
-
-    TCLAP::SwitchArg yieldsArg("y", "yields", "Produce LaTeX table of yields", cmd, false);
-
-    TCLAP::SwitchArg plotsArg("p", "plots", "Do not produce the plots - can be useful if only the yields table is needed", cmd, false);
-
-    TCLAP::SwitchArg unblindArg("u", "unblind", "Unblind the plots, ie ignore any blinded-range in the configuration", cmd, false);
-
-    TCLAP::SwitchArg systematicsBreakdownArg("b", "systs-breadown", "Print systematics details for each MC process separately in addition to the total contribution", cmd, false);
-
-    TCLAP::UnlabeledValueArg<std::string> configFileArg("configFile", "configuration file", true, "", "string", cmd);
-
-    cmd.parse(argc, argv);
-
-    //bool isData = dataArg.isSet();
-
-    fs::path histogramsPath(fs::canonical(histogramsFolderArg.getValue()));
-
-    if (! fs::exists(histogramsPath)) {
-      std::cout << "Error: histograms path " << histogramsPath << " does not exist" << std::endl;
-    }
-
-    fs::path outputPath(outputFolderArg.getValue());
-
-    if (! fs::exists(outputPath)) {
-      std::cout << "Error: output path " << outputPath << " does not exist" << std::endl;
-      return 1;
-    }
-
-    if( plotsArg.getValue() && !yieldsArg.getValue() ) {
-      std::cerr << "Error: we have nothing to do" << std::endl;
-      return 1;
-    }
-
-    CommandLineCfg::get().era = eraArg.getValue();
-    CommandLineCfg::get().ignore_scales = ignoreScaleArg.getValue();
-    CommandLineCfg::get().verbose = verboseArg.getValue();
-    CommandLineCfg::get().do_plots = !plotsArg.getValue();
-    CommandLineCfg::get().do_yields = yieldsArg.getValue();
-    CommandLineCfg::get().unblind = unblindArg.getValue();
-    CommandLineCfg::get().systematicsBreakdown = systematicsBreakdownArg.getValue();
-
-    plotIt::plotIt p(outputPath);
-    if (!p.parseConfigurationFile(configFileArg.getValue(), histogramsPath))
-        return 1;
-
-    p.plotAll();
-
-  } catch (TCLAP::ArgException &e) {
-    std::cerr << "error: " << e.error() << " for arg " << e.argId() << std::endl;
-    return 1;
-  }
-
-  return 0;
-}
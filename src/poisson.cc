@@ -0,0 +1,76 @@
+#include <poisson.h>
+
+#include <TH1.h>
+
+#include <Math/QuantFuncMathCore.h>
+
+namespace plotIt {
+
+    PoissonIntervals::Bounds PoissonIntervals::compute(int64_t count, ErrorsType type) {
+        // Same confidence levels as TH1
+        double alpha = (type == Poisson2) ? 0.05 : 1. - 0.682689492;
+
+        Bounds bounds;
+        bounds.lower = (count == 0) ? 0. : ROOT::Math::gamma_quantile(alpha / 2, count, 1.);
+        bounds.upper = ROOT::Math::gamma_quantile_c(alpha / 2, count + 1, 1.);
+
+        return bounds;
+    }
+
+    const PoissonIntervals::Bounds& PoissonIntervals::bounds(int64_t count, ErrorsType type) {
+        if (count >= static_cast<int64_t>(CACHED_COUNTS)) {
+            m_uncached = compute(count, type);
+            return m_uncached;
+        }
+
+        size_t index = (type == Poisson2) ? 1 : 0;
+        std::vector<Bounds>& bounds = m_bounds[index];
+        std::vector<bool>& known = m_known[index];
+        if (bounds.empty()) {
+            bounds.resize(CACHED_COUNTS);
+            known.resize(CACHED_COUNTS, false);
+        }
+
+        if (! known[count]) {
+            bounds[count] = compute(count, type);
+            known[count] = true;
+        }
+
+        return bounds[count];
+    }
+
+    BinErrors PoissonIntervals::errors(const TH1& h) {
+        BinErrors errors;
+
+        size_t n_cells = h.GetNbinsX() + 2;
+        errors.low.resize(n_cells);
+        errors.up.resize(n_cells);
+
+        ErrorsType type = static_cast<ErrorsType>(h.GetBinErrorOption());
+
+        // Like TH1, weighted histograms always get symmetric errors
+        if (type != Normal && h.GetSumw2N()) {
+            double stats[13] = {0};
+            h.GetStats(stats);
+            if (stats[0] != stats[1])
+                type = Normal;
+        }
+
+        for (size_t i = 0; i < n_cells; i++) {
+            double content = h.GetBinContent(i);
+            int64_t count = static_cast<int64_t>(content);
+
+            // TH1 falls back to symmetric errors for negative contents too
+            if (type == Normal || count < 0) {
+                errors.low[i] = errors.up[i] = h.GetBinError(i);
+                continue;
+            }
+
+            const Bounds& b = bounds(count, type);
+            errors.low[i] = (count == 0) ? 0. : content - b.lower;
+            errors.up[i] = b.upper - content;
+        }
+
+        return errors;
+    }
+}
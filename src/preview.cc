@@ -0,0 +1,385 @@
+#include <preview.h>
+
+#include <zlib.h>
+
+#include <algorithm>
+#include <cmath>
+#include <fstream>
+#include <iostream>
+#include <limits>
+
+namespace plotIt {
+
+    namespace {
+        const size_t PREVIEW_WIDTH = 480;
+        const size_t PREVIEW_HEIGHT = 360;
+
+        const uint32_t BLACK = 0x000000;
+        const uint32_t WHITE = 0xffffff;
+        const uint32_t GREY = 0x808080;
+
+        void writeUInt32(std::string& out, uint32_t value) {
+            out.push_back(static_cast<char>((value >> 24) & 0xff));
+            out.push_back(static_cast<char>((value >> 16) & 0xff));
+            out.push_back(static_cast<char>((value >> 8) & 0xff));
+            out.push_back(static_cast<char>(value & 0xff));
+        }
+
+        void writeChunk(std::string& out, const char* type, const std::string& data) {
+            writeUInt32(out, data.size());
+
+            std::string chunk(type, 4);
+            chunk += data;
+            out += chunk;
+
+            uLong crc = crc32(0L, Z_NULL, 0);
+            crc = crc32(crc, reinterpret_cast<const Bytef*>(chunk.data()), chunk.size());
+            writeUInt32(out, crc);
+        }
+
+        std::string escapeHTML(const std::string& text) {
+            std::string result;
+            for (char c: text) {
+                switch (c) {
+                    case '&': result += "&amp;"; break;
+                    case '<': result += "&lt;"; break;
+                    case '>': result += "&gt;"; break;
+                    case '"': result += "&quot;"; break;
+                    default: result += c;
+                }
+            }
+
+            return result;
+        }
+
+        /**
+         * Vertical axis of a pad, from values to pixels
+         **/
+        struct YAxis {
+            int top;
+            int bottom;
+            double min;
+            double max;
+            bool log;
+
+            int operator()(double value) const {
+                double t;
+                if (log) {
+                    value = std::max(value, min);
+                    t = (std::log10(value) - std::log10(min)) / (std::log10(max) - std::log10(min));
+                } else {
+                    t = (value - min) / (max - min);
+                }
+
+                t = std::min(std::max(t, -0.01), 1.01);
+                return static_cast<int>(std::lround(bottom - t * (bottom - top)));
+            }
+        };
+
+        void drawFrame(PreviewImage& image, int left, int top, int right, int bottom) {
+            image.fill(left, top, right, top, BLACK);
+            image.fill(left, bottom, right, bottom, BLACK);
+            image.fill(left, top, left, bottom, BLACK);
+            image.fill(right, top, right, bottom, BLACK);
+        }
+
+        /**
+         * Points with vertical error bars, skipping empty bins
+         **/
+        void drawPoints(PreviewImage& image, const std::vector<int>& x, const YAxis& y, const std::vector<double>& values,
+                const std::vector<double>& errors_low, const std::vector<double>& errors_high) {
+            for (size_t i = 0; i < values.size(); i++) {
+                if (values[i] == 0)
+                    continue;
+
+                int center = (x[i] + x[i + 1]) / 2;
+                image.fill(center, y(values[i] + errors_high[i]), center, y(values[i] - errors_low[i]), BLACK);
+
+                int value = y(values[i]);
+                image.fill(center - 2, value - 2, center + 2, value + 2, BLACK);
+            }
+        }
+    }
+
+    PreviewImage::PreviewImage(size_t width, size_t height):
+        m_width(width), m_height(height), m_pixels(3 * width * height, 0xff) {
+            // Empty
+        }
+
+    void PreviewImage::fill(int x1, int y1, int x2, int y2, uint32_t color, float alpha) {
+        if (x1 > x2)
+            std::swap(x1, x2);
+        if (y1 > y2)
+            std::swap(y1, y2);
+
+        x1 = std::max(x1, 0);
+        y1 = std::max(y1, 0);
+        x2 = std::min<int>(x2, m_width - 1);
+        y2 = std::min<int>(y2, m_height - 1);
+
+        if (x1 > x2 || y1 > y2)
+            return;
+
+        uint8_t rgb[3] = {
+            static_cast<uint8_t>((color >> 16) & 0xff),
+            static_cast<uint8_t>((color >> 8) & 0xff),
+            static_cast<uint8_t>(color & 0xff)
+        };
+
+        for (int y = y1; y <= y2; y++) {
+            uint8_t* pixel = &m_pixels[3 * (y * m_width + x1)];
+            for (int x = x1; x <= x2; x++) {
+                for (size_t c = 0; c < 3; c++, pixel++)
+                    *pixel = static_cast<uint8_t>(std::lround(alpha * rgb[c] + (1 - alpha) * *pixel));
+            }
+        }
+    }
+
+    bool PreviewImage::writePNG(const fs::path& path) const {
+        // Each row starts with its filter type, 0 (none)
+        std::string raw;
+        raw.reserve(m_height * (3 * m_width + 1));
+        for (size_t y = 0; y < m_height; y++) {
+            raw.push_back(0);
+            raw.append(reinterpret_cast<const char*>(&m_pixels[3 * y * m_width]), 3 * m_width);
+        }
+
+        uLongf size = compressBound(raw.size());
+        std::string compressed(size, '\0');
+        if (compress2(reinterpret_cast<Bytef*>(&compressed[0]), &size, reinterpret_cast<const Bytef*>(raw.data()), raw.size(), Z_DEFAULT_COMPRESSION) != Z_OK)
+            return false;
+        compressed.resize(size);
+
+        std::string header;
+        writeUInt32(header, m_width);
+        writeUInt32(header, m_height);
+        // 8 bits per channel, RGB, default compression and filtering, no interlacing
+        header += std::string("\x08\x02\x00\x00\x00", 5);
+
+        std::string png("\x89PNG\r\n\x1a\n", 8);
+        writeChunk(png, "IHDR", header);
+        writeChunk(png, "IDAT", compressed);
+        writeChunk(png, "IEND", "");
+
+        std::ofstream out(path.string(), std::ios::binary);
+        if (! out.is_open())
+            return false;
+
+        out.write(png.data(), png.size());
+
+        return !!out;
+    }
+
+    void rasterizePreview(const PreviewPlot& plot, PreviewImage& image) {
+        image.fill(0, 0, image.width() - 1, image.height() - 1, WHITE);
+
+        if (plot.edges.size() < 2)
+            return;
+
+        size_t n_bins = plot.edges.size() - 1;
+
+        int left = 40;
+        int right = image.width() - 10;
+        int top = 10;
+        int bottom = image.height() - 25;
+
+        int ratio_top = 0;
+        int ratio_bottom = bottom;
+        if (plot.show_ratio) {
+            bottom = top + static_cast<int>(0.7 * (ratio_bottom - top));
+            ratio_top = bottom + 5;
+        }
+
+        std::vector<int> x(n_bins + 1);
+        double x_min = plot.edges.front();
+        double x_max = plot.edges.back();
+        for (size_t i = 0; i <= n_bins; i++)
+            x[i] = static_cast<int>(std::lround(left + (plot.edges[i] - x_min) / (x_max - x_min) * (right - left)));
+
+        // Total of the stack, in each bin
+        std::vector<double> mc(n_bins, 0);
+        for (const auto& series: plot.stack) {
+            for (size_t i = 0; i < n_bins; i++)
+                mc[i] += series.values[i];
+        }
+
+        // Vertical range
+        double minimum = std::numeric_limits<double>::max();
+        double maximum = 0;
+        auto extend = [&minimum, &maximum, &plot](double value) {
+            if (plot.log_y && value <= 0)
+                return;
+
+            minimum = std::min(minimum, value);
+            maximum = std::max(maximum, value);
+        };
+
+        for (size_t i = 0; i < n_bins; i++) {
+            if (! plot.stack.empty())
+                extend(mc[i]);
+
+            if (! plot.band_high.empty())
+                extend(plot.band_high[i]);
+
+            if (! plot.data.empty())
+                extend(plot.data[i] + plot.data_error_high[i]);
+
+            for (const auto& series: plot.signals)
+                extend(series.values[i]);
+        }
+
+        if (maximum <= 0)
+            maximum = 1;
+
+        YAxis y;
+        y.top = top;
+        y.bottom = bottom;
+        y.log = plot.log_y;
+        if (plot.log_y) {
+            y.min = (minimum < maximum) ? minimum * 0.5 : maximum * 0.01;
+            y.max = maximum * 8;
+        } else {
+            y.min = std::min(0., minimum * 1.2);
+            y.max = maximum * 1.2;
+        }
+
+        // Stack, each contribution on top of the previous ones
+        std::vector<double> base(n_bins, 0);
+        for (const auto& series: plot.stack) {
+            for (size_t i = 0; i < n_bins; i++) {
+                double high = base[i] + series.values[i];
+                if (series.values[i] > 0)
+                    image.fill(x[i], y(high), std::max(x[i], x[i + 1] - 1), y(base[i]), series.color);
+                base[i] = high;
+            }
+        }
+
+        // Uncertainty band
+        for (size_t i = 0; i < plot.band_low.size(); i++)
+            image.fill(x[i], y(plot.band_high[i]), std::max(x[i], x[i + 1] - 1), y(plot.band_low[i]), GREY, 0.4);
+
+        // Signals, as 2 pixels wide steps
+        for (const auto& series: plot.signals) {
+            for (size_t i = 0; i < n_bins; i++) {
+                int value = y(series.values[i]);
+                image.fill(x[i], value, x[i + 1], value + 1, series.color);
+
+                if (i + 1 < n_bins)
+                    image.fill(x[i + 1], value, x[i + 1] + 1, y(series.values[i + 1]), series.color);
+            }
+        }
+
+        if (! plot.data.empty())
+            drawPoints(image, x, y, plot.data, plot.data_error_low, plot.data_error_high);
+
+        drawFrame(image, left, top, right, bottom);
+
+        if (! plot.show_ratio || plot.data.empty())
+            return;
+
+        YAxis ratio_y;
+        ratio_y.top = ratio_top;
+        ratio_y.bottom = ratio_bottom;
+        ratio_y.log = false;
+        ratio_y.min = plot.ratio_range.start;
+        ratio_y.max = plot.ratio_range.end;
+
+        image.fill(left, ratio_y(1), right, ratio_y(1), GREY);
+
+        std::vector<double> ratio(n_bins, 0), ratio_low(n_bins, 0), ratio_high(n_bins, 0);
+        for (size_t i = 0; i < n_bins; i++) {
+            if (mc[i] == 0)
+                continue;
+
+            ratio[i] = plot.data[i] / mc[i];
+            ratio_low[i] = plot.data_error_low[i] / mc[i];
+            ratio_high[i] = plot.data_error_high[i] / mc[i];
+        }
+
+        drawPoints(image, x, ratio_y, ratio, ratio_low, ratio_high);
+        drawFrame(image, left, ratio_top, right, ratio_bottom);
+    }
+
+    PreviewWriter::PreviewWriter(const fs::path& output, size_t threads):
+        m_output(output) {
+
+            for (size_t i = 0; i < std::max<size_t>(threads, 1); i++)
+                m_threads.emplace_back(&PreviewWriter::work, this);
+        }
+
+    PreviewWriter::~PreviewWriter() {
+        if (! m_done)
+            finish();
+    }
+
+    void PreviewWriter::add(PreviewPlot&& plot) {
+        fs::path path = m_output / (plot.path + ".png");
+        fs::create_directories(path.parent_path());
+
+        std::unique_lock<std::mutex> lock(m_mutex);
+        m_paths.push_back(plot.path);
+        m_queue.push_back(std::move(plot));
+        m_condition.notify_one();
+    }
+
+    void PreviewWriter::work() {
+        PreviewImage image(PREVIEW_WIDTH, PREVIEW_HEIGHT);
+
+        while (true) {
+            PreviewPlot plot;
+            {
+                std::unique_lock<std::mutex> lock(m_mutex);
+                m_condition.wait(lock, [this]() { return m_done || !m_queue.empty(); });
+                if (m_queue.empty())
+                    return;
+
+                plot = std::move(m_queue.front());
+                m_queue.pop_front();
+            }
+
+            rasterizePreview(plot, image);
+            bool written = image.writePNG(m_output / (plot.path + ".png"));
+
+            if (! written) {
+                std::unique_lock<std::mutex> lock(m_mutex);
+                m_failures++;
+            }
+        }
+    }
+
+    bool PreviewWriter::finish() {
+        {
+            std::unique_lock<std::mutex> lock(m_mutex);
+            m_done = true;
+            m_condition.notify_all();
+        }
+
+        for (auto& thread: m_threads)
+            thread.join();
+        m_threads.clear();
+
+        if (m_failures > 0)
+            std::cerr << "Error: " << m_failures << " previews could not be written in " << m_output << std::endl;
+
+        fs::path index = m_output / "index.html";
+        std::ofstream out(index.string());
+        if (! out.is_open()) {
+            std::cerr << "Error: cannot write " << index << std::endl;
+            return false;
+        }
+
+        out << "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>plotIt previews</title>\n";
+        out << "<style>\nbody { font-family: sans-serif; }\nfigure { display: inline-block; margin: 4px; text-align: center; }\n"
+            << "img { width: 320px; border: 1px solid #ccc; }\nfigcaption { font-size: small; max-width: 320px; overflow-wrap: anywhere; }\n</style>\n";
+        out << "</head>\n<body>\n";
+
+        for (const auto& path: m_paths) {
+            std::string image = escapeHTML(path + ".png");
+            out << "<figure><a href=\"" << image << "\"><img src=\"" << image << "\" loading=\"lazy\"></a><figcaption>" << escapeHTML(path) << "</figcaption></figure>\n";
+        }
+
+        out << "</body>\n</html>\n";
+
+        return m_failures == 0 && !!out;
+    }
+}
@@ -0,0 +1,423 @@
+/**
+ * Rendering of the plots: everything needing the ROOT graphics libraries.
+ * Not part of plotIt-yields, see headless.cc
+ */
+
+#include "plotIt.h"
+
+#include <TCanvas.h>
+#include <TFile.h>
+#include <TGaxis.h>
+#include <TLegend.h>
+#include <TLegendEntry.h>
+
+#include <atomic>
+#include <cerrno>
+#include <cstring>
+#include <iostream>
+#include <thread>
+
+#include <sys/mman.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+#include <boost/filesystem.hpp>
+
+#include <arena.h>
+#include <bundle.h>
+#include <commandlinecfg.h>
+#include <layout.h>
+#include <plotters.h>
+#include <pool.h>
+#include <preview.h>
+#include <summary.h>
+#include <timing.h>
+#include <utilities.h>
+
+namespace fs = boost::filesystem;
+
+namespace plotIt {
+
+  void plotIt::initRendering() {
+    // The style is also made current by createStyle
+    if (! m_style)
+      m_style.reset(createStyle(m_config));
+    else
+      m_style->cd();
+
+    // Plotters are bound to the last plotIt instance which rendered something
+    createPlotters(*this);
+
+    if (CommandLineCfg::get().preview && ! m_preview) {
+      // Rasterization does not need ROOT, it is done by threads instead of worker processes
+      size_t threads = CommandLineCfg::get().jobs;
+      if (threads == 0)
+        threads = std::max(std::thread::hardware_concurrency(), 1U);
+
+      m_preview = std::make_shared<PreviewWriter>(m_outputPath / "preview", threads);
+    }
+
+    bool bundled = CommandLineCfg::get().multipage_pdf || ! CommandLineCfg::get().archive.empty();
+    if (bundled && ! CommandLineCfg::get().preview && ! m_bundle)
+      m_bundle = std::make_shared<OutputBundle>(m_outputPath, CommandLineCfg::get().multipage_pdf, CommandLineCfg::get().archive);
+  }
+
+  void plotIt::finishRendering() {
+    if (m_bundle) {
+      if (! m_bundle->finish())
+        std::cout << "Error: some plots could not be written" << std::endl;
+
+      m_bundle.reset();
+    }
+
+    if (! m_preview)
+      return;
+
+    fs::path index = m_outputPath / "preview" / "index.html";
+    if (m_preview->finish())
+      std::cout << "Previews written, see " << index << std::endl;
+
+    m_preview.reset();
+  }
+
+  void plotIt::renderPlots(std::vector<Plot>::iterator plots_begin, std::vector<Plot>::iterator plots_end, size_t jobs) {
+
+    initRendering();
+
+    if (jobs > 1 && ! m_preview && std::distance(plots_begin, plots_end) > 1) {
+      plotInWorkers(plots_begin, plots_end, jobs);
+      return;
+    }
+
+    for ( auto it = plots_begin; it != plots_end; ++it ) {
+      if (plotIt::plot(*it))
+        PhaseTimings::get().count("plots");
+    }
+  }
+
+  void plotIt::plotInWorkers(std::vector<Plot>::iterator plots_begin, std::vector<Plot>::iterator plots_end, size_t jobs) {
+
+    size_t n_plots = std::distance(plots_begin, plots_end);
+    jobs = std::min(jobs, n_plots);
+
+    // Move the loaded histograms to shared memory before forking: plotting
+    // modifies the histograms in place, so without it each worker would end up
+    // with its own copy of everything. Workers only make a private copy of the
+    // histograms of the plot being rendered.
+    HistogramArena arena;
+    {
+      std::vector<TH1*> histograms;
+      for (auto it = plots_begin; it != plots_end; ++it) {
+        std::vector<TH1*> plot_histograms = getLoadedHistograms(*it);
+        histograms.insert(histograms.end(), plot_histograms.begin(), plot_histograms.end());
+      }
+
+      if (! arena.adopt(histograms))
+        std::cout << "Warning: cannot allocate shared memory for the histograms, each render worker uses its own copy" << std::endl;
+    }
+
+    // Plots are handed out one at a time to the workers
+    struct Queue {
+      std::atomic<size_t> next;
+      std::atomic<size_t> rendered;
+    };
+
+    void* memory = mmap(nullptr, sizeof(Queue), PROT_READ | PROT_WRITE, MAP_SHARED | MAP_ANONYMOUS, -1, 0);
+    if (memory == MAP_FAILED) {
+      std::cout << "Warning: cannot allocate shared memory (" << std::strerror(errno) << "), plots are rendered sequentially" << std::endl;
+      arena.restore();
+      for (auto it = plots_begin; it != plots_end; ++it) {
+        if (plotIt::plot(*it))
+          PhaseTimings::get().count("plots");
+      }
+
+      return;
+    }
+
+    Queue* queue = new (memory) Queue();
+    queue->next = 0;
+    queue->rendered = 0;
+
+    auto render = [&]() {
+      for (size_t index = queue->next++; index < n_plots; index = queue->next++) {
+        Plot& plot = *(plots_begin + index);
+
+        std::vector<TH1*> histograms = getLoadedHistograms(plot);
+        for (TH1* h: histograms)
+          arena.materialize(h);
+
+        if (plotIt::plot(plot))
+          queue->rendered++;
+
+        for (TH1* h: histograms)
+          arena.release(h);
+      }
+    };
+
+    // Otherwise, what is still buffered would be written by every worker
+    std::cout.flush();
+    std::cerr.flush();
+    fflush(nullptr);
+
+    std::vector<pid_t> workers;
+    for (size_t i = 0; i < jobs; i++) {
+      pid_t pid = fork();
+      if (pid < 0) {
+        std::cout << "Warning: cannot start render worker (" << std::strerror(errno) << ")" << std::endl;
+        break;
+      }
+
+      if (pid == 0) {
+        int status = 0;
+        try {
+          render();
+        } catch (const std::exception& e) {
+          std::cerr << "Error: " << e.what() << std::endl;
+          status = 1;
+        }
+
+        std::cout.flush();
+        std::cerr.flush();
+        fflush(nullptr);
+
+        // Files, caches and atexit handlers belong to the main process
+        _exit(status);
+      }
+
+      workers.push_back(pid);
+    }
+
+    if (workers.empty())
+      render();
+
+    for (pid_t pid: workers) {
+      int status = 0;
+      if (waitpid(pid, &status, 0) < 0 || !WIFEXITED(status) || WEXITSTATUS(status) != 0)
+        std::cout << "Error: render worker " << pid << " failed, some plots may be missing" << std::endl;
+    }
+
+    PhaseTimings::get().count("plots", queue->rendered);
+    PhaseTimings::get().count("render-workers", workers.size());
+    PhaseTimings::get().count("arena-bytes", arena.size());
+
+    queue->~Queue();
+    munmap(memory, sizeof(Queue));
+
+    // The histograms are restored, as loaded, when the arena goes out of scope
+  }
+
+  void plotIt::fillLegend(TLegend& legend, const Plot& plot, bool with_uncertainties) {
+      std::vector<LegendEntry> legend_entries[plot->legend_columns];
+
+      auto getLegendEntryFromFile = [&](const File& file, LegendEntry& entry) {
+          if (file.legend_group.length() > 0 && m_legend_groups.count(file.legend_group) && m_legend_groups[file.legend_group].plot_style->legend.length() > 0) {
+              if (m_legend_groups[file.legend_group].added)
+                  return false;
+              m_legend_groups[file.legend_group].added = true;
+
+              const auto& plot_style = m_legend_groups[file.legend_group].plot_style;
+              entry = {file.object, plot_style->legend, plot_style->legend_style, plot_style->legend_order};
+          } else if (file.plot_style.get() && file.plot_style->legend.length() > 0) {
+              entry = {file.object, file.plot_style->legend, file.plot_style->legend_style, file.plot_style->legend_order};
+          } else {
+            return false;
+          }
+
+          return true;
+      };
+
+      auto getEntries = [&](Type type) {
+          std::vector<LegendEntry> entries;
+          for (const File& file: getFiles(type)) {
+              LegendEntry entry;
+              if (getLegendEntryFromFile(file, entry)) {
+                  entries.push_back(entry);
+              }
+          }
+
+          for (const auto& entry: m_config.static_legend_entries[type]) {
+            entries.push_back(entry);
+          }
+
+          std::sort(entries.begin(), entries.end(), [](const LegendEntry& a, const LegendEntry& b) { return a.order > b.order; });
+
+          return entries;
+      };
+
+      // First, add data, always on first column
+      if (!plot->no_data) {
+          std::vector<LegendEntry> entries = getEntries(DATA);
+          for (const auto& entry: entries)
+              legend_entries[0].push_back(entry);
+      }
+
+      // Then MC, spanning on the remaining columns
+      size_t index = 0;
+      std::vector<LegendEntry> entries = getEntries(MC);
+      for (const LegendEntry& entry: entries) {
+          size_t column_index = (plot->legend_columns == 1) ? 0 : ((index % (plot->legend_columns - 1)) + 1);
+          legend_entries[column_index].push_back(entry);
+          index++;
+      }
+
+      // Signal, also on the first column
+      entries = getEntries(SIGNAL);
+      for (const LegendEntry& entry: entries) {
+          legend_entries[0].push_back(entry);
+      }
+
+      // Finally, if requested, the uncertainties entry
+      if (with_uncertainties)
+          legend_entries[0].push_back({m_config.uncertainty_label, "f", m_config.error_fill_style, m_config.error_fill_color, 0});
+
+      // Ensure all columns have the same size
+      size_t max_size = 0;
+      for (size_t i = 0; i < plot->legend_columns; i++) {
+          max_size = std::max(max_size, legend_entries[i].size());
+      }
+
+      for (size_t i = 0; i < plot->legend_columns; i++) {
+          legend_entries[i].resize(max_size, LegendEntry());
+      }
+
+      // Add entries to the legend
+      for (size_t i = 0; i < (plot->legend_columns * max_size); i++) {
+          size_t column_index = (i % plot->legend_columns);
+          size_t row_index = static_cast<size_t>(i / static_cast<float>(plot->legend_columns));
+          LegendEntry& entry = legend_entries[column_index][row_index];
+          TLegendEntry* e = legend.AddEntry(entry.object, entry.legend.c_str(), entry.style.c_str());
+          entry.stylize(e);
+      }
+  }
+
+  bool plotIt::plot(Plot& plot) {
+    std::cout << "Plotting '" << plot.name << "'" << std::endl;
+
+    bool hasMC = false;
+    bool hasData = false;
+    bool hasSignal = false;
+    bool hasLegend = false;
+    // Open all files, and find histogram in each
+    for (File& file: m_files) {
+      if (! loadObject(file, plot)) {
+        return false;
+      }
+
+      hasLegend |= getPlotStyle(file)->legend.length() > 0;
+      hasData |= file.type == DATA;
+      hasMC |= file.type == MC;
+      hasSignal |= file.type == SIGNAL;
+    }
+
+    // Can contains '/' if the plot is inside a folder
+    fs::path plot_path = plot.name + plot.output_suffix;
+    std::string plot_name = plot_path.filename().string();
+
+    if ( m_files.empty() ) {
+      std::cout << "No files selected" << std::endl;
+      return false;
+    }
+
+    if (m_preview) {
+      boost::optional<PreviewPlot> preview = ::plotIt::preview(m_files[0], plot);
+      TemporaryPool::get().clear();
+
+      if (! preview)
+        return false;
+
+      preview->path = plot_path.string();
+      m_preview->add(std::move(*preview));
+
+      return true;
+    }
+
+    // The canvas, pads and decorations are shared by all the plots
+    if (! m_layout)
+      m_layout.reset(new CanvasLayout(m_config));
+
+    TCanvas& c = m_layout->prepare(plot_name);
+
+    boost::optional<Summary> summary = ::plotIt::plot(m_files[0], *m_layout, plot);
+
+    if (! summary)
+      return false;
+
+    if (m_keep_summaries)
+      m_summaries.push_back(std::make_pair(plot_path.string(), *summary));
+
+    if (CommandLineCfg::get().verbose) {
+      ConsoleSummaryPrinter printer;
+      printer.print(*summary);
+    }
+
+    c.SetLogy(plot.log_y);
+    c.SetLogx(plot.log_x);
+
+    Position legend_position = plot->legend_position;
+
+    // Build legend
+    TLegend legend(legend_position.x1, legend_position.y1, legend_position.x2, legend_position.y2);
+    legend.SetTextFont(43);
+    legend.SetFillStyle(0);
+    legend.SetBorderSize(0);
+    legend.SetNColumns(plot->legend_columns);
+
+    fillLegend(legend, plot, hasMC && plot->show_errors);
+
+    legend.Draw();
+
+    // Move exponent label if shown
+    TGaxis::SetExponentOffset(-0.06, 0, "y");
+
+    m_layout->decorate(plot, mergeLabels(plot->labels));
+
+    fs::path rootDir = m_outputPath;
+    fs::path outputName = rootDir / plot_path;
+
+    // Ensure path exists
+    if (! m_bundle)
+      fs::create_directories(outputName.parent_path());
+
+    bool saved = true;
+    for (const std::string& extension: plot->save_extensions) {
+      fs::path plotPathWithExtension = plot_path.replace_extension(extension);
+
+      std::string finalPlotPathWithExtension = applyRenaming(plot->renaming_ops, plotPathWithExtension.native());
+      fs::path finalOutputName = rootDir / finalPlotPathWithExtension;
+
+      if (! m_bundle) {
+        c.SaveAs(finalOutputName.c_str());
+      } else if (! m_bundle->save(c, finalPlotPathWithExtension)) {
+        std::cout << "Error: cannot write " << finalPlotPathWithExtension << std::endl;
+        saved = false;
+      }
+    }
+
+    if (m_config.book_keeping_file) {
+      TDirectory* root = m_config.book_keeping_file.get();
+      if (!plot->book_keeping_folder.empty() || !plot_path.parent_path().empty()) {
+        // Look in the cache if we have this folder. This avoid querying the file each time we save a plot
+        std::string path = (!plot->book_keeping_folder.empty()) ? plot->book_keeping_folder : plot_path.parent_path().string();
+        auto it = m_book_keeping_folders.find(path);
+        if (it == m_book_keeping_folders.end()) {
+          root = ::plotIt::getDirectory(m_config.book_keeping_file.get(), path);
+          m_book_keeping_folders.emplace(path, root);
+        } else {
+          root = it->second;
+        }
+      }
+      root->WriteTObject(&c, nullptr, "Overwrite");
+    }
+
+    // Clean all temporary resources, once not drawn anymore
+    m_layout->clear();
+    TemporaryPool::get().clear();
+
+    // Reset groups
+    for (auto& group: m_legend_groups) {
+      group.second.added = false;
+    }
+
+    return saved;
+  }
+}
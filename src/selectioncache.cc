@@ -0,0 +1,145 @@
+#include <selectioncache.h>
+#include <hash.h>
+#include <timing.h>
+
+#include <TChain.h>
+#include <TDirectory.h>
+#include <TEntryList.h>
+#include <TFile.h>
+#include <TKey.h>
+
+#include <sys/stat.h>
+
+#include <iomanip>
+#include <iostream>
+#include <sstream>
+
+namespace plotIt {
+
+  namespace {
+    bool identify(const std::string& path, uint64_t& size, int64_t& mtime) {
+      struct stat info;
+      if (stat(path.c_str(), &info) != 0)
+        return false;
+
+      size = info.st_size;
+      mtime = static_cast<int64_t>(info.st_mtim.tv_sec) * 1000000000 + info.st_mtim.tv_nsec;
+
+      return true;
+    }
+  }
+
+  TEntryList* SelectionCache::get(TChain& chain, const std::string& path, const std::string& selection) {
+    // Patterns matching several files are not cached
+    uint64_t size = 0;
+    int64_t mtime = 0;
+    if (! identify(path, size, mtime))
+      return nullptr;
+
+    Hasher hasher;
+    hasher.update(std::string(chain.GetName()));
+    hasher.update(selection);
+    hasher.update(path);
+    hasher.update(&size, sizeof(size));
+    hasher.update(&mtime, sizeof(mtime));
+
+    std::ostringstream name;
+    name << "selection_" << std::hex << std::setw(16) << std::setfill('0') << hasher.digest();
+
+    auto it = m_entries.find(name.str());
+    if (it != m_entries.end()) {
+      PhaseTimings::get().count("selection-cache-hits");
+      return it->second.list.get();
+    }
+
+    if (chain.Draw((">>" + name.str()).c_str(), selection.c_str(), "entrylist") < 0)
+      return nullptr;
+
+    std::shared_ptr<TEntryList> list(dynamic_cast<TEntryList*>(gDirectory->Get(name.str().c_str())));
+    if (! list)
+      return nullptr;
+
+    list->SetDirectory(nullptr);
+
+    // What the entries depend on, to drop them once the file changed
+    std::ostringstream title;
+    title << size << " " << mtime << " " << path;
+    list->SetTitle(title.str().c_str());
+
+    Entry& entry = m_entries[name.str()];
+    entry.path = path;
+    entry.size = size;
+    entry.mtime = mtime;
+    entry.list = list;
+    m_modified = true;
+
+    PhaseTimings::get().count("selections");
+
+    return list.get();
+  }
+
+  bool SelectionCache::load(const fs::path& path) {
+    if (! fs::exists(path))
+      return false;
+
+    std::unique_ptr<TFile> file(TFile::Open(path.c_str()));
+    if (! file || file->IsZombie()) {
+      std::cout << "Warning: selection cache " << path << " is corrupted, ignoring it" << std::endl;
+      return false;
+    }
+
+    TIter it(file->GetListOfKeys());
+    TKey* key = nullptr;
+
+    while ((key = static_cast<TKey*>(it()))) {
+      std::unique_ptr<TObject> object(key->ReadObj());
+      if (! dynamic_cast<TEntryList*>(object.get()))
+        continue;
+
+      Entry entry;
+      entry.list.reset(static_cast<TEntryList*>(object.release()));
+      entry.list->SetDirectory(nullptr);
+
+      std::istringstream title(entry.list->GetTitle());
+      title >> entry.size >> entry.mtime;
+      std::getline(title >> std::ws, entry.path);
+
+      uint64_t size = 0;
+      int64_t mtime = 0;
+      if (! identify(entry.path, size, mtime) || size != entry.size || mtime != entry.mtime) {
+        // Not saved again
+        m_modified = true;
+        continue;
+      }
+
+      m_entries[key->GetName()] = entry;
+    }
+
+    return true;
+  }
+
+  bool SelectionCache::save(const fs::path& path) const {
+    if (! m_modified)
+      return true;
+
+    // Written then renamed, so that a failed write does not lose the previous cache
+    fs::path tmp = path;
+    tmp += ".tmp";
+
+    {
+      std::unique_ptr<TFile> file(TFile::Open(tmp.c_str(), "recreate"));
+      if (! file || file->IsZombie())
+        return false;
+
+      for (const auto& it: m_entries)
+        file->WriteTObject(it.second.list.get(), it.first.c_str());
+
+      file->Close();
+    }
+
+    boost::system::error_code ec;
+    fs::rename(tmp, path, ec);
+
+    return ! ec;
+  }
+}
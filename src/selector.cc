@@ -0,0 +1,100 @@
+#include <selector.h>
+
+#include <fnmatch.h>
+
+#include <stdexcept>
+
+namespace plotIt {
+
+    namespace {
+        bool startsWith(const std::string& value, const std::string& prefix) {
+            return value.compare(0, prefix.size(), prefix) == 0;
+        }
+
+        std::string folderOf(const std::string& name) {
+            size_t slash = name.rfind('/');
+            return (slash == std::string::npos) ? "" : name.substr(0, slash);
+        }
+    }
+
+    PlotSelector::PlotSelector(const std::vector<std::string>& expressions) {
+        for (const std::string& expression: expressions) {
+            std::vector<Pattern>* patterns = &m_names;
+            std::string pattern = expression;
+
+            size_t separator = expression.find_first_of("=~");
+            if (separator != std::string::npos) {
+                std::string field = expression.substr(0, separator);
+                if (field == "dir")
+                    patterns = &m_folders;
+                else if (field == "category")
+                    patterns = &m_categories;
+                else if (! field.empty() && field != "name")
+                    separator = std::string::npos;
+            }
+
+            Pattern p;
+            if (separator != std::string::npos) {
+                p.is_regex = expression[separator] == '~';
+                pattern = expression.substr(separator + 1);
+            }
+
+            if (pattern.empty())
+                throw std::invalid_argument("Invalid selection '" + expression + "': empty pattern");
+
+            if (p.is_regex) {
+                try {
+                    p.regex = std::regex(pattern, std::regex::extended);
+                } catch (const std::regex_error& e) {
+                    throw std::invalid_argument("Invalid selection '" + expression + "': " + e.what());
+                }
+            } else {
+                p.glob = pattern;
+                p.prefix = pattern.substr(0, pattern.find_first_of("*?[\\"));
+            }
+
+            patterns->push_back(p);
+        }
+    }
+
+    bool PlotSelector::matches(const std::vector<Pattern>& patterns, const std::string& value) {
+        if (patterns.empty())
+            return true;
+
+        for (const Pattern& pattern: patterns) {
+            if (pattern.is_regex ? std::regex_search(value, pattern.regex) : fnmatch(pattern.glob.c_str(), value.c_str(), 0) == 0)
+                return true;
+        }
+
+        return false;
+    }
+
+    bool PlotSelector::matchesCategory(const std::string& category) const {
+        return matches(m_categories, category);
+    }
+
+    bool PlotSelector::matches(const std::string& name, const std::string& category) const {
+        return matches(m_names, name) && matches(m_folders, folderOf(name)) && matches(m_categories, category);
+    }
+
+    bool PlotSelector::mayMatchFolder(const std::string& folder) const {
+        // Names of the plots inside the folder start with `folder/`, their
+        // folder starts with `folder`; only the literal prefix of a glob
+        // pattern can rule them out
+        std::string inside = folder + "/";
+
+        auto mayMatch = [&](const std::vector<Pattern>& patterns, const std::string& start) {
+            if (patterns.empty())
+                return true;
+
+            for (const Pattern& pattern: patterns) {
+                if (pattern.is_regex || startsWith(start, pattern.prefix) || startsWith(pattern.prefix, inside))
+                    return true;
+            }
+
+            return false;
+        };
+
+        return mayMatch(m_names, inside) && mayMatch(m_folders, folder);
+    }
+}
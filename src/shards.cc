@@ -0,0 +1,268 @@
+#include <shards.h>
+
+#include <TDirectory.h>
+#include <TFile.h>
+#include <TKey.h>
+#include <TList.h>
+
+#include <yaml-cpp/yaml.h>
+
+#include <algorithm>
+#include <fstream>
+#include <functional>
+#include <iostream>
+#include <memory>
+#include <numeric>
+#include <queue>
+#include <regex>
+#include <set>
+#include <utility>
+
+namespace plotIt {
+
+    namespace {
+        void copyDirectory(TDirectory* from, TDirectory* to) {
+            std::set<std::string> copied;
+
+            TIter next(from->GetListOfKeys());
+            while (TKey* key = static_cast<TKey*>(next())) {
+                std::string name = key->GetName();
+
+                // Keys of the same name are sorted by decreasing cycle, only the last one is copied
+                if (! copied.insert(name).second)
+                    continue;
+
+                std::string class_name = key->GetClassName();
+                if (class_name == "TDirectoryFile" || class_name == "TDirectory") {
+                    TDirectory* target = to->GetDirectory(name.c_str());
+                    if (! target)
+                        target = to->mkdir(name.c_str());
+
+                    copyDirectory(from->GetDirectory(name.c_str()), target);
+                    continue;
+                }
+
+                std::unique_ptr<TObject> object(key->ReadObj());
+                if (object)
+                    to->WriteTObject(object.get(), name.c_str());
+            }
+        }
+    }
+
+    double estimatePlotCost(const Plot& plot) {
+        // Loading and drawing the histograms of all the files is the same for
+        // every plot; the ratio pad and the fits come on top of it
+        double cost = 1;
+
+        if (plot.show_ratio)
+            cost += 0.5;
+
+        if (plot->fit)
+            cost += 1;
+
+        if (plot->fit_ratio)
+            cost += 1;
+
+        return cost;
+    }
+
+    std::vector<size_t> assignShards(const std::vector<double>& costs, size_t count) {
+        // Most expensive plots first, each one going to the least loaded shard
+        std::vector<size_t> order(costs.size());
+        std::iota(order.begin(), order.end(), 0);
+        std::stable_sort(order.begin(), order.end(), [&costs](size_t a, size_t b) {
+                return costs[a] > costs[b];
+            });
+
+        // (load, shard), least loaded shard on top, the first one in case of a tie
+        typedef std::pair<double, size_t> Load;
+        std::priority_queue<Load, std::vector<Load>, std::greater<Load>> loads;
+        for (size_t shard = 0; shard < count; shard++)
+            loads.push(std::make_pair(0., shard));
+
+        std::vector<size_t> shards(costs.size());
+        for (size_t plot: order) {
+            Load load = loads.top();
+            loads.pop();
+
+            shards[plot] = load.second;
+
+            load.first += costs[plot];
+            loads.push(load);
+        }
+
+        return shards;
+    }
+
+    std::string shardManifestName(size_t index, size_t count) {
+        return "plotit-shard-" + std::to_string(index) + "-of-" + std::to_string(count) + ".yml";
+    }
+
+    std::string shardFileName(const std::string& name, size_t index, size_t count) {
+        fs::path path(name);
+        std::string file = path.stem().string() + "-shard-" + std::to_string(index) + "-of-" + std::to_string(count) + path.extension().string();
+
+        return (path.parent_path() / file).string();
+    }
+
+    bool ShardManifest::save(const fs::path& path) const {
+        YAML::Node node;
+
+        node["shard"] = index;
+        node["shards"] = count;
+        node["plots"] = plots;
+
+        if (! book_keeping_file.empty()) {
+            node["book-keeping-file"] = book_keeping_file;
+            node["book-keeping-shard-file"] = book_keeping_shard_file;
+        }
+
+        if (has_yields) {
+            YAML::Node table;
+            table["yields-table-stretch"] = config.yields_table_stretch;
+            table["yields-table-align"] = config.yields_table_align;
+            table["yields-table-text-align"] = config.yields_table_text_align;
+            table["yields-table-numerical-precision-yields"] = config.yields_table_num_prec_yields;
+            table["yields-table-numerical-precision-ratio"] = config.yields_table_num_prec_ratio;
+
+            node["yields-table"] = table;
+            node["yields"] = yields.toYAML();
+        }
+
+        // Written then renamed, so that a manifest is never seen half-written
+        fs::path tmp = path;
+        tmp += ".tmp";
+
+        {
+            std::ofstream out(tmp.string());
+            if (! out.is_open())
+                return false;
+
+            out << node << std::endl;
+            if (! out)
+                return false;
+        }
+
+        boost::system::error_code ec;
+        fs::rename(tmp, path, ec);
+
+        return !ec;
+    }
+
+    bool ShardManifest::load(const fs::path& path) {
+        try {
+            YAML::Node node = YAML::LoadFile(path.string());
+
+            index = node["shard"].as<size_t>();
+            count = node["shards"].as<size_t>();
+            plots = node["plots"].as<size_t>();
+
+            if (node["book-keeping-file"]) {
+                book_keeping_file = node["book-keeping-file"].as<std::string>();
+                book_keeping_shard_file = node["book-keeping-shard-file"].as<std::string>();
+            }
+
+            has_yields = node["yields"].IsDefined();
+            if (has_yields) {
+                const YAML::Node& table = node["yields-table"];
+                config.yields_table_stretch = table["yields-table-stretch"].as<float>();
+                config.yields_table_align = table["yields-table-align"].as<std::string>();
+                config.yields_table_text_align = table["yields-table-text-align"].as<std::string>();
+                config.yields_table_num_prec_yields = table["yields-table-numerical-precision-yields"].as<int>();
+                config.yields_table_num_prec_ratio = table["yields-table-numerical-precision-ratio"].as<int>();
+
+                yields = YieldsTable::fromYAML(node["yields"]);
+            }
+        } catch (const YAML::Exception& e) {
+            std::cerr << "Error: cannot read shard manifest " << path << ": " << e.what() << std::endl;
+            return false;
+        }
+
+        return true;
+    }
+
+    bool mergeShards(const fs::path& output, std::vector<fs::path> manifests) {
+
+        if (manifests.empty()) {
+            static const std::regex pattern(R"(plotit-shard-\d+-of-\d+\.yml)");
+            for (fs::directory_iterator it(output); it != fs::directory_iterator(); ++it) {
+                if (std::regex_match(it->path().filename().string(), pattern))
+                    manifests.push_back(it->path());
+            }
+        }
+
+        if (manifests.empty()) {
+            std::cerr << "Error: no shard manifest found in " << output << std::endl;
+            return false;
+        }
+
+        // Manifest, and folder of the manifest
+        std::vector<std::pair<ShardManifest, fs::path>> shards;
+        for (const auto& path: manifests) {
+            ShardManifest manifest;
+            if (! manifest.load(path))
+                return false;
+
+            shards.push_back(std::make_pair(manifest, path.parent_path()));
+        }
+
+        std::sort(shards.begin(), shards.end(), [](const std::pair<ShardManifest, fs::path>& a, const std::pair<ShardManifest, fs::path>& b) {
+                return a.first.index < b.first.index;
+            });
+
+        size_t count = shards.front().first.count;
+        bool complete = shards.size() == count;
+        for (size_t i = 0; i < shards.size() && complete; i++)
+            complete = shards[i].first.count == count && shards[i].first.index == i + 1;
+
+        if (! complete) {
+            std::cerr << "Error: expected the manifests of shards 1 to " << count << " exactly once, got";
+            for (const auto& shard: shards)
+                std::cerr << " " << shard.first.index << "/" << shard.first.count;
+            std::cerr << std::endl;
+            return false;
+        }
+
+        size_t plots = 0;
+        for (const auto& shard: shards)
+            plots += shard.first.plots;
+
+        std::cout << "Merging " << count << " shards (" << plots << " plots)" << std::endl;
+
+        const ShardManifest& first = shards.front().first;
+
+        if (first.has_yields) {
+            YieldsTable yields;
+            for (const auto& shard: shards)
+                yields.merge(shard.first.yields);
+
+            std::cout << "Producing LaTeX yield table.\n";
+            if (! writeYieldsTable(yields, first.config, output / "yields.tex"))
+                return false;
+        }
+
+        if (! first.book_keeping_file.empty()) {
+            fs::path outputName = output / first.book_keeping_file;
+            std::unique_ptr<TFile> out(TFile::Open(outputName.string().c_str(), "recreate"));
+            if (! out) {
+                std::cerr << "Error: cannot create book-keeping file " << outputName << std::endl;
+                return false;
+            }
+
+            for (const auto& shard: shards) {
+                fs::path inputName = shard.second / shard.first.book_keeping_shard_file;
+                std::unique_ptr<TFile> in(TFile::Open(inputName.string().c_str()));
+                if (! in) {
+                    std::cerr << "Error: cannot open book-keeping file " << inputName << std::endl;
+                    return false;
+                }
+
+                copyDirectory(in.get(), out.get());
+            }
+
+            out->Close();
+        }
+
+        return true;
+    }
+}
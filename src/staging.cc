@@ -0,0 +1,387 @@
+#include <staging.h>
+
+#include <cache.h>
+#include <hash.h>
+#include <timing.h>
+
+#include <signal.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <cctype>
+#include <cerrno>
+#include <cstdlib>
+#include <ctime>
+#include <fstream>
+#include <iomanip>
+#include <iostream>
+#include <sstream>
+
+namespace plotIt {
+
+    namespace {
+        // Number of files copied at the same time
+        const size_t COPY_THREADS = 2;
+        // Files are copied by blocks of this size
+        const size_t BLOCK_SIZE = 8 * 1024 * 1024;
+
+        const std::string INDEX_NAME = "plotIt-staging.tsv";
+
+        bool identify(const std::string& path, uint64_t& size, int64_t& mtime) {
+            struct stat info;
+            if (stat(path.c_str(), &info) != 0)
+                return false;
+
+            size = info.st_size;
+            mtime = static_cast<int64_t>(info.st_mtim.tv_sec) * 1000000000 + info.st_mtim.tv_nsec;
+
+            return true;
+        }
+
+        // Staged copies are named `<16 hex digits>-<file name>`, see StagingArea::stagedPath
+        bool isStagedName(const std::string& name) {
+            if (name.size() <= 17 || name[16] != '-')
+                return false;
+
+            for (size_t i = 0; i < 16; i++) {
+                if (! std::isxdigit(static_cast<unsigned char>(name[i])))
+                    return false;
+            }
+
+            return true;
+        }
+
+        // Partial copies are named `<staged copy>.<pid>.part`: false if the process copying it is gone
+        bool isBeingCopied(const std::string& name) {
+            size_t end = name.size() - 5;
+            size_t begin = name.rfind('.', end - 1);
+            if (begin == std::string::npos)
+                return false;
+
+            pid_t pid = std::atoi(name.substr(begin + 1, end - begin - 1).c_str());
+
+            return pid > 0 && (kill(pid, 0) == 0 || errno == EPERM);
+        }
+
+        bool copyFile(const std::string& source, const fs::path& destination, const std::atomic<bool>& stop) {
+            std::ifstream input(source, std::ios::binary);
+            if (! input)
+                return false;
+
+            // Written next to the destination, then renamed: a partial copy is never used.
+            // Named after the process, as several runs may share the folder.
+            fs::path partial = destination;
+            partial += "." + std::to_string(getpid()) + ".part";
+
+            boost::system::error_code error;
+            {
+                std::ofstream output(partial.native(), std::ios::binary | std::ios::trunc);
+                if (! output)
+                    return false;
+
+                std::vector<char> buffer(BLOCK_SIZE);
+                while (input && ! stop) {
+                    input.read(buffer.data(), buffer.size());
+                    output.write(buffer.data(), input.gcount());
+                }
+
+                if (input.bad() || ! output || stop) {
+                    output.close();
+                    fs::remove(partial, error);
+                    return false;
+                }
+            }
+
+            fs::rename(partial, destination, error);
+
+            return ! error;
+        }
+    }
+
+    StagingArea::~StagingArea() {
+        finish();
+    }
+
+    void StagingArea::enable(const fs::path& folder, uint64_t budget) {
+        m_folder = fs::absolute(folder);
+        m_budget = budget;
+
+        fs::create_directories(m_folder);
+        load();
+
+        for (size_t i = 0; i < COPY_THREADS; i++)
+            m_threads.emplace_back(&StagingArea::work, this);
+    }
+
+    std::string StagingArea::stagedPath(const std::string& path) const {
+        Hasher hasher;
+        hasher.update(path);
+
+        // The name of the original file is kept, to find it easily
+        std::ostringstream name;
+        name << std::hex << std::setw(16) << std::setfill('0') << hasher.digest() << "-" << fs::path(path).filename().native();
+
+        return (m_folder / name.str()).native();
+    }
+
+    void StagingArea::prefetch(const std::vector<std::string>& paths, const std::set<std::string>& optional) {
+        if (! enabled())
+            return;
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+
+        // Files of the previous calls which were not opened are not needed anymore
+        for (auto& it: m_entries)
+            it.second.wanted = false;
+
+        for (const std::string& path: paths)
+            enqueue(path, optional.count(path) == 0);
+    }
+
+    void StagingArea::enqueue(const std::string& path, bool wanted) {
+        uint64_t size = 0;
+        int64_t mtime = 0;
+        if (InputCache::isMemoryPath(path) || ! identify(path, size, mtime))
+            return;
+
+        auto it = m_entries.find(path);
+        if (it != m_entries.end()) {
+            Entry& entry = it->second;
+            if (entry.state == QUEUED || entry.state == COPYING || (entry.state == READY && entry.size == size && entry.mtime == mtime)) {
+                entry.wanted = entry.wanted || wanted;
+                return;
+            }
+
+            // Changed since it was staged, or failed before
+            remove(path);
+        }
+
+        if (size > m_budget)
+            return;
+
+        Entry& entry = m_entries[path];
+        entry.size = size;
+        entry.mtime = mtime;
+        entry.wanted = wanted;
+
+        m_queue.push_back(path);
+        m_condition.notify_all();
+    }
+
+    std::string StagingArea::localPath(const std::string& path) {
+        if (! enabled())
+            return path;
+
+        std::unique_lock<std::mutex> lock(m_mutex);
+
+        // Files are copied in the order they are needed: waiting for the copy is faster than reading from the original
+        m_condition.wait(lock, [this, &path]() {
+                auto it = m_entries.find(path);
+                return m_done || it == m_entries.end() || (it->second.state != QUEUED && it->second.state != COPYING);
+                });
+
+        auto it = m_entries.find(path);
+        if (it == m_entries.end() || it->second.state != READY) {
+            m_misses++;
+            return path;
+        }
+
+        it->second.wanted = false;
+
+        // The original file may have changed since it was staged
+        uint64_t size = 0;
+        int64_t mtime = 0;
+        if (! identify(path, size, mtime) || size != it->second.size || mtime != it->second.mtime) {
+            remove(path);
+            m_misses++;
+            return path;
+        }
+
+        it->second.last_used = std::time(nullptr);
+        m_hits++;
+
+        return stagedPath(path);
+    }
+
+    void StagingArea::work() {
+        std::unique_lock<std::mutex> lock(m_mutex);
+        while (true) {
+            m_condition.wait(lock, [this]() { return m_done || ! m_queue.empty(); });
+            if (m_done)
+                return;
+
+            std::string path = m_queue.front();
+            m_queue.pop_front();
+
+            auto it = m_entries.find(path);
+            if (it == m_entries.end() || it->second.state != QUEUED)
+                continue;
+
+            uint64_t size = it->second.size;
+            if (! reserve(size)) {
+                it->second.state = FAILED;
+                m_condition.notify_all();
+                continue;
+            }
+
+            it->second.state = COPYING;
+
+            lock.unlock();
+            bool success = copyFile(path, stagedPath(path), m_done);
+            lock.lock();
+
+            // Entries of files being copied are never removed
+            Entry& entry = m_entries[path];
+            if (success) {
+                entry.state = READY;
+                entry.last_used = std::time(nullptr);
+                m_copied_files++;
+                m_copied_bytes += size;
+            } else {
+                entry.state = FAILED;
+                m_used -= size;
+            }
+
+            m_condition.notify_all();
+        }
+    }
+
+    bool StagingArea::reserve(uint64_t size) {
+        while (m_used + size > m_budget) {
+            auto oldest = m_entries.end();
+            for (auto it = m_entries.begin(); it != m_entries.end(); ++it) {
+                if (it->second.state == READY && ! it->second.wanted && (oldest == m_entries.end() || it->second.last_used < oldest->second.last_used))
+                    oldest = it;
+            }
+
+            // Everything left is being copied, or about to be used
+            if (oldest == m_entries.end())
+                return false;
+
+            std::string path = oldest->first;
+            remove(path);
+        }
+
+        m_used += size;
+
+        return true;
+    }
+
+    void StagingArea::remove(const std::string& path) {
+        auto it = m_entries.find(path);
+        if (it == m_entries.end())
+            return;
+
+        if (it->second.state == READY) {
+            m_used -= it->second.size;
+
+            // Files still open are only unlinked, they can still be read
+            boost::system::error_code error;
+            fs::remove(stagedPath(path), error);
+        }
+
+        m_entries.erase(it);
+    }
+
+    void StagingArea::load() {
+        std::ifstream index((m_folder / INDEX_NAME).native());
+
+        std::string line;
+        while (std::getline(index, line)) {
+            std::istringstream fields(line);
+
+            Entry entry;
+            std::string path;
+            if (! (fields >> entry.size >> entry.mtime >> entry.last_used))
+                continue;
+
+            std::getline(fields >> std::ws, path);
+            if (path.empty())
+                continue;
+
+            // The original file is only checked when used, not to access all of them now
+            boost::system::error_code error;
+            if (fs::file_size(stagedPath(path), error) != entry.size || error)
+                continue;
+
+            entry.state = READY;
+            m_entries[path] = entry;
+            m_used += entry.size;
+        }
+
+        std::set<std::string> indexed;
+        for (const auto& it: m_entries)
+            indexed.insert(fs::path(stagedPath(it.first)).filename().native());
+
+        // Copies which are not in the index, do not match it, or were interrupted, are not
+        // counted in the budget: they are removed. Other files of the folder are left alone.
+        boost::system::error_code error;
+        for (fs::directory_iterator it(m_folder, error), end; it != end && ! error; it.increment(error)) {
+            std::string name = it->path().filename().native();
+            if (! isStagedName(name) || indexed.count(name))
+                continue;
+
+            bool partial = name.size() > 5 && name.compare(name.size() - 5, 5, ".part") == 0;
+            if (partial && isBeingCopied(name))
+                continue;
+
+            boost::system::error_code remove_error;
+            fs::remove(it->path(), remove_error);
+        }
+    }
+
+    bool StagingArea::save() {
+        if (! enabled())
+            return true;
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+
+        // Written then renamed, so that concurrent runs never see a partial list
+        fs::path tmp = m_folder / (INDEX_NAME + ".tmp");
+        {
+            std::ofstream out(tmp.native(), std::ios::trunc);
+            if (! out.is_open())
+                return false;
+
+            for (const auto& it: m_entries) {
+                const Entry& entry = it.second;
+                if (entry.state == READY)
+                    out << entry.size << "\t" << entry.mtime << "\t" << entry.last_used << "\t" << it.first << std::endl;
+            }
+
+            if (! out)
+                return false;
+        }
+
+        boost::system::error_code error;
+        fs::rename(tmp, m_folder / INDEX_NAME, error);
+
+        return ! error;
+    }
+
+    void StagingArea::finish() {
+        if (m_threads.empty())
+            return;
+
+        {
+            std::lock_guard<std::mutex> lock(m_mutex);
+            m_done = true;
+
+            // Not needed anymore
+            m_queue.clear();
+        }
+
+        m_condition.notify_all();
+        for (auto& thread: m_threads)
+            thread.join();
+        m_threads.clear();
+
+        if (! save())
+            std::cerr << "Warning: cannot write the list of staged files in " << m_folder << std::endl;
+
+        PhaseTimings::get().count("staged-files", m_copied_files);
+        PhaseTimings::get().count("staged-bytes", m_copied_bytes);
+        PhaseTimings::get().count("staged-hits", m_hits);
+        PhaseTimings::get().count("staged-misses", m_misses);
+    }
+}
@@ -1,3 +1,4 @@
+#include <cache.h>
 #include <systematics.h>
 #include <types.h>
 #include <utilities.h>
@@ -15,6 +16,26 @@
 namespace fs = boost::filesystem;
 
 namespace plotIt {
+
+    namespace {
+        std::string variationPostfix(const std::string& name, Variation variation) {
+            return "__" + name + ((variation == UP) ? "up" : "down");
+        }
+
+        /**
+         * File holding the variation of the objects of the nominal file `nominal`
+         **/
+        fs::path variationFile(const std::string& nominal, const std::string& postfix) {
+            auto nominal_path = fs::path(nominal);
+            auto path = nominal_path.parent_path();
+            path /= nominal_path.stem();
+            path += postfix;
+            path += ".root";
+
+            return path;
+        }
+    }
+
     SystematicSet::SystematicSet(Systematic& parent):
         parent(&parent) {
 
@@ -69,6 +90,10 @@ namespace plotIt {
         return s;
     }
 
+    std::vector<std::string> Systematic::friendFiles(const File& file) const {
+        return {};
+    }
+
     void Systematic::apply(SystematicSet& systs) {
         systs.nominal_shape.reset(systs.true_nominal_shape->Clone());
         systs.up_shape.reset(systs.true_up_shape->Clone());
@@ -153,34 +178,28 @@ namespace plotIt {
         std::array<Variation, 2> variations = {UP, DOWN};
         std::map<Variation, std::shared_ptr<TObject>*> links = {{UP, &result.true_up_shape}, {DOWN, &result.true_down_shape}};
 
-        auto formatSystematicsName = [this](Variation variation) {
-            static std::map<Variation, std::string> names = {{UP, "up"}, {DOWN, "down"}};
-            return "__" + this->name + names[variation];
-        };
-
         for (const auto& variation: variations) {
-            std::string object_postfix = formatSystematicsName(variation);
+            std::string object_postfix = variationPostfix(name, variation);
 
             std::string object_name = applyRenaming(file.renaming_ops, plot.name) + object_postfix;
-            TObject* object = file.handle->Get(object_name.c_str());
+            TObject* object = InputCache::get().getObject(*file.handle, object_name);
 
             if (object) {
                 links[variation]->reset(object->Clone());
                 continue;
             }
 
-            auto nominal_path = fs::path(file.path);
-            auto syst_path = nominal_path.parent_path();
-            syst_path /= nominal_path.stem();
-            syst_path += object_postfix;
-            syst_path += ".root";
+            auto syst_path = variationFile(file.path, object_postfix);
 
             if (fs::exists(syst_path)) {
                 std::shared_ptr<TFile>& f = file.friend_handles[syst_path.native()];
                 if (! f)
-                    f.reset(TFile::Open(syst_path.native().c_str()));
+                    f = InputCache::get().open(syst_path.native());
+
+                if (! f)
+                    continue;
 
-                object = f->Get(plot.name.c_str());
+                object = InputCache::get().getObject(*f, plot.name);
 
                 if (object) {
                     links[variation]->reset(object->Clone());
@@ -191,6 +210,17 @@ namespace plotIt {
         return result;
     }
 
+    std::vector<std::string> ShapeSystematic::friendFiles(const File& file) const {
+        std::vector<std::string> files;
+        for (Variation variation: {UP, DOWN}) {
+            fs::path path = variationFile(file.path, variationPostfix(name, variation));
+            if (fs::exists(path))
+                files.push_back(path.native());
+        }
+
+        return files;
+    }
+
     std::shared_ptr<Systematic> SystematicFactory::create(const std::string& name, const std::string& type, const YAML::Node& node) {
 
         std::string lower_type = type;
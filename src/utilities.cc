@@ -8,6 +8,7 @@
 #include <THStack.h>
 #include <TStyle.h>
 #include <TColor.h>
+#include <TROOT.h>
 
 namespace plotIt {
 
@@ -197,8 +198,17 @@ namespace plotIt {
       s.replace(pos, old.size(), rep);
   }
 
+  namespace {
+    uint32_t s_colorIndex = 5000;
+  }
+
+  std::vector<CustomColor>& createdColors() {
+    static std::vector<CustomColor> s_colors;
+
+    return s_colors;
+  }
+
   int16_t loadColor(const YAML::Node& node) {
-    static uint32_t s_colorIndex = 5000;
     std::string value = node.as<std::string>();
     if (value.length() > 1 && value[0] == '#' && ((value.length() == 7) || (value.length() == 9))) {
       // RGB Color
@@ -222,12 +232,32 @@ namespace plotIt {
       auto color_ptr = std::make_shared<TColor>(s_colorIndex++, r, g, b, value.c_str(), a);
       TemporaryPool::get().addRuntime(color_ptr);
 
+      createdColors().push_back({static_cast<int16_t>(color_ptr->GetNumber()), r, g, b, a, value});
+
       return color_ptr->GetNumber();
     } else {
       return node.as<int16_t>();
     }
   }
 
+  bool restoreColor(const CustomColor& color) {
+    TColor* existing = gROOT->GetColor(color.index);
+    if (existing) {
+      return
+        std::abs(existing->GetRed() - color.r) < 1e-6 &&
+        std::abs(existing->GetGreen() - color.g) < 1e-6 &&
+        std::abs(existing->GetBlue() - color.b) < 1e-6 &&
+        std::abs(existing->GetAlpha() - color.a) < 1e-6;
+    }
+
+    auto color_ptr = std::make_shared<TColor>(color.index, color.r, color.g, color.b, color.name.c_str(), color.a);
+    TemporaryPool::get().addRuntime(color_ptr);
+
+    s_colorIndex = std::max<uint32_t>(s_colorIndex, color.index + 1);
+
+    return true;
+  }
+
   namespace fs = boost::filesystem;
 
   TDirectory* getDirectory(TDirectoryFile* root, const boost::filesystem::path& path, bool create/* = true*/) {
@@ -0,0 +1,116 @@
+#include <watch.h>
+
+#include <cerrno>
+#include <cstring>
+#include <iostream>
+
+#ifdef __linux__
+#include <poll.h>
+#include <sys/inotify.h>
+#include <unistd.h>
+#endif
+
+namespace plotIt {
+
+#ifdef __linux__
+    FileWatcher::FileWatcher() {
+        m_fd = inotify_init1(IN_CLOEXEC);
+        if (m_fd < 0)
+            std::cerr << "Error: cannot initialize inotify (" << std::strerror(errno) << ")" << std::endl;
+    }
+
+    FileWatcher::~FileWatcher() {
+        if (m_fd >= 0)
+            close(m_fd);
+    }
+
+    void FileWatcher::watch(const std::set<std::string>& paths) {
+        if (m_fd < 0)
+            return;
+
+        for (const std::string& path: paths) {
+            fs::path file = fs::absolute(path);
+            m_files.emplace(file, path);
+
+            fs::path folder = file.parent_path();
+            if (! m_watched_folders.insert(folder).second)
+                continue;
+
+            // Written in place, or moved over the previous version
+            int wd = inotify_add_watch(m_fd, folder.c_str(), IN_CLOSE_WRITE | IN_MOVED_TO);
+            if (wd < 0) {
+                std::cerr << "Warning: cannot watch " << folder << " (" << std::strerror(errno) << "), changes of '" << path << "' are not seen" << std::endl;
+                continue;
+            }
+
+            // The same descriptor is returned for another path of the same folder
+            m_folders[wd].push_back(folder);
+        }
+    }
+
+    std::set<std::string> FileWatcher::wait(int quiet_ms) {
+        std::set<std::string> changed;
+        if (m_fd < 0)
+            return changed;
+
+        struct pollfd fd = {m_fd, POLLIN, 0};
+        while (true) {
+            // Block until the first change, then until things are quiet again
+            int ready = poll(&fd, 1, changed.empty() ? -1 : quiet_ms);
+            if (ready < 0) {
+                if (errno == EINTR)
+                    continue;
+
+                std::cerr << "Error: cannot wait for file changes (" << std::strerror(errno) << ")" << std::endl;
+                break;
+            }
+
+            if (ready == 0)
+                break;
+
+            read(changed);
+        }
+
+        return changed;
+    }
+
+    void FileWatcher::read(std::set<std::string>& changed) {
+        alignas(struct inotify_event) char buffer[64 * 1024];
+
+        ssize_t size = ::read(m_fd, buffer, sizeof(buffer));
+        if (size <= 0)
+            return;
+
+        for (char* p = buffer; p < buffer + size; ) {
+            const struct inotify_event* event = reinterpret_cast<const struct inotify_event*>(p);
+            p += sizeof(struct inotify_event) + event->len;
+
+            auto folders = m_folders.find(event->wd);
+            if (folders == m_folders.end() || event->len == 0)
+                continue;
+
+            for (const fs::path& folder: folders->second) {
+                auto file = m_files.find(folder / event->name);
+                if (file != m_files.end())
+                    changed.insert(file->second);
+            }
+        }
+    }
+#else
+    FileWatcher::FileWatcher() {
+        std::cerr << "Error: watching files is only supported on Linux" << std::endl;
+    }
+
+    FileWatcher::~FileWatcher() = default;
+
+    void FileWatcher::watch(const std::set<std::string>&) {
+    }
+
+    std::set<std::string> FileWatcher::wait(int) {
+        return std::set<std::string>();
+    }
+
+    void FileWatcher::read(std::set<std::string>&) {
+    }
+#endif
+}
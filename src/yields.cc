@@ -0,0 +1,476 @@
+#include <yields.h>
+
+#include <commandlinecfg.h>
+
+#include <Math/QuantFuncMathCore.h>
+
+#include <yaml-cpp/yaml.h>
+
+#include <algorithm>
+#include <cmath>
+#include <fstream>
+#include <iomanip>
+#include <iostream>
+#include <limits>
+#include <sstream>
+#include <tuple>
+#include <vector>
+
+namespace plotIt {
+
+  namespace {
+    std::string type_to_key(Type type) {
+      switch (type) {
+        case MC:
+          return "mc";
+
+        case SIGNAL:
+          return "signal";
+
+        case DATA:
+          return "data";
+      }
+
+      return "mc";
+    }
+
+    // Enough digits to read back exactly the same value
+    YAML::Node number(double value) {
+      std::ostringstream ss;
+      ss << std::setprecision(std::numeric_limits<double>::max_digits10) << value;
+
+      return YAML::Node(ss.str());
+    }
+
+    YAML::Node yieldsToYAML(const std::map<std::string, std::pair<double, double>>& yields) {
+      YAML::Node node(YAML::NodeType::Map);
+      for (const auto& it: yields) {
+        YAML::Node pair(YAML::NodeType::Sequence);
+        pair.push_back(number(it.second.first));
+        pair.push_back(number(it.second.second));
+        node[it.first] = pair;
+      }
+
+      return node;
+    }
+
+    void yieldsFromYAML(const YAML::Node& node, std::map<std::string, std::pair<double, double>>& yields) {
+      for (const auto& it: node)
+        yields[it.first.as<std::string>()] = std::make_pair(it.second[0].as<double>(), it.second[1].as<double>());
+    }
+  }
+
+  YieldsCategory* YieldsTable::add(const std::string& title, size_t plot, int order) {
+    auto it = categories.find(title);
+    if (it != categories.end() && it->second.plot <= plot)
+      return nullptr;
+
+    YieldsCategory& category = categories[title];
+    category = YieldsCategory();
+    category.plot = plot;
+    category.order = order;
+
+    return &category;
+  }
+
+  void YieldsTable::merge(const YieldsTable& other) {
+    for (const auto& it: other.categories) {
+      YieldsCategory* category = add(it.first, it.second.plot, it.second.order);
+      if (category)
+        *category = it.second;
+    }
+
+    mc_processes.insert(other.mc_processes.begin(), other.mc_processes.end());
+    signal_processes.insert(other.signal_processes.begin(), other.signal_processes.end());
+    has_data |= other.has_data;
+  }
+
+  YAML::Node YieldsTable::toYAML() const {
+    YAML::Node node;
+
+    node["has-data"] = has_data;
+
+    node["mc-processes"] = YAML::Node(YAML::NodeType::Sequence);
+    for (const auto& process: mc_processes)
+      node["mc-processes"].push_back(process);
+
+    node["signal-processes"] = YAML::Node(YAML::NodeType::Sequence);
+    for (const auto& process: signal_processes)
+      node["signal-processes"].push_back(process);
+
+    node["categories"] = YAML::Node(YAML::NodeType::Sequence);
+    for (const auto& it: categories) {
+      const YieldsCategory& category = it.second;
+
+      YAML::Node c;
+      c["title"] = it.first;
+      c["plot"] = category.plot;
+      c["order"] = category.order;
+      c["data"] = number(category.data);
+      c["mc"] = yieldsToYAML(category.mc);
+      c["signal"] = yieldsToYAML(category.signal);
+      c["mc-total"] = number(category.mc_total);
+      c["mc-total-sqerr"] = number(category.mc_total_sqerr);
+
+      c["process-systematics"] = YAML::Node(YAML::NodeType::Sequence);
+      for (const auto& syst: category.process_systematics) {
+        YAML::Node s;
+        s["type"] = type_to_key(syst.first.first);
+        s["process"] = syst.first.second;
+        s["value"] = number(syst.second);
+        c["process-systematics"].push_back(s);
+      }
+
+      c["total-systematics-squared"] = YAML::Node(YAML::NodeType::Map);
+      for (const auto& syst: category.total_systematics_squared)
+        c["total-systematics-squared"][type_to_key(syst.first)] = number(syst.second);
+
+      node["categories"].push_back(c);
+    }
+
+    return node;
+  }
+
+  YieldsTable YieldsTable::fromYAML(const YAML::Node& node) {
+    YieldsTable table;
+
+    table.has_data = node["has-data"].as<bool>();
+
+    for (const auto& process: node["mc-processes"])
+      table.mc_processes.insert(process.as<std::string>());
+
+    for (const auto& process: node["signal-processes"])
+      table.signal_processes.insert(process.as<std::string>());
+
+    for (const auto& c: node["categories"]) {
+      YieldsCategory& category = table.categories[c["title"].as<std::string>()];
+      category.plot = c["plot"].as<size_t>();
+      category.order = c["order"].as<int>();
+      category.data = c["data"].as<double>();
+      yieldsFromYAML(c["mc"], category.mc);
+      yieldsFromYAML(c["signal"], category.signal);
+      category.mc_total = c["mc-total"].as<double>();
+      category.mc_total_sqerr = c["mc-total-sqerr"].as<double>();
+
+      for (const auto& s: c["process-systematics"])
+        category.process_systematics[std::make_pair(string_to_type(s["type"].as<std::string>()), s["process"].as<std::string>())] = s["value"].as<double>();
+
+      for (const auto& s: c["total-systematics-squared"])
+        category.total_systematics_squared[string_to_type(s.first.as<std::string>())] = s.second.as<double>();
+    }
+
+    return table;
+  }
+
+  bool writeYieldsTable(const YieldsTable& table, const Configuration& config, const fs::path& output) {
+
+    std::vector< std::pair<int, std::string> > categories;
+
+    std::map<std::string, double> data_yields;
+
+    std::map< std::string, std::map<std::string, std::pair<double, double> > > mc_yields;
+    std::map< std::string, double > mc_total;
+    std::map< std::string, double > mc_total_sqerrs;
+    std::set<std::string> mc_processes = table.mc_processes;
+
+    std::map< std::string, std::map<std::string, std::pair<double, double> > > signal_yields;
+    std::set<std::string> signal_processes = table.signal_processes;
+
+    std::map<
+        std::tuple<Type, std::string, std::string>, // Type, category, systematics name
+        double
+    > process_systematics;
+
+    std::map<
+        std::string,
+        std::map<Type, double>
+    > total_systematics_squared;
+
+    bool has_data = table.has_data;
+
+    // Categories in the order of the plots they come from
+    std::vector<std::pair<size_t, std::string>> plot_order;
+    for (const auto& it: table.categories)
+      plot_order.push_back(std::make_pair(it.second.plot, it.first));
+    std::sort(plot_order.begin(), plot_order.end());
+
+    for (const auto& it: plot_order) {
+      const std::string& categ = it.second;
+      const YieldsCategory& category = table.categories.at(categ);
+
+      categories.push_back(std::make_pair(category.order, categ));
+
+      data_yields[categ] = category.data;
+      mc_yields[categ] = category.mc;
+      signal_yields[categ] = category.signal;
+      mc_total[categ] = category.mc_total;
+      mc_total_sqerrs[categ] = category.mc_total_sqerr;
+
+      for (const auto& syst: category.process_systematics)
+        process_systematics[std::make_tuple(syst.first.first, categ, syst.first.second)] = syst.second;
+
+      total_systematics_squared[categ] = category.total_systematics_squared;
+    }
+
+    if( ( !(mc_processes.size()+signal_processes.size()) && !has_data ) || !categories.size() ){
+      std::cout << "No processes/data/categories defined\n";
+      return false;
+    }
+
+    // Sort according to user-defined order; categories with the same order keep the order of the plots
+    std::stable_sort(categories.begin(), categories.end(), [](const std::pair<int, std::string>& cat1, const std::pair<int, std::string>& cat2){  return cat1.first < cat2.first; });
+
+    std::ostringstream latexString;
+    std::string tab("    ");
+
+    latexString << std::setiosflags(std::ios_base::fixed);
+    latexString << R"(% Yields table generated automatically by plotIt.
+% Needed packages:
+%    \usepackage{booktabs}
+%
+% Use the following if building a CMS document
+%
+% \makeatletter
+% \newcommand{\thickhline}{%
+%     \noalign {\ifnum 0=`}\fi \hrule height .08em
+%     \futurelet \reserved@a \@xhline
+% }
+% \newcommand{\thinhline}{%
+%     \noalign {\ifnum 0=`}\fi \hrule height .05em
+%     \futurelet \reserved@a \@xhline
+% }
+% \makeatother
+% \newcommand{\toprule}{\noalign{\vskip0pt}\thickhline\noalign{\vskip.65ex}}
+% \newcommand{\midrule}{\noalign{\vskip.4ex}\thinhline\noalign{\vskip.65ex}}
+% \newcommand{\bottomrule}{\noalign{\vskip.4ex}\thickhline\noalign{\vskip0pt}})" << std::endl << std::endl;
+
+    auto format_number_with_errors = [](double number, double error_low, double error_high, uint8_t number_precision, uint8_t error_precision) -> std::string {
+        std::stringstream ss;
+        ss << std::setiosflags(std::ios_base::fixed);
+        ss << std::setprecision(number_precision);
+        if (std::abs(error_high - error_low) > std::pow(10, -1 * error_precision)) {
+            // Errors are really asymmetric
+            ss << "$" << number << std::setprecision(error_precision) << "^{+" << error_high << "}_{-" << error_low << "}$";
+        } else {
+            // Symmetric errors
+            ss << "$" << number << R"( {\scriptstyle\ \pm\ )" << std::setprecision(error_precision) << error_low << "}$";
+        }
+
+        return ss.str();
+    };
+
+    if( config.yields_table_align.find("h") != std::string::npos ){
+
+      latexString << "\\renewcommand{\\arraystretch}{" << config.yields_table_stretch << "}\n";
+      latexString << "\\begin{tabular}{ |l||";
+
+      // tabular config.
+      for(size_t i = 0; i < signal_processes.size(); ++i)
+        latexString << config.yields_table_text_align << "|";
+      if(signal_processes.size())
+        latexString << "|";
+      for(size_t i = 0; i < mc_processes.size(); ++i)
+        latexString << config.yields_table_text_align << "|";
+      if(mc_processes.size())
+        latexString << "|" + config.yields_table_text_align << "||";
+      if(has_data)
+        latexString << config.yields_table_text_align << "||";
+      if(has_data && mc_processes.size())
+        latexString << config.yields_table_text_align << "||";
+      latexString.seekp(latexString.tellp() - 2l);
+      latexString << "| }\n" << tab << tab << "\\hline\n";
+
+      // title line
+      latexString << "    Cat. & ";
+      for(auto &proc: signal_processes)
+        latexString << proc << " & ";
+      for(auto &proc: mc_processes)
+        latexString << proc << " & ";
+      if( mc_processes.size() )
+        latexString << "Tot. MC & ";
+      if( has_data )
+        latexString << "Data & ";
+      if( has_data && mc_processes.size() )
+        latexString << "Data/MC & ";
+      latexString.seekp(latexString.tellp() - 2l);
+      latexString << "\\\\\n" << tab << tab << "\\hline\n";
+
+      // loop over each category
+      for(auto& cat_pair: categories){
+
+        std::string categ(cat_pair.second);
+        latexString << tab << categ << " & ";
+        latexString << std::setprecision(config.yields_table_num_prec_yields);
+
+        for(auto &proc: signal_processes)
+          latexString << "$" << signal_yields[categ][proc].first << " \\pm " << std::sqrt(signal_yields[categ][proc].second + std::pow(process_systematics[std::make_tuple(SIGNAL, categ, proc)], 2)) << "$ & ";
+
+        for(auto &proc: mc_processes)
+          latexString << "$" << mc_yields[categ][proc].first << " \\pm " << std::sqrt(mc_yields[categ][proc].second + std::pow(process_systematics[std::make_tuple(MC, categ, proc)], 2)) << "$ & ";
+        if( mc_processes.size() )
+          latexString << "$" << mc_total[categ] << " \\pm " << std::sqrt(mc_total_sqerrs[categ] + total_systematics_squared[categ][MC]) << "$ & ";
+
+        if( has_data ) {
+          static const double alpha = 1. - 0.682689492;
+          uint64_t yield = data_yields[cat_pair.second];
+          double error_low = yield - ROOT::Math::gamma_quantile(alpha / 2., yield, 1.);
+          double error_high = ROOT::Math::gamma_quantile_c(alpha / 2., yield, 1.) - yield;
+          latexString << format_number_with_errors(yield, error_low, error_high, 0, config.yields_table_num_prec_yields) << " & ";
+        }
+
+        if( has_data && mc_processes.size() ){
+          uint64_t data_yield = data_yields[categ];
+          double ratio = data_yield / mc_total[categ];
+
+          static const double alpha = 1. - 0.682689492;
+          double error_data_low = data_yield - ROOT::Math::gamma_quantile(alpha / 2., data_yield, 1.);
+          double error_data_high = ROOT::Math::gamma_quantile_c(alpha / 2., data_yield, 1.) - data_yield;
+
+          double error_mc = std::sqrt(mc_total_sqerrs[categ] + total_systematics_squared[categ][MC]);
+
+          double error_low = ratio * std::sqrt(std::pow(error_data_low / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
+          double error_high = ratio * std::sqrt(std::pow(error_data_high / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
+
+          latexString << format_number_with_errors(ratio, error_low, error_high, config.yields_table_num_prec_ratio, config.yields_table_num_prec_ratio) << " & ";
+        }
+
+        latexString.seekp(latexString.tellp() - 2l);
+        latexString << "\\\\\n";
+      }
+
+      latexString << tab << tab << "\\hline\n\\end{tabular}\n";
+
+    } else if (config.yields_table_align.find("v") != std::string::npos) {
+
+        // Tabular header
+        latexString << R"(\begin{tabular}{@{}l)";
+        std::string header = " & ";
+        for (size_t i = 0; i < categories.size(); i++) {
+            latexString << "r";
+            header += categories[i].second;
+            if (i != (categories.size() - 1))
+                header += " & ";
+        }
+        latexString << R"(@{}} \toprule)" << std::endl;
+        latexString << header << R"(\\)" << std::endl;
+
+        latexString << std::setprecision(config.yields_table_num_prec_yields);
+
+        // Start with signals
+        if (!signal_processes.empty()) {
+            latexString << "Signal sample" << ((signal_processes.size() == 1) ? "" : "s") << R"( & \\ \midrule)" << std::endl;
+
+            // Loop
+            for (const auto& p: signal_processes) {
+
+                latexString << p << " & ";
+
+                for (const auto& c: categories) {
+                    std::string categ = c.second;
+
+                    latexString << "$" << signal_yields[categ][p].first << R"( {\scriptstyle\ \pm\ )" << std::sqrt(signal_yields[categ][p].second + std::pow(process_systematics[std::make_tuple(SIGNAL, categ, p)], 2)) << "}$ & ";
+                }
+
+                latexString.seekp(latexString.tellp() - 2l);
+                latexString << R"( \\ )" << std::endl;
+            }
+
+            // Space
+            if (!mc_processes.empty() || has_data)
+                latexString << R"( & \\)" << std::endl;
+        }
+
+        // Then MC samples
+        if (!mc_processes.empty()) {
+            latexString << "SM sample" << ((mc_processes.size() == 1) ? "" : "s") << R"( & \\ \midrule)" << std::endl;
+
+            // Loop
+            for (const auto& p: mc_processes) {
+
+                latexString << p << " & ";
+
+                for (const auto& c: categories) {
+                    std::string categ = c.second;
+
+                    latexString << "$" << mc_yields[categ][p].first << R"( {\scriptstyle\ \pm\ )" << std::sqrt(mc_yields[categ][p].second + std::pow(process_systematics[std::make_tuple(MC, categ, p)], 2)) << "}$ & ";
+                }
+
+                latexString.seekp(latexString.tellp() - 2l);
+                latexString << R"( \\ )" << std::endl;
+            }
+
+            // Space
+            latexString << R"( & \\)" << std::endl;
+            latexString << R"(Total {\scriptsize $\pm$ (stat.) $\pm$ (syst.)} & )";
+
+            for (const auto& c: categories) {
+                latexString << "$" << mc_total[c.second] << R"({\scriptstyle\ \pm\ )" << std::sqrt(mc_total_sqerrs[c.second]) << R"(\ \pm\ )" << std::sqrt(total_systematics_squared[c.second][MC]) << "}$ & ";
+            }
+
+            latexString.seekp(latexString.tellp() - 2l);
+            latexString << R"( \\ )" << std::endl;
+        }
+
+        // Print data
+        if (has_data) {
+            latexString << R"(\midrule)" << std::endl;
+            latexString << R"(Data {\scriptsize $\pm$ (stat.)} & )";
+            latexString << std::setprecision(0);
+
+            for (const auto& c: categories) {
+                // Compute poisson errors on the data yields
+                static const double alpha = 1. - 0.682689492;
+                int64_t yield = data_yields[c.second];
+                double error_low = yield - ROOT::Math::gamma_quantile(alpha / 2., yield, 1.);
+                double error_high = ROOT::Math::gamma_quantile_c(alpha / 2., yield, 1.) - yield;
+                latexString << format_number_with_errors(yield, error_low, error_high, 0, config.yields_table_num_prec_yields) << " & ";
+            }
+
+            latexString.seekp(latexString.tellp() - 2l);
+            latexString << R"( \\ )" << std::endl;
+        }
+
+        // And finally data / MC
+        if (!mc_processes.empty() && has_data) {
+            latexString << R"(\midrule)" << std::endl;
+            latexString << R"(Data / prediction & )";
+            latexString << std::setprecision(config.yields_table_num_prec_ratio);
+
+            for (const auto& c: categories) {
+                std::string categ = c.second;
+                int64_t data_yield = data_yields[categ];
+                double ratio = data_yield / mc_total[categ];
+
+                static const double alpha = 1. - 0.682689492;
+                double error_data_low = data_yield - ROOT::Math::gamma_quantile(alpha / 2., data_yield, 1.);
+                double error_data_high = ROOT::Math::gamma_quantile_c(alpha / 2., data_yield, 1.) - data_yield;
+
+                double error_mc = std::sqrt(mc_total_sqerrs[categ] + total_systematics_squared[categ][MC]);
+
+                double error_low = ratio * std::sqrt(std::pow(error_data_low / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
+                double error_high = ratio * std::sqrt(std::pow(error_data_high / data_yields[categ], 2) +  std::pow(error_mc / mc_total[categ], 2));
+
+                latexString << format_number_with_errors(ratio, error_low, error_high, config.yields_table_num_prec_ratio, config.yields_table_num_prec_ratio) << " & ";
+            }
+
+            latexString.seekp(latexString.tellp() - 2l);
+            latexString << R"( \\ )" << std::endl;
+        }
+
+        latexString << R"(\bottomrule)" << std::endl;
+        latexString << R"(\end{tabular})" << std::endl;
+    } else {
+      std::cerr << "Error: yields table alignment " << config.yields_table_align << " is not recognized (for now, only \"h\" and \"v\" are supported)" << std::endl;
+      return false;
+    }
+
+    if(CommandLineCfg::get().verbose)
+      std::cout << "LaTeX yields table:\n\n" << latexString.str() << std::endl;
+
+    std::ofstream out(output.string());
+    out << latexString.str();
+    out.close();
+
+    return true;
+  }
+}
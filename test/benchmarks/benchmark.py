@@ -0,0 +1,339 @@
+#! /usr/bin/env python
+
+"""
+Performance benchmarks for plotIt.
+
+Synthetic ROOT inputs are generated with generate_benchmark_files.C for each
+scenario (number of samples, histograms, bins, shape systematics, folder depth
+and tree entries), plotIt is run on them with --timing, and wall time, peak
+RSS, throughput and the per-phase breakdown are appended to a results file
+(one JSON record per line) tagged with the current commit.
+
+Examples:
+    ./benchmark.py --scenario small --scenario systematics
+    ./benchmark.py --samples 20 --histos 500 --bins 100 --systs 4 --label my-test
+    ./benchmark.py --compare 1a2b3c4 5d6e7f8
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = {
+        'small': dict(samples=3, histos=20, bins=50, systs=0, depth=0, events=0),
+        'many-histos': dict(samples=5, histos=1000, bins=50, systs=0, depth=2, events=0),
+        'many-samples': dict(samples=100, histos=50, bins=50, systs=0, depth=0, events=0),
+        'fine-binning': dict(samples=5, histos=50, bins=5000, systs=0, depth=0, events=0),
+        'systematics': dict(samples=10, histos=100, bins=50, systs=10, depth=1, events=0),
+        'tree': dict(samples=3, histos=10, bins=50, systs=0, depth=0, events=200000),
+        }
+
+MODES = {
+        'plots': [],
+        'yields': ['-y', '-p'],
+        'all': ['-y'],
+        }
+
+timing_regexp = re.compile(r'^plotIt timing: (\S+) ([0-9.eE+-]+)$')
+count_regexp = re.compile(r'^plotIt count: (\S+) (\d+)$')
+
+
+def scenario_key(params):
+    return 's{samples}_h{histos}_b{bins}_y{systs}_d{depth}_e{events}'.format(**params)
+
+
+def generate_inputs(params, work_dir):
+    """
+    Generate the input files for a scenario, unless they already exist
+    """
+    folder = os.path.join(work_dir, 'inputs', scenario_key(params))
+    done_marker = os.path.join(folder, '.done')
+
+    if os.path.exists(done_marker):
+        return folder
+
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    macro = os.path.join(BENCHMARKS_DIR, 'generate_benchmark_files.C')
+    call = '%s("%s/", %d, %d, %d, %d, %d, %d)' % (macro, folder, params['samples'], params['histos'],
+            params['bins'], params['systs'], params['depth'], params['events'])
+
+    print("Generating inputs for %s..." % scenario_key(params))
+    with open(os.devnull, 'w+b') as null:
+        subprocess.check_call(['root', '-l', '-b', '-q', call], stdout=null)
+
+    open(done_marker, 'w').close()
+
+    return folder
+
+
+def get_configuration(params, inputs):
+    files = {}
+    for i in range(params['samples']):
+        files['sample_%d.root' % i] = {
+                'type': 'mc',
+                'legend': 'Sample %d' % i,
+                'cross-section': 10. + i,
+                'generated-events': 1000.,
+                'fill-color': i % 50 + 1,
+                'order': i,
+                }
+    files['data.root'] = {'type': 'data', 'legend': 'Data'}
+
+    configuration = {
+            'width': 800,
+            'height': 800,
+            'luminosity-label': '%1$.2f fb^{-1} (13 TeV)',
+            'experiment': 'CMS',
+            'extra-label': 'Benchmark',
+            'root': inputs,
+            'luminosity': 1000,
+            'luminosity-error': 0.025,
+            }
+
+    plots = {}
+    if params['events'] > 0:
+        configuration['mode'] = 'tree'
+        configuration['tree-name'] = 't'
+        for i in range(params['histos']):
+            plots['tree_%d' % i] = {
+                    'x-axis': 'Value',
+                    'x-axis-range': [0, 10],
+                    'binning-x': params['bins'],
+                    'draw-string': 'value',
+                    'selection-string': 'weight * (value > %f)' % (i * 0.01),
+                    'show-ratio': True,
+                    'for-yields': True,
+                    }
+    else:
+        plots['*histo_*'] = {
+                'x-axis': 'Value',
+                'show-ratio': True,
+                'for-yields': True,
+                }
+
+    result = {
+            'configuration': configuration,
+            'files': files,
+            'plots': plots,
+            'legend': {'position': [0.6, 0.6, 0.9, 0.9], 'columns': 2},
+            }
+
+    if params['systs'] > 0:
+        result['systematics'] = ['syst%d' % i for i in range(params['systs'])]
+
+    return result
+
+
+def run_plotit(plotit, configuration, extra_args):
+    """
+    Run plotIt once and return wall time, peak RSS (in kB), phase timings and counters
+    """
+    output_folder = tempfile.mkdtemp()
+    with tempfile.NamedTemporaryFile(suffix='.yml') as yml:
+        yml.write(yaml.dump(configuration, encoding='utf-8'))
+        yml.flush()
+
+        args = [plotit, yml.name, '-o', output_folder, '--timing'] + extra_args
+
+        start = time.time()
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, universal_newlines=True)
+        output = process.stdout.read()
+        # wait4 gives the resource usage of this child only
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.time() - start
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+
+    shutil.rmtree(output_folder, ignore_errors=True)
+
+    if process.returncode != 0:
+        raise RuntimeError("plotIt failed (status %d) with arguments: %s" % (process.returncode, ' '.join(args)))
+
+    phases = {}
+    counters = {}
+    for line in output.split('\n'):
+        m = timing_regexp.match(line)
+        if m:
+            phases[m.group(1)] = float(m.group(2))
+            continue
+
+        m = count_regexp.match(line)
+        if m:
+            counters[m.group(1)] = int(m.group(2))
+
+    # ru_maxrss is in kB on Linux
+    return wall, usage.ru_maxrss, phases, counters
+
+
+def get_commit():
+    try:
+        with open(os.devnull, 'w+b') as null:
+            commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, stderr=null)
+            dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=BENCHMARKS_DIR, stderr=null) != 0
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+    commit = commit.decode('utf-8').strip()
+    return commit + ('-dirty' if dirty else '')
+
+
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2
+
+
+def benchmark(args, name, params):
+    inputs = generate_inputs(params, args.work_dir)
+    configuration = get_configuration(params, inputs)
+
+    records = []
+    for mode in args.mode:
+        runs = [run_plotit(args.plotit, configuration, MODES[mode]) for _ in range(args.repeat)]
+
+        walls = [r[0] for r in runs]
+        wall = median(walls)
+        plots = runs[0][3].get('plots', 0)
+
+        phases = {}
+        for phase in runs[0][2]:
+            phases[phase] = median([r[2].get(phase, 0) for r in runs])
+
+        record = {
+                'commit': args.commit,
+                'label': args.label,
+                'date': datetime.datetime.now().isoformat(),
+                'scenario': name,
+                'parameters': params,
+                'mode': mode,
+                'repeat': args.repeat,
+                'wall': wall,
+                'wall_min': min(walls),
+                'peak_rss_kb': max(r[1] for r in runs),
+                'plots': plots,
+                'plots_per_s': plots / wall if plots and wall > 0 else 0,
+                'phases': phases,
+                }
+
+        print("%-15s %-7s wall %8.2f s  peak RSS %8.1f MB  %8.2f plots/s  [%s]" % (name, mode, wall,
+            record['peak_rss_kb'] / 1024, record['plots_per_s'],
+            ', '.join('%s %.2f s' % (k, v) for k, v in sorted(phases.items()))))
+
+        records.append(record)
+
+    return records
+
+
+def load_results(path):
+    results = []
+    if not os.path.exists(path):
+        return results
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                results.append(json.loads(line))
+
+    return results
+
+
+def compare(results, base, head):
+    """
+    Print, for each scenario and mode measured for both commits, the ratio head / base
+    """
+    def latest(commit):
+        selected = {}
+        for r in results:
+            if r['commit'] == commit or r['commit'].startswith(commit):
+                selected[(r['scenario'], r['mode'])] = r
+        return selected
+
+    base_results = latest(base)
+    head_results = latest(head)
+
+    keys = sorted(set(base_results) & set(head_results))
+    if not keys:
+        print("No common measurements between %s and %s" % (base, head))
+        return False
+
+    print("%-15s %-7s %10s %10s %8s %12s %12s" % ('scenario', 'mode', 'base (s)', 'head (s)', 'speedup', 'base RSS MB', 'head RSS MB'))
+    for key in keys:
+        b = base_results[key]
+        h = head_results[key]
+        speedup = b['wall'] / h['wall'] if h['wall'] > 0 else float('inf')
+        print("%-15s %-7s %10.2f %10.2f %7.2fx %12.1f %12.1f" % (key[0], key[1], b['wall'], h['wall'], speedup,
+            b['peak_rss_kb'] / 1024, h['peak_rss_kb'] / 1024))
+
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the plotIt performance benchmarks')
+    parser.add_argument('--plotit', default=os.path.join(BENCHMARKS_DIR, '..', '..', 'plotIt'), help='plotIt executable')
+    parser.add_argument('--work-dir', default=os.path.join(BENCHMARKS_DIR, 'work'), help='Folder where the generated inputs are cached')
+    parser.add_argument('--results', default=os.path.join(BENCHMARKS_DIR, 'results.jsonl'), help='Results file (one JSON record per line)')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Predefined scenario (can be repeated)')
+    parser.add_argument('--samples', type=int, help='Number of MC samples')
+    parser.add_argument('--histos', type=int, help='Number of histograms (or tree plots) per sample')
+    parser.add_argument('--bins', type=int, default=50, help='Number of bins per histogram')
+    parser.add_argument('--systs', type=int, default=0, help='Number of shape systematics')
+    parser.add_argument('--depth', type=int, default=0, help='Depth of the folders holding the histograms')
+    parser.add_argument('--events', type=int, default=0, help='Number of tree entries per file (enables tree mode)')
+    parser.add_argument('--mode', action='append', choices=sorted(MODES), help='What plotIt produces: plots, yields or all (default: plots and yields)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs for each measurement (the median is kept)')
+    parser.add_argument('--label', default='', help='Free-form label stored with the results')
+    parser.add_argument('--compare', nargs='+', metavar='COMMIT', help='Compare the results of two commits (default head: current commit)')
+
+    args = parser.parse_args()
+    args.commit = get_commit()
+
+    if args.compare:
+        base = args.compare[0]
+        head = args.compare[1] if len(args.compare) > 1 else args.commit
+        return 0 if compare(load_results(args.results), base, head) else 1
+
+    scenarios = []
+    if args.samples is not None or args.histos is not None:
+        params = dict(samples=args.samples or 1, histos=args.histos or 1, bins=args.bins, systs=args.systs,
+                depth=args.depth, events=args.events)
+        scenarios.append(('custom-' + scenario_key(params), params))
+
+    for name in args.scenario or ([] if scenarios else ['small']):
+        scenarios.append((name, SCENARIOS[name]))
+
+    if not args.mode:
+        args.mode = ['plots', 'yields']
+
+    args.plotit = os.path.abspath(args.plotit)
+    if not os.path.exists(args.plotit):
+        print("Error: plotIt executable %s not found" % args.plotit)
+        return 1
+
+    with open(args.results, 'a') as results:
+        for name, params in scenarios:
+            for record in benchmark(args, name, params):
+                results.write(json.dumps(record, sort_keys=True) + '\n')
+                results.flush()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +0,0 @@
-from .client import ImgurClient
\ No newline at end of file
@@ -1,4 +0,0 @@
-from ..imgur.models.comment import Comment
-from ..imgur.models.notification import Notification
-from ..imgur.models.gallery_album import GalleryAlbum
-from ..imgur.models.gallery_image import GalleryImage
\ No newline at end of file
@@ -1,9 +0,0 @@
-class GalleryAlbum(object):
-
-    # See documentation at https://api.imgur.com/ for available fields
-    def __init__(self, *initial_data, **kwargs):
-        for dictionary in initial_data:
-            for key in dictionary:
-                setattr(self, key, dictionary[key])
-        for key in kwargs:
-            setattr(self, key, kwargs[key])
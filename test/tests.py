@@ -1,9 +1,121 @@
 #! /usr/bin/env python
 
-import unittest
+"""
+Run the plotIt test suite.
+
+Tests are independent: with --jobs, they are run concurrently in separate
+processes (each test also runs its own plotIt invocations concurrently, see
+PLOTIT_TEST_JOBS). With --shard i/N, only the i-th of N slices of the suite is
+run, so that the suite can be split across machines.
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
 import sys
+import time
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+TESTS_DIR = 'unit_tests'
+
+
+def iterate_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            for t in iterate_tests(test):
+                yield t
+        else:
+            yield test
+
+
+def shard(test_ids, spec):
+    """
+    Keep the i-th of N slices (1-based) of the sorted list of tests
+    """
+    try:
+        index, count = [int(x) for x in spec.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid shard '%s', expected i/N" % spec)
+
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("Invalid shard '%s', expected 1 <= i <= N" % spec)
+
+    return [t for i, t in enumerate(sorted(test_ids)) if i % count == index - 1]
+
+
+def run_test(test_id):
+    """
+    Run a single test in a worker process, and return its outcome and output
+    """
+    if TESTS_DIR not in sys.path:
+        sys.path.insert(0, TESTS_DIR)
+
+    stream = StringIO()
+    test = unittest.TestLoader().loadTestsFromName(test_id)
+    result = unittest.TextTestRunner(stream=stream, verbosity=2).run(test)
+
+    # Pool workers do not run the exit handlers: wait for the failure artifacts here
+    import artifacts
+    artifacts.wait()
+
+    return test_id, result.wasSuccessful(), stream.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the plotIt test suite')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of tests to run concurrently')
+    parser.add_argument('--shard', help='Only run the i-th of N slices of the suite (i/N, 1-based)')
+
+    args = parser.parse_args()
+
+    # All the processes of this run share the same artifacts folder
+    os.environ.setdefault('PLOTIT_TEST_RUN_ID', time.strftime('%Y%m%d-%H%M%S'))
+
+    testsuite = unittest.TestLoader().discover(TESTS_DIR)
+
+    if args.jobs <= 1 and not args.shard:
+        return 0 if unittest.TextTestRunner(verbosity=2).run(testsuite).wasSuccessful() else 1
+
+    test_ids = [t.id() for t in iterate_tests(testsuite)]
+    if args.shard:
+        try:
+            test_ids = shard(test_ids, args.shard)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+
+    print("Running %d tests with %d jobs" % (len(test_ids), args.jobs))
+
+    if args.jobs <= 1:
+        results = [run_test(t) for t in test_ids]
+    else:
+        # Share the cores between the tests and the checks running inside each test
+        if 'PLOTIT_TEST_JOBS' not in os.environ:
+            os.environ['PLOTIT_TEST_JOBS'] = str(max(1, multiprocessing.cpu_count() // args.jobs))
+
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.map(run_test, test_ids, chunksize=1)
+        pool.close()
+        pool.join()
+
+    failures = []
+    for test_id, success, output in results:
+        sys.stderr.write(output)
+        if not success:
+            failures.append(test_id)
+
+    print("\n%d tests, %d failed" % (len(results), len(failures)))
+    for test_id in failures:
+        print(" - %s" % test_id)
+
+    return 1 if failures else 0
+
 
 if __name__ == "__main__":
-    testsuite = unittest.TestLoader().discover('unit_tests')
-    ret = unittest.TextTestRunner(verbosity=2).run(testsuite).wasSuccessful()
-    sys.exit(1 if not ret else 0)
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Failure artifacts of the image regression tests.
+
+When an image check fails, the result and reference images are copied to the
+artifacts folder of the run, and a background worker produces the rasterized
+reference and result, a diff image, and updates a static HTML report
+(index.html) listing all the failures of the run. Nothing leaves the machine.
+
+The artifacts folder is $PLOTIT_TEST_ARTIFACTS (by default artifacts/), with one
+sub-folder per run named after $PLOTIT_TEST_RUN_ID, which is shared by all the
+processes of a parallel run.
+"""
+
+from __future__ import division
+
+import atexit
+import json
+import multiprocessing.pool
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+
+import images
+
+try:
+    from html import escape
+except ImportError:
+    from cgi import escape
+
+np = images.np
+
+_pool = None
+_pool_lock = threading.Lock()
+_report_lock = threading.Lock()
+
+
+def get_run_folder():
+    if 'PLOTIT_TEST_RUN_ID' not in os.environ:
+        os.environ['PLOTIT_TEST_RUN_ID'] = time.strftime('%Y%m%d-%H%M%S')
+
+    folder = os.path.join(os.environ.get('PLOTIT_TEST_ARTIFACTS', 'artifacts'), os.environ['PLOTIT_TEST_RUN_ID'])
+    if not os.path.isdir(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # Created concurrently by another process
+            pass
+
+    return folder
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = multiprocessing.pool.ThreadPool(max(1, multiprocessing.cpu_count() // 2))
+            atexit.register(wait)
+
+    return _pool
+
+
+def wait():
+    """
+    Wait until all the artifacts are written
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def write_png(path, raster):
+    """
+    Write a (height, width, 3) uint8 array as PNG
+    """
+    height, width = raster.shape[:2]
+
+    # Filter type 0 (none) in front of each row
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = raster.reshape((height, width * 3))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def diff_raster(result, reference):
+    """
+    Faded result with the differing pixels highlighted in red, like ImageMagick's compare
+    """
+    if result.shape != reference.shape:
+        height = max(result.shape[0], reference.shape[0])
+        width = max(result.shape[1], reference.shape[1])
+        padded = []
+        for raster in (result, reference):
+            p = np.full((height, width, 3), 255, dtype=np.uint8)
+            p[:raster.shape[0], :raster.shape[1]] = raster
+            padded.append(p)
+        result, reference = padded
+
+    diff = (255 - (255 - result.mean(axis=-1, keepdims=True)) * 0.2).astype(np.uint8).repeat(3, axis=-1)
+    diff[images.difference_mask(result, reference)] = (241, 0, 30)
+
+    return diff
+
+
+def write_images_native(result, reference, prefix):
+    result_raster = images.get_raster(result)
+    reference_raster = images.get_raster(reference, persistent=True)
+
+    write_png(prefix + '_result.png', result_raster)
+    write_png(prefix + '_reference.png', reference_raster)
+    write_png(prefix + '_diff.png', diff_raster(result_raster, reference_raster))
+
+
+def write_images_imagemagick(result, reference, prefix):
+    with open(os.devnull, 'w+b') as null:
+        for source, suffix in ((result, 'result'), (reference, 'reference')):
+            subprocess.call(['convert', '-define', 'pdf:use-cropbox=true', '-density', '72', source,
+                '%s_%s.png' % (prefix, suffix)], stdout=null, stderr=null)
+
+        subprocess.call(['compare', '-define', 'pdf:use-cropbox=true', '-density', '72', result, reference,
+            prefix + '_diff.png'], stdout=null, stderr=null)
+
+
+REPORT_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>plotIt tests: %(count)d failure(s)</title>
+<style>
+body { font-family: sans-serif; }
+table { border-collapse: collapse; }
+td { vertical-align: top; padding: 4px; }
+img { max-width: 400px; border: 1px solid #ccc; }
+</style>
+</head>
+<body>
+<h1>plotIt tests: %(count)d failure(s)</h1>
+"""
+
+REPORT_ENTRY = """<h2>%(test)s</h2>
+<p>Golden image <code>%(reference)s</code>: %(similitude).2f%% of similitude</p>
+<table>
+<tr><th>Result</th><th>Reference</th><th>Difference</th></tr>
+<tr>
+<td><a href="%(name)s_result.pdf"><img src="%(name)s_result.png"></a></td>
+<td><a href="%(name)s_reference.pdf"><img src="%(name)s_reference.png"></a></td>
+<td><img src="%(name)s_diff.png"></td>
+</tr>
+</table>
+"""
+
+
+def write_report(folder):
+    """
+    Regenerate the HTML report from the description of all the failures of the run
+    """
+    entries = []
+    for f in sorted(os.listdir(folder)):
+        if f.endswith('.json'):
+            with open(os.path.join(folder, f)) as entry:
+                entries.append(json.load(entry))
+
+    fd, temp_name = tempfile.mkstemp(dir=folder, suffix='.html')
+    with os.fdopen(fd, 'w') as report:
+        report.write(REPORT_HEADER % {'count': len(entries)})
+        for entry in entries:
+            entry = dict((k, v if isinstance(v, (int, float)) else escape(v, quote=True)) for k, v in entry.items())
+            report.write(REPORT_ENTRY % entry)
+        report.write('</body>\n</html>\n')
+
+    # Atomic, several processes may update the report concurrently
+    os.rename(temp_name, os.path.join(folder, 'index.html'))
+
+
+def _process_failure(folder, name):
+    prefix = os.path.join(folder, name)
+    result = prefix + '_result.pdf'
+    reference = prefix + '_reference.pdf'
+
+    try:
+        if np is not None and images.is_available():
+            write_images_native(result, reference, prefix)
+        else:
+            write_images_imagemagick(result, reference, prefix)
+    except Exception as e:
+        # The report is still useful without the images
+        print("Failed to produce the images for %s: %s" % (name, e))
+
+    with _report_lock:
+        write_report(folder)
+
+
+def record_failure(test, result, reference, likelihood):
+    """
+    Save the artifacts of a failed image check, and return the path of the report
+
+    The images are copied right away, since the result usually lives in a
+    temporary folder; everything else is done in the background.
+    """
+    folder = get_run_folder()
+
+    name = '%s-%s' % (test, os.path.splitext(os.path.basename(reference))[0])
+    name = name.replace(os.sep, '_')
+
+    shutil.copyfile(result, os.path.join(folder, name + '_result.pdf'))
+    shutil.copyfile(reference, os.path.join(folder, name + '_reference.pdf'))
+
+    with open(os.path.join(folder, name + '.json'), 'w') as entry:
+        json.dump({'test': test, 'name': name, 'reference': reference, 'similitude': likelihood * 100}, entry)
+
+    get_pool().apply_async(_process_failure, (folder, name))
+
+    return os.path.join(folder, 'index.html')
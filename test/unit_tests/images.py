@@ -0,0 +1,164 @@
+"""
+Native image comparison backend.
+
+PDFs are rasterized once with ghostscript into PPM, which is trivial to read
+with numpy, and compared with vectorized array operations. Rasters are kept in
+memory and, for reference images, on disk in a cache keyed by the hash of the
+PDF content, so golden images are only ever rasterized once.
+
+The likelihood is the same as the one computed with ImageMagick: the fraction
+of pixels which are identical in both images.
+"""
+
+from __future__ import division
+
+import hashlib
+import os
+import subprocess
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Same resolution ImageMagick uses by default to read PDFs
+DEFAULT_DENSITY = 72
+
+_memory_cache = {}
+
+
+def is_available():
+    """
+    Check that both numpy and ghostscript are available
+    """
+    if np is None:
+        return False
+
+    try:
+        with open(os.devnull, 'w+b') as null:
+            subprocess.check_call(['gs', '--version'], stdout=null, stderr=null)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+    return True
+
+
+def get_cache_folder():
+    folder = os.environ.get('PLOTIT_TEST_CACHE', os.path.join(tempfile.gettempdir(), 'plotit-test-cache'))
+    folder = os.path.join(folder, 'rasters')
+    if not os.path.isdir(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # Created concurrently by another process
+            pass
+
+    return folder
+
+
+def content_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def read_ppm(data):
+    """
+    Decode a binary PPM (P6) image into a (height, width, 3) array
+    """
+    # Header: magic, width, height, maxval, separated by whitespace, possibly with comments
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b'#':
+            pos = data.index(b'\n', pos) + 1
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+
+    if fields[0] != b'P6':
+        raise ValueError('Unsupported PPM format: %s' % fields[0])
+
+    width, height, maxval = int(fields[1]), int(fields[2]), int(fields[3])
+    # Exactly one whitespace after maxval
+    pos += 1
+
+    dtype = np.uint8 if maxval < 256 else np.dtype('>u2')
+    pixels = np.frombuffer(data, dtype=dtype, count=width * height * 3, offset=pos)
+
+    return pixels.reshape((height, width, 3))
+
+
+def rasterize(pdf, density=DEFAULT_DENSITY):
+    """
+    Rasterize the first page of a PDF with ghostscript
+    """
+    args = ['gs', '-q', '-dSAFER', '-dBATCH', '-dNOPAUSE', '-dUseCropBox',
+            '-dTextAlphaBits=4', '-dGraphicsAlphaBits=4', '-dFirstPage=1', '-dLastPage=1',
+            '-sDEVICE=ppmraw', '-r%d' % density, '-sOutputFile=-', pdf]
+
+    return read_ppm(subprocess.check_output(args))
+
+
+def get_raster(pdf, density=DEFAULT_DENSITY, persistent=False):
+    """
+    Return the raster of a PDF, from the cache if the same content was already rasterized.
+
+    If persistent is True, the raster is also stored on disk so that it can be
+    reused by later runs (only useful for reference images).
+    """
+    key = '%s-%d' % (content_hash(pdf), density)
+
+    raster = _memory_cache.get(key)
+    if raster is not None:
+        return raster
+
+    cache_file = os.path.join(get_cache_folder(), key + '.npy')
+    if persistent and os.path.exists(cache_file):
+        try:
+            raster = np.load(cache_file)
+        except (IOError, ValueError):
+            raster = None
+
+    if raster is None:
+        raster = rasterize(pdf, density)
+
+        if persistent:
+            # Write to a temporary file first, so that concurrent readers never see a partial file
+            fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.npy')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, raster)
+            os.rename(temp_name, cache_file)
+
+    _memory_cache[key] = raster
+
+    return raster
+
+
+def difference_mask(raster1, raster2):
+    """
+    Boolean mask of the pixels which differ between the two rasters
+    """
+    return np.any(raster1 != raster2, axis=-1)
+
+
+def get_images_likelihood(image1, image2):
+    """
+    Fraction of identical pixels between image1 (result) and image2 (reference)
+    """
+    raster1 = get_raster(image1)
+    raster2 = get_raster(image2, persistent=True)
+
+    if raster1.shape != raster2.shape:
+        return 0.
+
+    return 1 - np.count_nonzero(difference_mask(raster1, raster2)) / (raster1.shape[0] * raster1.shape[1])
@@ -1,14 +1,28 @@
 from __future__ import division
 
+import contextlib
 import os
 import re
 import unittest
 import shutil
+import sys
 import yaml
 import tempfile
 import subprocess
+import threading
+import multiprocessing
+import multiprocessing.pool
+
+# Python bindings, only built with -DPLOTIT_PYTHON=ON
+sys.path.insert(0, '..')
+try:
+    import plotit
+except ImportError:
+    plotit = None
 
 from configuration import get_configuration
+import images
+import artifacts
 
 class TemporaryFolder:
     def __init__(self):
@@ -20,8 +34,29 @@ class TemporaryFolder:
 def get_golden_file(f):
     return os.path.join('golden', f)
 
-convert_line_regexp = re.compile('(\d+):\s+\(\s*(\d+),\s*(\d+),\s*(\d+),\s*(\d+)\)')
+# Image comparison backend: 'native' (numpy + ghostscript) or 'imagemagick'.
+# By default, use the native one if available
+image_backend = os.environ.get('PLOTIT_IMAGE_BACKEND', 'native' if images.is_available() else 'imagemagick')
+
 def get_images_likelihood(image1, image2):
+    if image_backend == 'native':
+        return images.get_images_likelihood(image1, image2)
+
+    return get_images_likelihood_imagemagick(image1, image2)
+
+# Independent plotIt runs and image comparisons of a test are executed
+# concurrently. Threads are enough: the work is done by subprocesses and numpy
+_check_pool = None
+def get_check_pool():
+    global _check_pool
+    if _check_pool is None:
+        jobs = int(os.environ.get('PLOTIT_TEST_JOBS', 0)) or multiprocessing.cpu_count()
+        _check_pool = multiprocessing.pool.ThreadPool(jobs)
+
+    return _check_pool
+
+convert_line_regexp = re.compile('(\d+):\s+\(\s*(\d+),\s*(\d+),\s*(\d+),\s*(\d+)\)')
+def get_images_likelihood_imagemagick(image1, image2):
     import subprocess
 
     compare = subprocess.Popen(['compare', image1, image2, '-compose', 'src', 'miff:-'], stdout=subprocess.PIPE, universal_newlines=True)
@@ -61,63 +96,6 @@ def get_images_likelihood(image1, image2):
 
     return 1 - non_black_pixels / pixels
 
-def to_png(image):
-    """
-    Convert image to PNG using 'convert'
-    """
-    import subprocess
-
-    temp_name = None
-    with tempfile.NamedTemporaryFile(delete=False) as f:
-        temp_name = f.name + '.png'
-
-    args = ['convert', '-define', 'pdf:use-cropbox=true', '-units', 'PixelsPerInch', '-density', '120', image, temp_name]
-    subprocess.check_call(args)
-
-    return temp_name
-
-
-def upload_images(image1, image2):
-    import subprocess
-
-    diff_output = None
-    with tempfile.NamedTemporaryFile(delete=False) as f:
-        diff_output = f.name + '.pdf'
-
-    # Create nice diff of image1 and image2
-    subprocess.call(['compare', '-define', 'pdf:use-cropbox=true', image1, image2, diff_output])
-
-    # Convert images to png
-    image1 = to_png(image1)
-    image2 = to_png(image2)
-    diff_output = to_png(diff_output)
-
-    # Upload to imgur
-    from imgurpython import ImgurClient
-
-    client_id = 'e32a7007635bb1f'
-    client = ImgurClient(client_id, None)
-
-    uploaded_image1 = client.upload_from_path(image1)
-    uploaded_image2 = client.upload_from_path(image2)
-    uploaded_diff = client.upload_from_path(diff_output)
-
-    print("\nImages uploaded:")
-    print(" - Reference image: %s" % uploaded_image2['link'])
-    print(" - Generated image: %s" % uploaded_image1['link'])
-    print(" - Difference: %s" % uploaded_diff['link'])
-
-    print("\n-----")
-    print("To delete image, execute these commands:")
-
-    curl_command = 'curl -X DELETE -H "Authorization: Client-ID %s" https://api.imgur.com/3/image/%%s' % (client_id)
-
-    print(curl_command % uploaded_image1['deletehash'])
-    print(curl_command % uploaded_image2['deletehash'])
-    print(curl_command % uploaded_diff['deletehash'])
-    print("-----")
-    print("")
-
 class plotItSimpleTestCase(unittest.TestCase):
     def __init__(self, methodName='runTest'):
         super(plotItSimpleTestCase, self).__init__(methodName)
@@ -125,17 +103,55 @@ class plotItSimpleTestCase(unittest.TestCase):
         # Switch to True to generate golden images
         self.__generate_golden_images = False
 
-    def run_plotit(self, configuration):
+    def run_plotit(self, configuration, output_folder=None, args=()):
+        if output_folder is None:
+            output_folder = self.output_folder.name
+
+        content = configuration if isinstance(configuration, bytes) else yaml.dump(configuration, encoding='utf-8')
+
         with tempfile.NamedTemporaryFile() as yml:
-            yml.write(yaml.dump(configuration, encoding='utf-8'))
+            yml.write(content)
             yml.flush()
             with open(os.devnull, 'w+b') as null:
-                subprocess.check_call(['../plotIt', yml.name, '-o', self.output_folder.name], stdout=null)
+                subprocess.check_call(['../plotIt', yml.name, '-o', output_folder] + list(args), stdout=null)
+
+    @contextlib.contextmanager
+    def watch_plotit(self, configuration, output_folder, args=()):
+        """
+        Run plotIt with --watch for the duration of the block, which receives
+        a function waiting until plotIt is done rendering
+        """
+        with tempfile.NamedTemporaryFile() as yml:
+            yml.write(yaml.dump(configuration, encoding='utf-8'))
+            yml.flush()
+
+            process = subprocess.Popen(['../plotIt', yml.name, '-o', output_folder, '--watch'] + list(args), stdout=subprocess.PIPE, universal_newlines=True)
+            # Never wait forever for an update
+            timer = threading.Timer(120, process.kill)
+            timer.start()
+
+            def wait_for_update():
+                for line in iter(process.stdout.readline, ''):
+                    if line.startswith('Watching for changes'):
+                        return
+                self.fail('plotIt stopped before watching for changes')
+
+            try:
+                yield wait_for_update
+            finally:
+                timer.cancel()
+                process.kill()
+                process.wait()
 
     def setUp(self):
         self.output_folder = TemporaryFolder()
+        self.pending_checks = []
 
     def tearDown(self):
+        # Never leave checks running in the background if the test failed early
+        for check in self.pending_checks:
+            check[2].wait()
+
         del self.output_folder
 
     def compare_images(self, image1, image2, threshold=0.995):
@@ -147,14 +163,54 @@ class plotItSimpleTestCase(unittest.TestCase):
 
         likelihood = get_images_likelihood(image1, image2)
 
-        try:
-            self.assertGreater(likelihood, threshold, "Images too different: %.2f%% of similitude" % (likelihood * 100))
-        except AssertionError as e:
-            # Upload both image1, image2 and the diff
-            # and output urls
-            upload_images(image1, image2)
+        if likelihood <= threshold:
+            # Keep the images and their difference for inspection
+            report = artifacts.record_failure(self.id(), image1, image2, likelihood)
+            self.fail("Images too different: %.2f%% of similitude (see %s)" % (likelihood * 100, report))
+
+    def __check_plot(self, content, output_name, golden):
+        """
+        Run plotIt in its own output folder and compare the result with the golden image.
 
-            raise e
+        Executed in the check pool: return None on success, the exception otherwise
+        """
+        output_folder = TemporaryFolder()
+        try:
+            self.run_plotit(content, output_folder.name)
+            self.compare_images(os.path.join(output_folder.name, output_name), get_golden_file(golden))
+        except Exception as e:
+            return e
+        finally:
+            del output_folder
+
+        return None
+
+    def check_plot(self, configuration, output_name, golden):
+        """
+        Schedule a plotIt run with this configuration, and the comparison of
+        the produced `output_name` with the golden image `golden`.
+
+        The configuration is serialized right away, so it can be modified
+        freely afterwards. Results are collected by `wait_for_checks`.
+        """
+        content = yaml.dump(configuration, encoding='utf-8')
+        result = get_check_pool().apply_async(self.__check_plot, (content, output_name, golden))
+        self.pending_checks.append((output_name, golden, result))
+
+    def wait_for_checks(self):
+        """
+        Wait for all the scheduled checks, and fail if any of them failed
+        """
+        pending_checks, self.pending_checks = self.pending_checks, []
+
+        failures = []
+        for output_name, golden, result in pending_checks:
+            error = result.get()
+            if error is not None:
+                failures.append("%s (golden: %s): %s" % (output_name, golden, error))
+
+        if failures:
+            self.fail('\n'.join(failures))
 
     def suite(self):
         return unittest.TestLoader().loadTestsFromTestCase(self.__class__)
@@ -166,65 +222,39 @@ class plotItTestCase(plotItSimpleTestCase):
 
         configuration['plots']['histo1']['show-ratio'] = False
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_no_ratio.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_no_ratio.pdf')
-                )
+        self.wait_for_checks()
 
     def test_default_ratio(self):
         configuration = get_configuration()
 
         configuration['plots']['histo1']['show-ratio'] = True
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_ratio.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_ratio.pdf')
-                )
+        self.wait_for_checks()
 
     def test_legend(self):
         configuration = get_configuration()
 
         configuration['legend']['columns'] = 1
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_1column_legend.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_1column_legend.pdf')
 
         configuration['legend']['columns'] = 2
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_2columns_legend.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_2columns_legend.pdf')
 
         configuration['legend']['columns'] = 3
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_3columns_legend.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_3columns_legend.pdf')
 
         configuration['legend']['columns'] = 2
         configuration['files']['MC_sample1.root']['legend-order'] = 1
         configuration['files']['MC_sample2.root']['legend-order'] = 0
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_2columns_samplesordering_legend.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_2columns_samplesordering_legend.pdf')
 
         
         configuration = get_configuration()
@@ -237,12 +267,9 @@ class plotItTestCase(plotItSimpleTestCase):
                 ]
 
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_extra_legend_entries.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_extra_legend_entries.pdf')
-                )
+        self.wait_for_checks()
 
     def test_lines(self):
         configuration = get_configuration()
@@ -258,12 +285,7 @@ class plotItTestCase(plotItSimpleTestCase):
                 [[5.5, float('nan')], [5.5, float('nan')]]
                 ]
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_lines.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_lines.pdf')
 
         configuration = get_configuration()
 
@@ -281,24 +303,16 @@ class plotItTestCase(plotItSimpleTestCase):
                 [[5.5, float('nan')], [5.5, float('nan')]]
                 ]
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_lines_inline_style.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_lines_inline_style.pdf')
-                )
+        self.wait_for_checks()
 
     def test_systematics(self):
         configuration = get_configuration()
 
         configuration['configuration']['luminosity-error'] = 0.4
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_lumi_error_0p4.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_lumi_error_0p4.pdf')
 
         configuration = get_configuration()
 
@@ -306,12 +320,7 @@ class plotItTestCase(plotItSimpleTestCase):
         configuration['systematics'] = []
         configuration['systematics'] += [{'syst1': 1.4}]
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_one_syst_0p4.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_one_syst_0p4.pdf')
 
         configuration = get_configuration()
 
@@ -320,59 +329,38 @@ class plotItTestCase(plotItSimpleTestCase):
         configuration['systematics'] += [{'syst1': 1.2}]
         configuration['systematics'] += [{'syst2': {'type': 'ln', 'prior': 1.2}}]
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_two_systs_0p28.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_two_systs_0p28.pdf')
 
         configuration = get_configuration()
 
         configuration['configuration']['luminosity-error'] = 0.
         configuration['systematics'] = ['alpha', 'beta']
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_two_systs_shape.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_two_systs_shape.pdf')
 
         configuration = get_configuration()
 
         configuration['configuration']['luminosity-error'] = 0.
         configuration['systematics'] = ['i-do-not-exist']
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_syst_not_found.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_syst_not_found.pdf')
-                )
+        self.wait_for_checks()
 
     def test_blinded(self):
         configuration = get_configuration()
         configuration['plots']['histo1']['blinded-range'] = [3, 5.2]
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_blinded_range.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_blinded_range.pdf')
 
         configuration = get_configuration()
 
         configuration['plots']['histo1']['blinded-range'] = [3, 5.2]
         configuration['plots']['histo1']['log-y'] = True
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1_logy.pdf', 'default_configuration_blinded_range_logy.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1_logy.pdf'),
-                get_golden_file('default_configuration_blinded_range_logy.pdf')
-                )
+        self.wait_for_checks()
 
     def test_multi_stacks(self):
         configuration = get_configuration()
@@ -383,22 +371,12 @@ class plotItTestCase(plotItSimpleTestCase):
         configuration['files']['MC_sample1.root']['stack-index'] = 0
         configuration['files']['MC_sample2.root']['stack-index'] = 1
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_multi_stacks.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_multi_stacks.pdf')
 
         configuration['files']['MC_sample1.root']['stack-index'] = 1
         configuration['files']['MC_sample2.root']['stack-index'] = 0
 
-        self.run_plotit(configuration)
-
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_multi_stacks_reverse_ordering.pdf')
-                )
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_multi_stacks_reverse_ordering.pdf')
 
         configuration['files']['MC_sample1.root']['stack-index'] = 0
         configuration['files']['MC_sample2.root']['stack-index'] = 1
@@ -413,12 +391,9 @@ class plotItTestCase(plotItSimpleTestCase):
         configuration['files']['MC_sample2.root']['line-width'] = 2
         configuration['files']['MC_sample2.root']['legend-style'] = 'l'
 
-        self.run_plotit(configuration)
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_multi_stacks_line_type.pdf')
 
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_multi_stacks_line_type.pdf')
-                )
+        self.wait_for_checks()
 
     def test_eras(self):
         configuration = get_configuration()
@@ -434,8 +409,84 @@ class plotItTestCase(plotItSimpleTestCase):
                 "2" : 0.33
                 }
 
+        self.check_plot(configuration, 'histo1.pdf', 'default_configuration_eras.pdf')
+
+        self.wait_for_checks()
+
+    def copy_inputs(self, configuration):
+        """
+        Copy the input files to a temporary folder, used by `configuration`,
+        so that the test can modify them
+        """
+        inputs = TemporaryFolder()
+        for name in configuration['files']:
+            shutil.copy(os.path.join('files', name), inputs.name)
+        configuration['configuration']['root'] = inputs.name
+
+        return inputs
+
+    def test_watch_yields(self):
+        """
+        Yields written with --watch, after the first rendering and after an
+        input file changed, are the ones of a normal run
+        """
+        configuration = get_configuration()
+        inputs = self.copy_inputs(configuration)
+
+        self.run_plotit(configuration, args=['-y'])
+        with open(os.path.join(self.output_folder.name, 'yields.tex')) as f:
+            expected = f.read()
+
+        watch_folder = TemporaryFolder()
+        yields = os.path.join(watch_folder.name, 'yields.tex')
+
+        with self.watch_plotit(configuration, watch_folder.name, args=['-y']) as wait_for_update:
+            wait_for_update()
+            with open(yields) as f:
+                self.assertEqual(f.read(), expected)
+
+            # Same content, new modification time: the file is read again
+            shutil.copy(os.path.join('files', 'MC_sample1.root'), inputs.name)
+
+            wait_for_update()
+            with open(yields) as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_watch_custom_colors(self):
+        """
+        Plots rendered again with --watch after an input file changed keep
+        the custom colors of the configuration
+        """
+        configuration = get_configuration()
+        inputs = self.copy_inputs(configuration)
+
+        watch_folder = TemporaryFolder()
+
+        with self.watch_plotit(configuration, watch_folder.name) as wait_for_update:
+            wait_for_update()
+
+            # The histograms change: the plot is rendered again, by the same configuration
+            shutil.copy(os.path.join('files', 'MC_sample2.root'), os.path.join(inputs.name, 'MC_sample1.root'))
+
+            wait_for_update()
+
         self.run_plotit(configuration)
-        self.compare_images(
-                os.path.join(self.output_folder.name, 'histo1.pdf'),
-                get_golden_file('default_configuration_eras.pdf')
-                )
+        self.compare_images(os.path.join(watch_folder.name, 'histo1.pdf'), os.path.join(self.output_folder.name, 'histo1.pdf'))
+
+    @unittest.skipIf(plotit is None, 'Python bindings not built')
+    def test_python_plot_all_twice(self):
+        """
+        A configuration rendered a second time from Python keeps its custom
+        colors
+        """
+        p = plotit.PlotIt(self.output_folder.name)
+        p.parse(get_configuration())
+
+        output = os.path.join(self.output_folder.name, 'histo1.pdf')
+        first = os.path.join(self.output_folder.name, 'histo1_first.pdf')
+
+        p.plot_all()
+        shutil.move(output, first)
+
+        p.plot_all()
+        self.compare_images(output, first)